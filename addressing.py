@@ -0,0 +1,39 @@
+"""
+Endereçamento IPv4
+Conversões entre endereços em texto e inteiros, usadas pela topologia e pelos carregadores
+"""
+
+import ipaddress
+from functools import lru_cache
+from typing import Union
+
+
+@lru_cache(maxsize=65536)
+def ip_to_int(ip: str) -> int:
+    """Converte um endereço IPv4 em inteiro"""
+    return int(ipaddress.IPv4Address(ip))
+
+
+def int_to_ip(value: int) -> str:
+    """Converte um inteiro em endereço IPv4 (notação decimal com pontos)"""
+    return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+
+
+def prefix_mask(prefix_len: int) -> int:
+    """Retorna a máscara de rede (inteiro) para um comprimento de prefixo"""
+    return (0xFFFFFFFF << (32 - prefix_len)) & 0xFFFFFFFF
+
+
+def as_address(ip: Union[str, int]) -> int:
+    """Aceita um IPv4 em texto ou já inteiro e retorna o inteiro"""
+    return ip if isinstance(ip, int) else ip_to_int(ip)
+
+
+def prefix_length(mask: Union[str, int]) -> int:
+    """Converte uma máscara ('24', 24 ou '255.255.255.0') em comprimento de prefixo"""
+    if isinstance(mask, str) and not mask.isdigit():
+        return ipaddress.IPv4Network(f"0.0.0.0/{mask}").prefixlen
+    prefix_len = int(mask)
+    if not 0 <= prefix_len <= 32:
+        raise ValueError(f"Máscara inválida: {mask!r}")
+    return prefix_len
@@ -0,0 +1,297 @@
+"""
+Benchmarks de Desempenho
+Mede os caminhos críticos (busca de rotas, busca de dispositivos, trace,
+RTT e construção da topologia) em topologias de vários tamanhos e grava
+os resultados em JSON/CSV para comparação entre versões
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from network_simulator import NUMPY_AVAILABLE, Host, NetworkDevice, NetworkTopology, SimulatedClock
+from topology_generator import generate_hierarchical
+
+
+# Tamanhos predefinidos: nome -> (cores, aggregations, edges, hosts); None é a topologia padrão
+SIZES: Dict[str, Optional[Tuple[int, int, int, int]]] = {
+    'padrao': None,
+    'pequena': (1, 2, 8, 64),
+    'media': (2, 8, 64, 2000),
+    'grande': (4, 32, 512, 20000),
+    'enorme': (4, 64, 2048, 100000),
+}
+
+BENCHMARKS = ('build', 'get_route', 'get_route_cached', 'get_device_by_ip',
+              'trace_route', 'trace_route_cached', 'calculate_rtt', 'xtrace')
+
+# Campos de cada resultado, na ordem das colunas do CSV
+FIELDS = ('size', 'devices', 'routes', 'benchmark', 'calls', 'best_ns', 'median_ns', 'mean_ns', 'ops_per_s')
+
+
+def parse_size(text: str) -> Tuple[str, Optional[Tuple[int, int, int, int]]]:
+    """Aceita um nome de SIZES ou 'CORES,AGGREGATIONS,EDGES,HOSTS'"""
+    if text in SIZES:
+        return text, SIZES[text]
+    try:
+        cores, aggregations, edges, hosts = (int(value) for value in text.split(','))
+    except ValueError:
+        raise ValueError(f"Tamanho inválido: {text!r} (use {', '.join(SIZES)} ou C,A,E,H)") from None
+    return text, (cores, aggregations, edges, hosts)
+
+
+def build_topology(spec: Optional[Tuple[int, int, int, int]], seed: Optional[int] = None) -> NetworkTopology:
+    """Constrói a topologia de um tamanho com relógio simulado (probes sem espera real)"""
+    if spec is None:
+        return NetworkTopology(SimulatedClock(), seed=seed)
+    topology = generate_hierarchical(*spec, clock=SimulatedClock())
+    topology.reseed(seed)
+    return topology
+
+
+def time_calls(func: Callable, calls: Sequence[Tuple], repeat: int) -> Dict:
+    """Executa `func` sobre todos os argumentos de `calls`, `repeat` vezes
+    
+    Uma passada inicial não cronometrada aquece tabelas compiladas e
+    caches; os tempos são por chamada, em nanossegundos.
+    """
+    for args in calls:
+        func(*args)
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        for args in calls:
+            func(*args)
+        rounds.append((time.perf_counter_ns() - start) / len(calls))
+    best = min(rounds)
+    return {
+        'calls': len(calls),
+        'best_ns': round(best, 1),
+        'median_ns': round(statistics.median(rounds), 1),
+        'mean_ns': round(statistics.mean(rounds), 1),
+        'ops_per_s': round(1e9 / best, 1) if best else None
+    }
+
+
+def time_build(spec: Optional[Tuple[int, int, int, int]], repeat: int,
+               seed: Optional[int] = None) -> Tuple[NetworkTopology, Dict]:
+    """Cronometra a construção; topologias que levam mais de 1 s são construídas uma vez"""
+    rounds = []
+    topology = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        topology = build_topology(spec, seed)
+        rounds.append(time.perf_counter_ns() - start)
+        if rounds[-1] > 1e9:
+            break
+    best = min(rounds)
+    return topology, {
+        'calls': 1,
+        'best_ns': float(best),
+        'median_ns': float(statistics.median(rounds)),
+        'mean_ns': round(statistics.mean(rounds), 1),
+        'ops_per_s': round(1e9 / best, 3)
+    }
+
+
+def _queries(topology: NetworkTopology, count: int, rng: random.Random) -> List[Tuple[Host, Host]]:
+    """Pares de hosts sorteados (com repetição) para as consultas"""
+    hosts = [device for device in topology.devices.values() if isinstance(device, Host)]
+    return [(rng.choice(hosts), rng.choice(hosts)) for _ in range(count)]
+
+
+def run_size(name: str, spec: Optional[Tuple[int, int, int, int]], queries: int = 1000,
+             repeat: int = 5, seed: int = 1, benchmarks: Sequence[str] = BENCHMARKS) -> List[Dict]:
+    """Executa os benchmarks selecionados em uma topologia"""
+    topology, build = time_build(spec, repeat if 'build' in benchmarks else 1, seed)
+    rng = random.Random(seed)
+    pairs = _queries(topology, queries, rng)
+    routes = sum(len(device.routing_table) for device in topology.devices.values())
+    
+    # Cada consulta de rota parte do gateway da origem (um roteador)
+    route_calls = [(topology.get_device_by_ip(source.gateway), dest.get_ip()) for source, dest in pairs]
+    ip_calls = [(ip,) for source, dest in pairs for ip in (source.get_ip(), dest.gateway)]
+    trace_calls = [(source.get_ip(), dest.get_ip()) for source, dest in pairs]
+    cache = topology.route_cache
+    
+    def uncached(func: Callable, calls: Sequence[Tuple]) -> Dict:
+        """Mede com o cache de rotas desativado"""
+        topology.route_cache = None
+        try:
+            return time_calls(func, calls, repeat)
+        finally:
+            topology.route_cache = cache
+    
+    cases = {
+        'get_route': lambda: uncached(NetworkDevice.get_route, route_calls),
+        'get_route_cached': lambda: time_calls(NetworkDevice.get_route, route_calls, repeat),
+        'get_device_by_ip': lambda: time_calls(topology.get_device_by_ip, ip_calls, repeat),
+        'trace_route': lambda: uncached(topology.trace_route, trace_calls),
+        'trace_route_cached': lambda: time_calls(topology.trace_route, trace_calls, repeat),
+        'calculate_rtt': lambda: time_calls(topology.calculate_rtt, trace_calls, repeat),
+        'xtrace': lambda: time_calls(topology.xtrace, trace_calls, repeat),
+    }
+    
+    results = []
+    for benchmark in benchmarks:
+        measured = build if benchmark == 'build' else cases[benchmark]()
+        results.append({'size': name, 'devices': len(topology.devices), 'routes': routes,
+                        'benchmark': benchmark, **measured})
+    return results
+
+
+def _revision() -> Optional[str]:
+    """Revisão git do código medido, se disponível"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5,
+                              check=True).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmarks(sizes: Sequence[str], queries: int = 1000, repeat: int = 5, seed: int = 1,
+                   benchmarks: Sequence[str] = BENCHMARKS, progress: bool = False) -> Dict:
+    """Executa os benchmarks em cada tamanho e retorna o relatório (metadados e resultados)"""
+    if queries < 1 or repeat < 1:
+        raise ValueError(f"queries e repeat devem ser positivos (obtido {queries} e {repeat})")
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'revision': _revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': NUMPY_AVAILABLE,
+            'queries': queries,
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': []
+    }
+    for text in sizes:
+        name, spec = parse_size(text)
+        if progress:
+            print(f"⏱️  {name}...", file=sys.stderr, flush=True)
+        report['results'].extend(run_size(name, spec, queries, repeat, seed, benchmarks))
+    return report
+
+
+def write_json(report: Dict, path: str):
+    """Grava o relatório completo em JSON"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+
+def write_csv(report: Dict, path: str):
+    """Grava os resultados em CSV (uma linha por tamanho e benchmark)"""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(report['results'])
+
+
+def compare(report: Dict, baseline: Dict, threshold: float = 0.10) -> List[Dict]:
+    """Compara o melhor tempo por chamada com um relatório anterior
+    
+    O melhor tempo de cada rodada é o menos sensível a ruído da máquina.
+    Retorna, para cada (tamanho, benchmark) presente nos dois, a razão
+    atual/anterior e se ela passa de 1 + `threshold` (regressão).
+    """
+    previous = {(row['size'], row['benchmark']): row for row in baseline['results']}
+    rows = []
+    for row in report['results']:
+        old = previous.get((row['size'], row['benchmark']))
+        if old is None or not old['best_ns']:
+            continue
+        ratio = row['best_ns'] / old['best_ns']
+        rows.append({
+            'size': row['size'],
+            'benchmark': row['benchmark'],
+            'baseline_ns': old['best_ns'],
+            'best_ns': row['best_ns'],
+            'ratio': round(ratio, 3),
+            'regression': ratio > 1 + threshold
+        })
+    return rows
+
+
+def positive_int(text: str) -> int:
+    """Converte um inteiro positivo da linha de comando"""
+    try:
+        value = int(text)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"valor inválido: {text!r} (use um inteiro positivo)")
+    return value
+
+
+def format_time(ns: float) -> str:
+    """Formata uma duração em nanossegundos com a unidade adequada"""
+    for unit, scale in (('s', 1e9), ('ms', 1e6), ('µs', 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+
+def main():
+    """Executa os benchmarks e exibe, grava e compara os resultados"""
+    parser = argparse.ArgumentParser(description="Benchmarks dos caminhos críticos do simulador")
+    parser.add_argument('--sizes', nargs='+', default=['padrao', 'pequena', 'media'],
+                        help=f"tamanhos ({', '.join(SIZES)}) ou C,A,E,H")
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--queries', type=positive_int, default=1000, help="consultas por benchmark")
+    parser.add_argument('--repeat', type=positive_int, default=5, help="rodadas cronometradas")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help="grava o relatório em JSON")
+    parser.add_argument('--csv', help="grava os resultados em CSV")
+    parser.add_argument('--compare', help="relatório JSON anterior para comparação")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="aumento relativo do melhor tempo considerado regressão")
+    args = parser.parse_args()
+    
+    try:
+        for text in args.sizes:
+            parse_size(text)
+    except ValueError as error:
+        parser.error(str(error))
+    
+    report = run_benchmarks(args.sizes, args.queries, args.repeat, args.seed, args.benchmarks,
+                            progress=True)
+    
+    print(f"{'Tamanho':<10} {'Disp.':>8} {'Benchmark':<20} {'Melhor':>10} {'Mediana':>10} {'ops/s':>12}")
+    print("-" * 75)
+    for row in report['results']:
+        ops = '-' if row['ops_per_s'] is None else f"{row['ops_per_s']:,.0f}"
+        print(f"{row['size']:<10} {row['devices']:>8} {row['benchmark']:<20} "
+              f"{format_time(row['best_ns']):>10} {format_time(row['median_ns']):>10} {ops:>12}")
+    
+    if args.json:
+        write_json(report, args.json)
+    if args.csv:
+        write_csv(report, args.csv)
+    
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print(f"\nComparação com {args.compare} (revisão {baseline['meta'].get('revision') or '?'}):")
+        for row in rows:
+            mark = '❌' if row['regression'] else '✓'
+            print(f"  {mark} {row['size']:<10} {row['benchmark']:<20} "
+                  f"{format_time(row['baseline_ns']):>10} → {format_time(row['best_ns']):>10} "
+                  f"({row['ratio']:.2f}x)")
+        if any(row['regression'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
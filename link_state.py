@@ -0,0 +1,532 @@
+"""
+Roteamento Dinâmico por Estado de Enlace
+SPF sobre as conexões entre roteadores, com reconvergência incremental
+nas falhas e recuperações de enlaces e roteadores
+"""
+
+import heapq
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from network_simulator import (ECMP_MAX_PATHS, REFERENCE_BANDWIDTH, NetworkDevice, NetworkInterface, NetworkTopology,
+                               Route, RouteTable)
+from packet_engine import DEFAULT_CAPACITY
+
+
+class LinkStateRouting:
+    """Roteamento dinâmico por estado de enlace (SPF) sobre `connections`
+    
+    Cada roteador é um nó e cada par de interfaces conectadas nos dois
+    sentidos e na mesma subrede é uma adjacência, com custo
+    reference_bandwidth / capacidade do enlace em `links` (mínimo 1, como
+    no OSPF). As redes das interfaces são anunciadas pelos seus roteadores
+    e um Dijkstra por roteador preenche routing_table com as rotas de cada
+    rede remota alcançável pelos caminhos de menor custo: um grupo ECMP
+    com até `max_paths` saídas (as interfaces de menor ordem), na ordem
+    das interfaces.
+    
+    Falhas e recuperações de enlaces e roteadores são incrementais: só
+    refazem o SPF os roteadores cujas árvores usam (ou passariam a usar) os
+    enlaces alterados, apenas na parte afetada da árvore, e só as rotas
+    que mudam são reescritas. Alterações estruturais na topologia
+    (dispositivos, interfaces, conexões, enlaces) exigem compute().
+    """
+    
+    UNREACHABLE = 2 ** 31 - 1
+    
+    def __init__(self, topology: NetworkTopology, reference_bandwidth: float = REFERENCE_BANDWIDTH,
+                 max_paths: int = ECMP_MAX_PATHS):
+        if max_paths < 1:
+            raise ValueError("max_paths deve ser ao menos 1")
+        self.topology = topology
+        self.reference_bandwidth = reference_bandwidth
+        self.max_paths = max_paths
+        # Falhas persistem entre recomputações completas
+        self.failed_links: set = set()
+        self.failed_devices: set = set()
+        self.names: List[str] = []
+    
+    def compute(self) -> Dict:
+        """Reconstrói o grafo a partir da topologia e recalcula todas as tabelas"""
+        start = time.perf_counter()
+        topology = self.topology
+        routers = [device for device in topology.devices.values() if device.device_type != 'Host']
+        self.names = [device.name for device in routers]
+        ids = {name: node for node, name in enumerate(self.names)}
+        self._ids = ids
+        
+        capacities = topology.link_table.capacities()
+        
+        # Portas: interfaces cujo vizinho é um roteador conectado de volta na mesma subrede
+        self._ports: List[List[Tuple[str, int]]] = []
+        port_of: Dict[Tuple[int, str], int] = {}
+        peers: List[List[Tuple[int, str]]] = []
+        for node, device in enumerate(routers):
+            ports, node_peers = [], []
+            for iface_name, iface in device.interfaces.items():
+                peer = device.connections.get(iface_name)
+                if peer is None or peer is device or ids.get(peer.name) is None \
+                        or topology.devices[peer.name] is not peer:
+                    continue
+                back = self._peer_interface(device, iface, peer)
+                if back is None:
+                    continue
+                port_of[(node, iface_name)] = len(ports)
+                ports.append((iface_name, peer.interfaces[back].address))
+                node_peers.append((ids[peer.name], back))
+            self._ports.append(ports)
+            peers.append(node_peers)
+        
+        # Adjacências: (vizinho, custo, enlace, porta do vizinho em direção ao nó)
+        self._adj: List[List[Tuple[int, int, int, int]]] = [[] for _ in routers]
+        self._edges: List[Tuple[int, int, int]] = []
+        self._pair_edges: Dict[Tuple[str, str], List[int]] = {}
+        for node, node_peers in enumerate(peers):
+            for port, (peer, back) in enumerate(node_peers):
+                if (peer, back) < (node, self._ports[node][port][0]):
+                    continue
+                bps = capacities.get((self.names[node], self.names[peer]), DEFAULT_CAPACITY)
+                cost = max(1, round(self.reference_bandwidth / bps))
+                edge = len(self._edges)
+                self._edges.append((node, peer, cost))
+                self._adj[node].append((peer, cost, edge, port_of[(peer, back)]))
+                self._adj[peer].append((node, cost, edge, port))
+                self._pair_edges.setdefault(self._pair(self.names[node], self.names[peer]), []).append(edge)
+        self._alive = bytearray(len(self._edges))
+        self._refresh(range(len(self._edges)))
+        
+        # Redes anunciadas: (rede, prefixo) -> roteadores com interface nela
+        advertisers: Dict[Tuple[int, int], List[int]] = {}
+        for node, device in enumerate(routers):
+            for iface in device.interfaces.values():
+                owners = advertisers.setdefault((iface.network_address, iface.prefix_len), [])
+                if not owners or owners[-1] != node:
+                    owners.append(node)
+        self._prefixes = sorted(advertisers)
+        self._advertisers = [tuple(advertisers[key]) for key in self._prefixes]
+        self._advertised: List[List[int]] = [[] for _ in routers]
+        for prefix, owners in enumerate(self._advertisers):
+            for owner in owners:
+                self._advertised[owner].append(prefix)
+        self._vectors = None
+        if NUMPY_AVAILABLE and self._prefixes:
+            pair_prefix = np.array([prefix for prefix, owners in enumerate(self._advertisers) for _ in owners],
+                                   dtype=np.intp)
+            self._vectors = (
+                np.array([owner for owners in self._advertisers for owner in owners], dtype=np.intp),
+                pair_prefix,
+                np.flatnonzero(np.diff(pair_prefix, prepend=-1)),
+                np.array([network for network, _ in self._prefixes], dtype=np.uint32),
+                np.array([prefix_len for _, prefix_len in self._prefixes], dtype=np.uint32)
+            )
+        
+        # Por raiz: distâncias, conjunto de portas de saída (índice em _sets,
+        # bits = portas), tabela e seu tamanho
+        self._dist: List[Optional[array]] = [None] * len(routers)
+        self._first: List[Optional[array]] = [None] * len(routers)
+        self._sets: List[List[int]] = [[] for _ in routers]
+        self._set_ids: List[Dict[int, int]] = [{} for _ in routers]
+        self._tables: List[Optional[RouteTable]] = [None] * len(routers)
+        self._sizes: List[int] = [0] * len(routers)
+        for node in range(len(routers)):
+            self._spf(node)
+            self._build_table(node)
+        
+        return {
+            'routers': len(routers),
+            'adjacencies': len(self._edges),
+            'prefixes': len(self._prefixes),
+            'routes': sum(len(table) for table in self._tables),
+            'elapsed': round(time.perf_counter() - start, 6)
+        }
+    
+    @staticmethod
+    def _peer_interface(device: NetworkDevice, iface: NetworkInterface, peer: NetworkDevice) -> Optional[str]:
+        """Interface do vizinho conectada de volta ao dispositivo na mesma subrede"""
+        for name, other in peer.interfaces.items():
+            if peer.connections.get(name) is device and other.prefix_len == iface.prefix_len \
+                    and other.network_address == iface.network_address:
+                return name
+        return None
+    
+    @staticmethod
+    def _pair(src: str, dst: str) -> Tuple[str, str]:
+        return (src, dst) if src <= dst else (dst, src)
+    
+    def _refresh(self, edges: Iterable[int]) -> List[int]:
+        """Recalcula o estado de enlaces; retorna os que mudaram"""
+        changed = []
+        names, failed_devices = self.names, self.failed_devices
+        for edge in edges:
+            u, v, _ = self._edges[edge]
+            alive = (self._pair(names[u], names[v]) not in self.failed_links
+                     and names[u] not in failed_devices and names[v] not in failed_devices)
+            if self._alive[edge] != alive:
+                self._alive[edge] = alive
+                changed.append(edge)
+        return changed
+    
+    def _intern(self, root: int, mask: int) -> int:
+        """Índice do conjunto de portas `mask` de `root` (-1: vazio)"""
+        if not mask:
+            return -1
+        ids = self._set_ids[root]
+        index = ids.get(mask)
+        if index is None:
+            sets = self._sets[root]
+            index = ids[mask] = len(sets)
+            sets.append(mask)
+        return index
+    
+    def _first_hop(self, root: int, node: int, dist, first) -> int:
+        """Portas da raiz usadas por algum caminho mínimo até `node`"""
+        mask = 0
+        target = dist[node]
+        alive, sets = self._alive, self._sets[root]
+        for peer, cost, edge, port in self._adj[node]:
+            if alive[edge] and dist[peer] + cost == target:
+                mask |= 1 << port if peer == root else sets[first[peer]]
+        return self._intern(root, mask)
+    
+    def _spf(self, root: int):
+        """Dijkstra completo a partir de `root`"""
+        unreachable = self.UNREACHABLE
+        dist = [unreachable] * len(self.names)
+        # Máscaras de portas; só são internadas ao final
+        masks = [0] * len(self.names)
+        dist[root] = 0
+        heap = [(0, root)]
+        adj, alive = self._adj, self._alive
+        heappop, heappush = heapq.heappop, heapq.heappush
+        while heap:
+            d, node = heappop(heap)
+            if d > dist[node]:
+                continue
+            links = adj[node]
+            if node != root:
+                mask = 0
+                for peer, cost, edge, port in links:
+                    if alive[edge] and dist[peer] + cost == d:
+                        mask |= 1 << port if peer == root else masks[peer]
+                masks[node] = mask
+            for peer, cost, edge, _ in links:
+                if alive[edge] and d + cost < dist[peer]:
+                    dist[peer] = d + cost
+                    heappush(heap, (d + cost, peer))
+        self._dist[root] = array('i', dist)
+        self._first[root] = array('i', [self._intern(root, mask) for mask in masks])
+    
+    def _withdraw(self, root: int, edges: List[int]) -> Optional[List[int]]:
+        """SPF incremental após a queda de `edges`; None se a árvore não os usava"""
+        dist, first, sets = self._dist[root], self._first[root], self._sets[root]
+        unreachable = self.UNREACHABLE
+        affected = set()
+        for edge in edges:
+            u, v, cost = self._edges[edge]
+            if dist[u] != unreachable and dist[u] + cost == dist[v]:
+                affected.add(v)
+            if dist[v] != unreachable and dist[v] + cost == dist[u]:
+                affected.add(u)
+        if not affected:
+            return None
+        
+        # Percorre o DAG de caminhos mínimos abaixo dos enlaces, em ordem de
+        # distância: um nó que ainda tem um predecessor mínimo mantém a
+        # distância (e talvez perca portas); os demais vão para `lost`
+        adj, alive, intern = self._adj, self._alive, self._intern
+        heap = [(dist[node], node) for node in affected]
+        heapq.heapify(heap)
+        lost = set()
+        old = {}
+        while heap:
+            d, node = heapq.heappop(heap)
+            links = adj[node]
+            mask = 0
+            for peer, cost, edge, port in links:
+                if alive[edge] and peer not in lost and dist[peer] + cost == d:
+                    mask |= 1 << port if peer == root else sets[first[peer]]
+            previous = first[node]
+            hop = intern(root, mask)
+            if hop < 0:
+                lost.add(node)
+            elif hop == previous:
+                continue
+            old[node] = (d, previous)
+            first[node] = hop
+            # Só os sucessores que usavam uma porta perdida podem mudar
+            removed = sets[previous] & ~mask
+            for peer, cost, edge, _ in links:
+                if alive[edge] and peer not in affected and d + cost == dist[peer] \
+                        and sets[first[peer]] & removed:
+                    affected.add(peer)
+                    heapq.heappush(heap, (dist[peer], peer))
+        
+        # Os nós sem caminho mínimo restante refazem o Dijkstra a partir da
+        # fronteira, cujas distâncias não mudam
+        for node in lost:
+            dist[node] = unreachable
+        heap = []
+        for node in lost:
+            best = unreachable
+            for peer, cost, edge, _ in adj[node]:
+                if alive[edge] and peer not in lost and dist[peer] + cost < best:
+                    best = dist[peer] + cost
+            if best < unreachable:
+                dist[node] = best
+                heap.append((best, node))
+        heapq.heapify(heap)
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            first[node] = self._first_hop(root, node, dist, first)
+            for peer, cost, edge, _ in adj[node]:
+                if alive[edge] and peer in lost and d + cost < dist[peer]:
+                    dist[peer] = d + cost
+                    heapq.heappush(heap, (d + cost, peer))
+        return [node for node, state in old.items() if state != (dist[node], first[node])]
+    
+    def _extend(self, root: int, edges: List[int]) -> Optional[List[int]]:
+        """SPF incremental após a volta de `edges`; None se nenhum caminho melhora"""
+        dist, first, sets = self._dist[root], self._first[root], self._sets[root]
+        unreachable = self.UNREACHABLE
+        heap = []
+        for edge in edges:
+            u, v, cost = self._edges[edge]
+            if dist[u] != unreachable and dist[u] + cost <= dist[v]:
+                heap.append((dist[u] + cost, v))
+            if dist[v] != unreachable and dist[v] + cost <= dist[u]:
+                heap.append((dist[v] + cost, u))
+        if not heap:
+            return None
+        
+        heapq.heapify(heap)
+        adj, alive = self._adj, self._alive
+        changed = set()
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > dist[node]:
+                continue
+            previous = dist[node]
+            dist[node] = d
+            hop = self._first_hop(root, node, dist, first)
+            if d == previous and hop == first[node]:
+                continue
+            first[node] = hop
+            changed.add(node)
+            mask = sets[hop]
+            for peer, cost, edge, _ in adj[node]:
+                # Empates só importam se acrescentam portas
+                if alive[edge] and (d + cost < dist[peer]
+                                    or d + cost == dist[peer] and mask & ~sets[first[peer]]):
+                    heapq.heappush(heap, (d + cost, peer))
+        return list(changed)
+    
+    def _prefix_set(self, root: int, prefix: int) -> int:
+        """Conjunto de portas das rotas para uma rede (-1: conectada ou inalcançável)"""
+        dist, first, sets = self._dist[root], self._first[root], self._sets[root]
+        best, mask = self.UNREACHABLE, 0
+        for owner in self._advertisers[prefix]:
+            if owner == root:
+                return -1
+            if dist[owner] < best:
+                best, mask = dist[owner], sets[first[owner]]
+            elif dist[owner] == best != self.UNREACHABLE:
+                mask |= sets[first[owner]]
+        return self._intern(root, mask)
+    
+    def _route_ports(self, root: int, index: int) -> List[int]:
+        """Portas instaladas para um conjunto: as `max_paths` de menor ordem"""
+        mask, ports = self._sets[root][index], []
+        while mask and len(ports) < self.max_paths:
+            low = mask & -mask
+            ports.append(low.bit_length() - 1)
+            mask ^= low
+        return ports
+    
+    def _build_table(self, root: int):
+        """Monta a tabela de `root` (redes na ordem global, grupos na ordem das portas)"""
+        ports = self._ports[root]
+        if self._vectors is not None:
+            owners, pair_prefix, starts, networks, lengths = self._vectors
+            dist = np.frombuffer(self._dist[root], dtype=np.int32)[owners].astype(np.int64)
+            dist[owners == root] = -1
+            best = np.minimum.reduceat(dist, starts)
+            keep = (best >= 0) & (best != self.UNREACHABLE)
+            achieving = keep[pair_prefix] & (dist == best[pair_prefix])
+            counts = np.add.reduceat(achieving.astype(np.int32), starts)
+            # Um anunciante mínimo: o conjunto dele; vários: a união
+            sets = np.full(len(starts), -1, dtype=np.int64)
+            single = achieving & (counts[pair_prefix] == 1)
+            sets[pair_prefix[single]] = np.frombuffer(self._first[root], dtype=np.int32)[owners[single]]
+            for prefix in np.flatnonzero(counts > 1).tolist():
+                sets[prefix] = self._prefix_set(root, prefix)
+            
+            # Expande cada rede nas portas do seu conjunto
+            kept = np.flatnonzero(keep)
+            used = np.unique(sets[kept]).tolist()
+            widths = np.zeros(len(self._sets[root]), dtype=np.int64)
+            members = np.zeros((len(self._sets[root]), self.max_paths), dtype=np.int64)
+            for index in used:
+                chosen = self._route_ports(root, index)
+                widths[index] = len(chosen)
+                members[index, :len(chosen)] = chosen
+            width = widths[sets[kept]]
+            rows = np.repeat(kept, width)
+            offset = np.arange(len(rows)) - np.repeat(np.cumsum(width) - width, width)
+            port = members[sets[rows], offset]
+            words = np.empty((len(rows), 4), dtype=np.uint32)
+            words[:, 0] = networks[rows]
+            words[:, 1] = lengths[rows]
+            words[:, 2] = np.array([next_hop for _, next_hop in ports] or [0], dtype=np.uint32)[port]
+            words[:, 3] = port
+            data = array('I', words.tobytes())
+        else:
+            data = array('I')
+            for prefix, (network, prefix_len) in enumerate(self._prefixes):
+                index = self._prefix_set(root, prefix)
+                if index >= 0:
+                    for port in self._route_ports(root, index):
+                        data.extend((network, prefix_len, ports[port][1], port))
+        
+        # O índice de interface de cada rota é o número da porta
+        table = RouteTable.from_array(data, [iface_name for iface_name, _ in ports])
+        self._tables[root] = table
+        self._sizes[root] = len(table)
+        device = self.topology.devices[self.names[root]]
+        device.routing_table = table
+        device.invalidate_forwarding_table()
+    
+    @staticmethod
+    def _locate(data: array, network: int, prefix_len: int) -> Tuple[int, int]:
+        """Intervalo de índices das rotas de uma rede (tabela ordenada por rede e prefixo)"""
+        low, high = 0, len(data) // 4
+        key = (network, prefix_len)
+        while low < high:
+            middle = (low + high) // 2
+            if (data[4 * middle], data[4 * middle + 1]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        end = low
+        while 4 * end < len(data) and data[4 * end] == network and data[4 * end + 1] == prefix_len:
+            end += 1
+        return low, end
+    
+    @staticmethod
+    def _changed_prefixes(old: Optional[array], new: Optional[array]) -> int:
+        """Número de redes cujas rotas diferem entre duas tabelas de uma raiz
+        
+        O próximo hop é determinado pela porta, então cada rota é
+        identificada por (rede, prefixo, porta).
+        """
+        old, new = old or array('I'), new or array('I')
+        if NUMPY_AVAILABLE:
+            def keys(data):
+                words = np.frombuffer(data, dtype=np.uint32).reshape(-1, 4).astype(np.uint64)
+                return words[:, 0] << np.uint64(32) | words[:, 1] << np.uint64(26) | words[:, 3]
+            diff = np.setxor1d(keys(old), keys(new), assume_unique=True)
+            return len(np.unique(diff >> np.uint64(26)))
+        rows = [{(data[i], data[i + 1], data[i + 3]) for i in range(0, len(data), 4)} for data in (old, new)]
+        return len({row[:2] for row in rows[0] ^ rows[1]})
+    
+    def _apply(self, root: int, changed: List[int]) -> int:
+        """Reescreve as rotas das redes anunciadas por `changed`; retorna quantas redes mudaram"""
+        device = self.topology.devices[self.names[root]]
+        table, ports = self._tables[root], self._ports[root]
+        prefixes = sorted({prefix for node in changed for prefix in self._advertised[node]})
+        if device.routing_table is not table or len(table) != self._sizes[root]:
+            # A tabela foi alterada por fora (add_route, sumarização): remonta
+            self._build_table(root)
+            return len(prefixes)
+        if len(prefixes) > 32 and (self._vectors is not None or 4 * len(prefixes) > len(self._prefixes)):
+            # Muitas redes: remontar é mais barato que editar uma a uma
+            self._build_table(root)
+            return self._changed_prefixes(table.as_array()[0], self._tables[root].as_array()[0])
+        
+        # Substitui no lugar só as rotas de cada rede (a tabela segue ordenada)
+        count = 0
+        for prefix in prefixes:
+            network, prefix_len = self._prefixes[prefix]
+            routes = []
+            index = self._prefix_set(root, prefix)
+            if index >= 0:
+                routes = [Route(network, prefix_len, ports[port][1], ports[port][0])
+                          for port in self._route_ports(root, index)]
+            start, stop = self._locate(table.as_array()[0], network, prefix_len)
+            if [table[i] for i in range(start, stop)] == routes:
+                continue
+            table.replace(start, stop, routes)
+            count += 1
+        self._sizes[root] = len(table)
+        if count:
+            device.invalidate_forwarding_table()
+        return count
+    
+    def _update(self, edges: Iterable[int], failed: bool) -> Dict:
+        """Propaga a mudança de estado de enlaces às tabelas afetadas"""
+        start = time.perf_counter()
+        edges = self._refresh(edges)
+        recomputed = updated = routes = 0
+        if edges:
+            incremental = self._withdraw if failed else self._extend
+            for root in range(len(self.names)):
+                changed = incremental(root, edges)
+                if changed is None:
+                    continue
+                recomputed += 1
+                count = self._apply(root, changed) if changed else 0
+                if count:
+                    updated += 1
+                    routes += count
+        return {
+            'adjacencies': len(edges),
+            'recomputed': recomputed,
+            'updated': updated,
+            'routes_changed': routes,
+            'elapsed': round(time.perf_counter() - start, 6)
+        }
+    
+    def _edges_between(self, src: str, dst: str) -> Tuple[Tuple[str, str], List[int]]:
+        pair = self._pair(src, dst)
+        edges = self._pair_edges.get(pair)
+        if not edges:
+            raise ValueError(f"Não há adjacência entre {src} e {dst}")
+        return pair, edges
+    
+    def _device_edges(self, name: str) -> List[int]:
+        node = self._ids.get(name)
+        if node is None:
+            raise ValueError(f"Roteador '{name}' não encontrado")
+        return [edge for _, _, edge, _ in self._adj[node]]
+    
+    def fail_link(self, src: str, dst: str) -> Dict:
+        """Derruba as adjacências entre dois roteadores e reconverge"""
+        pair, edges = self._edges_between(src, dst)
+        self.failed_links.add(pair)
+        return self._update(edges, failed=True)
+    
+    def restore_link(self, src: str, dst: str) -> Dict:
+        """Restabelece as adjacências entre dois roteadores e reconverge"""
+        pair, edges = self._edges_between(src, dst)
+        self.failed_links.discard(pair)
+        return self._update(edges, failed=False)
+    
+    def fail_device(self, name: str) -> Dict:
+        """Derruba um roteador (todas as suas adjacências) e reconverge"""
+        edges = self._device_edges(name)
+        self.failed_devices.add(name)
+        return self._update(edges, failed=True)
+    
+    def restore_device(self, name: str) -> Dict:
+        """Restabelece um roteador e reconverge"""
+        edges = self._device_edges(name)
+        self.failed_devices.discard(name)
+        return self._update(edges, failed=False)
@@ -3,293 +3,1554 @@ Simulador de Rede Hierárquica - Projeto 2
 Topologia em Árvore com Core, Agregação e Edge
 """
 
+import argparse
+import asyncio
+import json
+import os
+import pickle
+import sys
 import time
 import random
-from typing import Dict, List, Tuple, Optional
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple, Optional, Union
 import ipaddress
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from addressing import as_address, int_to_ip, ip_to_int, prefix_length, prefix_mask
+from packet_engine import Link, LinkTable, PacketEngine, check_packet_size
+from topology_loader import load_records
+
+
+# Arquivo da topologia padrão do projeto (formato de topology_loader)
+DEFAULT_TOPOLOGY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'topologia_padrao.txt')
+
+# Intervalo entre amostras consecutivas de um probe (segundos)
+SAMPLE_INTERVAL = 0.1
+
+# Variação máxima (ms) somada a cada amostra pela pilha dos hosts
+JITTER_MS = 0.05
+
+# Banda de referência do custo dos enlaces no roteamento dinâmico (bits/s)
+REFERENCE_BANDWIDTH = 100e9
+
+# Máximo de caminhos de custo igual instalados por rede no roteamento dinâmico
+ECMP_MAX_PATHS = 8
+
+# Baldes do hash de fluxo (potência de 2, até 256): fluxos no mesmo balde
+# seguem os mesmos caminhos ECMP
+ECMP_BUCKETS = 256
+
+# Protocolos IP usados nos fluxos
+PROTOCOL_ICMP = 1
+PROTOCOL_TCP = 6
+PROTOCOL_UDP = 17
+
+
+def flow_hash(source_ip: int, dest_ip: int, protocol: int = PROTOCOL_ICMP,
+              source_port: int = 0, dest_port: int = 0) -> int:
+    """Hash determinístico da 5-tupla de um fluxo, em [0, ECMP_BUCKETS)
+    
+    Só usa operações de 32 bits: também aceita arrays NumPy uint64, com
+    os mesmos resultados, para hashes em lote.
+    """
+    key = (source_ip * 0x9E3779B1 ^ dest_ip * 0x85EBCA77 ^ protocol * 0xC2B2AE3D
+           ^ ((source_port << 16) | dest_port) * 0x27D4EB2F) & 0xFFFFFFFF
+    key = (key ^ (key >> 15)) * 0x2C1B3C6D & 0xFFFFFFFF
+    return (key ^ (key >> 12)) >> 24 & (ECMP_BUCKETS - 1)
+
 
 class NetworkInterface:
-    """Representa uma interface de rede com endereço IP"""
+    """Representa uma interface de rede com endereço IP
+    
+    Endereço e prefixo são guardados como inteiros; `ip`, `mask` e
+    `network` são visões calculadas para exibição.
+    """
+    
+    __slots__ = ('address', 'prefix_len')
+    
+    def __init__(self, ip: Union[str, int], mask: Union[str, int]):
+        self.address = as_address(ip)
+        self.prefix_len = prefix_length(mask)
+    
+    @property
+    def ip(self) -> str:
+        return int_to_ip(self.address)
+    
+    @property
+    def mask(self) -> str:
+        return str(self.prefix_len)
     
-    def __init__(self, ip: str, mask: str):
-        self.ip = ip
-        self.mask = mask
-        self.network = ipaddress.ip_network(f"{ip}/{mask}", strict=False)
+    @property
+    def network_address(self) -> int:
+        return self.address & prefix_mask(self.prefix_len)
+    
+    @property
+    def network(self) -> ipaddress.IPv4Network:
+        return ipaddress.IPv4Network((self.network_address, self.prefix_len))
     
     def __str__(self):
         return f"{self.ip}/{self.mask}"
 
 
+class Route(NamedTuple):
+    """Rota com endereços inteiros (next_hop None: rede diretamente conectada)
+    
+    Além de tupla, aceita as chaves do antigo formato em dict
+    ('destination', 'mask', 'next_hop', 'interface'), com os valores em
+    texto (ver as_dict).
+    """
+    destination: int
+    prefix_len: int
+    next_hop: Optional[int]
+    interface: str
+    
+    def as_dict(self) -> Dict[str, str]:
+        """A rota no antigo formato em dict, com endereços em texto"""
+        return {
+            'destination': int_to_ip(self.destination),
+            'mask': str(self.prefix_len),
+            'next_hop': 'directly connected' if self.next_hop is None else int_to_ip(self.next_hop),
+            'interface': self.interface
+        }
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.as_dict()[key]
+        return tuple.__getitem__(self, key)
+    
+    def get(self, key: str, default=None):
+        return self.as_dict().get(key, default)
+
+
+class RouteTable:
+    """Tabela de rotas estáticas em um array compacto
+    
+    Cada rota ocupa quatro inteiros de 32 bits (rede, prefixo, próximo hop
+    e índice do nome da interface); as tuplas Route são criadas apenas ao
+    iterar. Tabelas vazias não alocam o array.
+    """
+    
+    __slots__ = ('_data', '_interfaces')
+    
+    def __init__(self, routes: Iterable[Route] = ()):
+        self._data: Optional[array] = None
+        self._interfaces: Optional[List[str]] = None
+        for route in routes:
+            self.append(route)
+    
+    @classmethod
+    def from_array(cls, data: array, interfaces: List[str]) -> 'RouteTable':
+        """Cria uma tabela a partir de um array já no formato interno
+        
+        Os nomes de interface são mantidos mesmo com o array vazio, para
+        que rotas acrescentadas depois usem os mesmos índices.
+        """
+        table = cls()
+        if data:
+            table._data = data
+        if interfaces:
+            table._interfaces = list(interfaces)
+        return table
+    
+    def as_array(self) -> Tuple[array, List[str]]:
+        """Retorna o array interno e os nomes de interface indexados por ele (não modificar)"""
+        if self._data is None:
+            return array('I'), []
+        return self._data, self._interfaces
+    
+    def append(self, route: Route):
+        """Adiciona uma rota ao final da tabela"""
+        if self._data is None:
+            self._data = array('I')
+        self._data.extend((route.destination, route.prefix_len, route.next_hop,
+                           self._interface_index(route.interface)))
+    
+    def replace(self, start: int, stop: int, routes: Iterable[Route]):
+        """Substitui as rotas de índices start..stop-1 por `routes`, como table[start:stop] = routes"""
+        words = array('I')
+        for route in routes:
+            words.extend((route.destination, route.prefix_len, route.next_hop,
+                          self._interface_index(route.interface)))
+        if self._data is None:
+            if not words:
+                return
+            self._data = array('I')
+        self._data[4 * start:4 * stop] = words
+    
+    def _interface_index(self, interface: str) -> int:
+        """Índice do nome de uma interface, acrescentando-o se for novo"""
+        if self._interfaces is None:
+            self._interfaces = []
+        interfaces = self._interfaces
+        try:
+            return interfaces.index(interface)
+        except ValueError:
+            interfaces.append(interface)
+            return len(interfaces) - 1
+    
+    def __len__(self) -> int:
+        return 0 if self._data is None else len(self._data) // 4
+    
+    def __getitem__(self, index: int) -> Route:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("índice de rota fora da tabela")
+        destination, prefix_len, next_hop, iface = self._data[4 * index:4 * index + 4]
+        return Route(destination, prefix_len, next_hop, self._interfaces[iface])
+    
+    def __iter__(self) -> Iterator[Route]:
+        if self._data is None:
+            return
+        data, interfaces = self._data, self._interfaces
+        for i in range(0, len(data), 4):
+            yield Route(data[i], data[i + 1], data[i + 2], interfaces[data[i + 3]])
+
+
+class ForwardingTable:
+    """Tabela de encaminhamento compilada (longest prefix match)
+    
+    As redes são agrupadas em tabelas hash por comprimento de prefixo, com
+    endereços inteiros. Uma busca testa no máximo 33 comprimentos de prefixo
+    e devolve o mesmo resultado da varredura linear da tabela de roteamento:
+    redes diretamente conectadas têm prioridade (a primeira interface vence).
+    
+    Rotas estáticas de mesmo prefixo com saídas distintas formam um grupo
+    ECMP: sem hash de fluxo a busca devolve a primeira inserida; com ele, o membro
+    escolhido por select(), que mistura o hash com a semente do roteador
+    para que camadas sucessivas não façam a mesma escolha.
+    
+    `entries` lista as rotas candidatas (conectadas na ordem das
+    interfaces, depois as estáticas, com os grupos contíguos);
+    lookup_many devolve índices nela, e `widths` guarda a largura do grupo
+    de cada entrada.
+    """
+    
+    def __init__(self, interfaces: Dict[str, NetworkInterface], routing_table: Iterable[Route],
+                 seed: int = 0):
+        # Redes diretamente conectadas: prefixo -> {rede: (ordem, rota)}
+        connected: Dict[int, Dict[int, Tuple[int, Route]]] = {}
+        for order, (iface_name, iface) in enumerate(interfaces.items()):
+            network = iface.network_address
+            bucket = connected.setdefault(iface.prefix_len, {})
+            bucket.setdefault(network, (order, Route(network, iface.prefix_len, None, iface_name)))
+        
+        # Rotas estáticas: prefixo -> {rede: grupo ECMP}
+        routes: Dict[int, Dict[int, List[Route]]] = {}
+        for route in routing_table:
+            group = routes.setdefault(route.prefix_len, {}).setdefault(route.destination, [])
+            if route not in group:
+                group.append(route)
+        
+        self._connected = [(prefix_mask(length), connected[length])
+                           for length in sorted(connected, reverse=True)]
+        self._routes = [(prefix_mask(length), routes[length])
+                        for length in sorted(routes, reverse=True)]
+        
+        self.entries: List[Route] = [route for _, route in sorted(
+            entry for bucket in connected.values() for entry in bucket.values())]
+        # Largura do grupo de cada entrada (1 para as conectadas)
+        self.widths = array('i', [1] * len(self.entries))
+        for bucket in routes.values():
+            for group in bucket.values():
+                self.entries.extend(group)
+                self.widths.extend([len(group)] * len(group))
+        self._entry_index = {route: index for index, route in enumerate(self.entries)}
+        self.ecmp = any(width > 1 for width in self.widths)
+        self.seed = seed & 0x7FFFFFFF
+        self._vectors = None
+    
+    def select(self, flow_hash: int, width: int) -> int:
+        """Membro de um grupo ECMP de `width` rotas usado por um hash de fluxo"""
+        return (((flow_hash + self.seed) * 0x9E3779B1 & 0xFFFFFFFF) >> 16) % width
+    
+    def lookup(self, dest_ip: int, flow_hash: Optional[int] = None) -> Optional[Route]:
+        """Busca a rota para um IP de destino (inteiro)
+        
+        Com `flow_hash` (ver flow_hash()) escolhe o membro do grupo ECMP.
+        """
+        best = None
+        for mask, bucket in self._connected:
+            entry = bucket.get(dest_ip & mask)
+            if entry is not None and (best is None or entry[0] < best[0]):
+                best = entry
+        if best is not None:
+            return best[1]
+        
+        for mask, bucket in self._routes:
+            group = bucket.get(dest_ip & mask)
+            if group is not None:
+                if flow_hash is None or len(group) == 1:
+                    return group[0]
+                return group[self.select(flow_hash, len(group))]
+        
+        return None
+    
+    def lookup_many(self, dest_ips, flow_hashes=None):
+        """Busca as rotas de muitos IPs de destino (inteiros) de uma vez
+        
+        Retorna, para cada destino, o índice da rota em `entries` (-1 se
+        não houver rota): um array NumPy int32 quando o NumPy está
+        disponível (mascaramento vetorizado por comprimento de prefixo) ou
+        um array('i') calculado com lookup. `flow_hashes`, com a mesma
+        forma de `dest_ips`, escolhe os membros dos grupos ECMP.
+        """
+        if not NUMPY_AVAILABLE:
+            index = self._entry_index
+            if flow_hashes is None:
+                return array('i', (index.get(self.lookup(int(ip)), -1) for ip in dest_ips))
+            return array('i', (index.get(self.lookup(int(ip), int(h)), -1)
+                               for ip, h in zip(dest_ips, flow_hashes)))
+        
+        connected, routes = self._get_vectors()
+        dest = np.asarray(dest_ips, dtype=np.uint32)
+        result = np.full(dest.shape, -1, dtype=np.int32)
+        
+        # Conectadas: entre as que casam, vence a de menor ordem de interface
+        best = np.full(dest.shape, len(self.entries), dtype=np.int32)
+        for mask, networks, indices in connected:
+            keys = dest & mask
+            pos = np.minimum(np.searchsorted(networks, keys), len(networks) - 1)
+            hit = (networks[pos] == keys) & (indices[pos] < best)
+            best[hit] = indices[pos[hit]]
+        matched = best < len(self.entries)
+        result[matched] = best[matched]
+        
+        # Estáticas: do prefixo mais longo ao mais curto, só para os pendentes
+        pending = np.flatnonzero(~matched)
+        for mask, networks, indices in routes:
+            if not pending.size:
+                break
+            keys = dest.flat[pending] & mask
+            pos = np.minimum(np.searchsorted(networks, keys), len(networks) - 1)
+            hit = networks[pos] == keys
+            result.flat[pending[hit]] = indices[pos[hit]]
+            pending = pending[~hit]
+        
+        if flow_hashes is not None and self.ecmp:
+            flat = result.reshape(-1)
+            routed = np.flatnonzero(flat >= 0)
+            widths = np.frombuffer(self.widths, dtype=np.int32)[flat[routed]]
+            multi = widths > 1
+            routed, widths = routed[multi], widths[multi]
+            hashes = np.asarray(flow_hashes, dtype=np.uint64).reshape(-1)[routed]
+            mixed = ((hashes + np.uint64(self.seed)) * np.uint64(0x9E3779B1)) & np.uint64(0xFFFFFFFF)
+            flat[routed] += ((mixed >> np.uint64(16)) % widths.astype(np.uint64)).astype(np.int32)
+        return result
+    
+    def _get_vectors(self):
+        """Arrays ordenados (máscara, redes, índices em entries) por prefixo"""
+        if self._vectors is None:
+            def build(groups, index_of):
+                tables = []
+                for mask, bucket in groups:
+                    networks = sorted(bucket)
+                    tables.append((np.uint32(mask), np.array(networks, dtype=np.uint32),
+                                   np.array([index_of(bucket[n]) for n in networks], dtype=np.int32)))
+                return tables
+            
+            index = self._entry_index
+            self._vectors = (build(self._connected, lambda entry: index[entry[1]]),
+                             build(self._routes, lambda group: index[group[0]]))
+        return self._vectors
+
+
+def summarize_routes(routing_table: Iterable[Route]) -> List[Route]:
+    """Sumariza uma tabela de rotas estáticas sem alterar o longest prefix match
+    
+    Rotas de mesmo prefixo formam um grupo ECMP (duplicatas exatas são
+    descartadas) cuja saída é a sequência de (próximo hop, interface) dos
+    membros. Grupos cobertos por um grupo menos específico com a mesma
+    saída são descartados. Pares de prefixos irmãos com a mesma saída são
+    então agregados na superrede comum, do prefixo mais longo ao mais curto,
+    enquanto a superrede não existir na tabela com outra saída. Como cada
+    agregação cobre exatamente os dois irmãos, o resultado da busca é o
+    mesmo para qualquer endereço.
+    """
+    # (rede, prefixo) -> grupo de rotas, na ordem de inserção
+    table: Dict[Tuple[int, int], List[Route]] = {}
+    for route in routing_table:
+        group = table.setdefault((route.destination, route.prefix_len), [])
+        if route not in group:
+            group.append(route)
+    masks = [prefix_mask(length) for length in range(33)]
+    lengths = sorted({prefix_len for _, prefix_len in table}, reverse=True)
+    
+    def action(group: List[Route]) -> Tuple[Tuple[int, str], ...]:
+        return tuple((route.next_hop, route.interface) for route in group)
+    
+    def inherited(network: int, prefix_len: int) -> Optional[Tuple[Tuple[int, str], ...]]:
+        """Saída do grupo menos específico mais próximo que cobre a rede"""
+        for length in lengths:
+            if length < prefix_len:
+                group = table.get((network & masks[length], length))
+                if group is not None:
+                    return action(group)
+        return None
+    
+    # Remove grupos redundantes; a saída herdada de cada grupo removido é a
+    # mesma, então a decisão pode usar a tabela original
+    redundant = [key for key, group in table.items() if inherited(*key) == action(group)]
+    for key in redundant:
+        del table[key]
+    
+    # Agrega irmãos, do prefixo mais longo para o mais curto
+    by_length: Dict[int, List[int]] = {}
+    for network, prefix_len in table:
+        by_length.setdefault(prefix_len, []).append(network)
+    for prefix_len in range(32, 0, -1):
+        for network in sorted(by_length.get(prefix_len, ())):
+            group = table.get((network, prefix_len))
+            sibling = table.get((network ^ (1 << (32 - prefix_len)), prefix_len))
+            if group is None or sibling is None or action(group) != action(sibling):
+                continue
+            parent = (network & masks[prefix_len - 1], prefix_len - 1)
+            if parent in table:
+                continue
+            del table[(network, prefix_len)]
+            del table[(network ^ (1 << (32 - prefix_len)), prefix_len)]
+            if inherited(*parent) != action(group):
+                table[parent] = [Route(parent[0], parent[1], route.next_hop, route.interface) for route in group]
+                by_length.setdefault(parent[1], []).append(parent[0])
+                if parent[1] not in lengths:
+                    lengths = sorted(set(lengths) | {parent[1]}, reverse=True)
+    
+    return [route for key in sorted(table) for route in table[key]]
+
+
+class RouteCache:
+    """Cache LRU de resultados de roteamento com invalidação por dependência
+    
+    Cada entrada guarda as dependências que a produziram (nomes de
+    dispositivos consultados e IPs resolvidos); alterar uma delas descarta
+    apenas as entradas afetadas.
+    """
+    
+    MISSING = object()
+    
+    def __init__(self, maxsize: int = 65536):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Tuple, Tuple]' = OrderedDict()
+        self._dependents: Dict[object, set] = {}
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, key: Tuple):
+        """Retorna o valor em cache ou RouteCache.MISSING (a chave começa pelo tipo)"""
+        entry = self._entries.get(key)
+        kind = key[0]
+        if entry is None:
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+            return self.MISSING
+        self._entries.move_to_end(key)
+        self.hits[kind] = self.hits.get(kind, 0) + 1
+        return entry[0]
+    
+    def put(self, key: Tuple, value, deps):
+        """Armazena um valor e registra suas dependências"""
+        if self.maxsize <= 0:
+            return
+        if key in self._entries:
+            self._discard(key)
+        deps = tuple(set(deps))
+        self._entries[key] = (value, deps)
+        for dep in deps:
+            self._dependents.setdefault(dep, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._discard(next(iter(self._entries)))
+            self.evictions += 1
+    
+    def invalidate(self, dep):
+        """Descarta todas as entradas que dependem de `dep`"""
+        keys = self._dependents.pop(dep, None)
+        if not keys:
+            return
+        for key in list(keys):
+            self._discard(key)
+            self.invalidations += 1
+    
+    def clear(self):
+        """Esvazia o cache (os contadores são mantidos)"""
+        self._entries.clear()
+        self._dependents.clear()
+    
+    def _discard(self, key: Tuple):
+        _, deps = self._entries.pop(key)
+        for dep in deps:
+            keys = self._dependents.get(dep)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[dep]
+    
+    def stats(self) -> Dict:
+        """Retorna os contadores de acertos e falhas por tipo de consulta"""
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': dict(self.hits),
+            'misses': dict(self.misses),
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+class DeviceCounters:
+    """Contadores de instrumentação de um dispositivo"""
+    
+    __slots__ = ('route_lookups', 'route_cache_hits', 'route_ns', 'hops', 'probes', 'probe_samples')
+    
+    def __init__(self):
+        for slot in self.__slots__:
+            setattr(self, slot, 0)
+    
+    def as_dict(self) -> Dict:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class Instrumentation:
+    """Contadores e tempos dos caminhos críticos de uma topologia
+    
+    Ativada por NetworkTopology.enable_instrumentation; desativada, os
+    caminhos críticos fazem apenas uma comparação com None. Conta e
+    cronometra buscas de rotas e de dispositivos, traces (hops percorridos
+    e acertos de cache) e amostras de probes, por dispositivo. Com
+    `dump_interval` (segundos de tempo real), um snapshot é entregue a
+    `dump` periodicamente: um caminho (uma linha JSON por snapshot), uma
+    função ou, por padrão, a saída de erro.
+    """
+    
+    def __init__(self, dump_interval: Optional[float] = None,
+                 dump: Union[str, Callable[[Dict], None], None] = None):
+        self.devices: Dict[str, DeviceCounters] = {}
+        self.device_lookups = 0
+        self.device_lookup_misses = 0
+        self.device_lookup_ns = 0
+        self.traces = 0
+        self.trace_cache_hits = 0
+        self.trace_ns = 0
+        self.probes = 0
+        self.probe_samples = 0
+        self.probe_samples_received = 0
+        self.probe_ns = 0
+        self.started = time.time()
+        self._start_ns = time.perf_counter_ns()
+        self.dump_interval = dump_interval
+        self.dump = dump
+        self.dumps = 0
+        self._next_dump = self._start_ns + int(dump_interval * 1e9) if dump_interval else None
+    
+    def device(self, name: str) -> DeviceCounters:
+        """Retorna (criando se preciso) os contadores de um dispositivo"""
+        counters = self.devices.get(name)
+        if counters is None:
+            counters = self.devices[name] = DeviceCounters()
+        return counters
+    
+    def record_route(self, name: str, started: int, cache_hit: bool):
+        """Registra uma busca de rota iniciada em `started` (perf_counter_ns)"""
+        now = time.perf_counter_ns()
+        counters = self.device(name)
+        counters.route_lookups += 1
+        counters.route_ns += now - started
+        if cache_hit:
+            counters.route_cache_hits += 1
+        self._tick(now)
+    
+    def record_device_lookup(self, started: int, found: bool):
+        """Registra uma busca de dispositivo por IP"""
+        now = time.perf_counter_ns()
+        self.device_lookups += 1
+        self.device_lookup_ns += now - started
+        if not found:
+            self.device_lookup_misses += 1
+        self._tick(now)
+    
+    def record_trace(self, hops: List[Tuple['NetworkDevice', str]], started: int, cache_hit: bool):
+        """Registra um trace e os hops percorridos em cada dispositivo do caminho"""
+        now = time.perf_counter_ns()
+        self.traces += 1
+        self.trace_ns += now - started
+        if cache_hit:
+            self.trace_cache_hits += 1
+        for device, _ in hops:
+            self.device(device.name).hops += 1
+        self._tick(now)
+    
+    def record_probe(self, hops: List[Tuple['NetworkDevice', str]], sent: int, received: int, started: int):
+        """Registra um probe: amostras enviadas pela origem e encaminhadas por cada hop"""
+        now = time.perf_counter_ns()
+        self.probes += 1
+        self.probe_samples += sent
+        self.probe_samples_received += received
+        self.probe_ns += now - started
+        if hops:
+            self.device(hops[0][0].name).probes += 1
+        for device, _ in hops:
+            self.device(device.name).probe_samples += sent
+        self._tick(now)
+    
+    def _tick(self, now: int):
+        if self._next_dump is not None and now >= self._next_dump:
+            self._next_dump = now + int(self.dump_interval * 1e9)
+            self.write_dump()
+    
+    def write_dump(self):
+        """Entrega um snapshot ao destino configurado em `dump`"""
+        snapshot = self.snapshot()
+        self.dumps += 1
+        if callable(self.dump):
+            self.dump(snapshot)
+        elif self.dump is not None:
+            with open(self.dump, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(snapshot) + '\n')
+        else:
+            print(json.dumps(snapshot), file=sys.stderr)
+    
+    def reset(self):
+        """Zera todos os contadores"""
+        self.__init__(self.dump_interval, self.dump)
+    
+    def snapshot(self) -> Dict:
+        """Retorna os contadores atuais (tempos em nanossegundos)"""
+        route_lookups = sum(counters.route_lookups for counters in self.devices.values())
+        return {
+            'started': self.started,
+            'elapsed_s': round((time.perf_counter_ns() - self._start_ns) / 1e9, 6),
+            'route_lookups': route_lookups,
+            'route_cache_hits': sum(counters.route_cache_hits for counters in self.devices.values()),
+            'route_ns': sum(counters.route_ns for counters in self.devices.values()),
+            'device_lookups': self.device_lookups,
+            'device_lookup_misses': self.device_lookup_misses,
+            'device_lookup_ns': self.device_lookup_ns,
+            'traces': self.traces,
+            'trace_cache_hits': self.trace_cache_hits,
+            'trace_ns': self.trace_ns,
+            'hops': sum(counters.hops for counters in self.devices.values()),
+            'probes': self.probes,
+            'probe_samples': self.probe_samples,
+            'probe_samples_received': self.probe_samples_received,
+            'probe_ns': self.probe_ns,
+            'devices': {name: counters.as_dict() for name, counters in sorted(self.devices.items())}
+        }
+
+
 class NetworkDevice:
     """Classe base para dispositivos de rede"""
     
+    __slots__ = ('name', 'device_type', 'routing_table', 'connections', 'topology', '_forwarding_table')
+    
+    # Subclasses guardam as interfaces: nome -> NetworkInterface
+    interfaces: Mapping
+    
     def __init__(self, name: str, device_type: str):
         self.name = name
         self.device_type = device_type
-        self.interfaces: Dict[str, NetworkInterface] = {}
-        self.routing_table: List[Dict] = []
+        self.routing_table = RouteTable()
         self.connections: Dict[str, 'NetworkDevice'] = {}
+        self.topology: Optional['NetworkTopology'] = None
+        self._forwarding_table: Optional[ForwardingTable] = None
     
-    def add_interface(self, interface_name: str, ip: str, mask: str):
+    def add_interface(self, interface_name: str, ip: Union[str, int], mask: Union[str, int]):
         """Adiciona uma interface ao dispositivo"""
-        self.interfaces[interface_name] = NetworkInterface(ip, mask)
+        self._check_writable()
+        if interface_name in self.interfaces:
+            self.remove_interface(interface_name)
+        self._store_interface(interface_name, NetworkInterface(ip, mask))
+        self.invalidate_forwarding_table()
+        if self.topology is not None:
+            self.topology._index_interface(self, interface_name)
+    
+    def remove_interface(self, interface_name: str) -> Optional[NetworkInterface]:
+        """Remove uma interface do dispositivo"""
+        self._check_writable()
+        iface = self._pop_interface(interface_name)
+        if iface is None:
+            return None
+        self.invalidate_forwarding_table()
+        if self.topology is not None:
+            self.topology._unindex_interface(self, interface_name, iface)
+        return iface
+    
+    def _store_interface(self, interface_name: str, iface: NetworkInterface):
+        self.interfaces[interface_name] = iface
+    
+    def _pop_interface(self, interface_name: str) -> Optional[NetworkInterface]:
+        return self.interfaces.pop(interface_name, None)
     
     def add_connection(self, interface_name: str, device: 'NetworkDevice'):
         """Adiciona uma conexão com outro dispositivo"""
+        self._check_writable()
         self.connections[interface_name] = device
+        self._notify_changed()
     
-    def add_route(self, destination: str, mask: str, next_hop: str, interface: str):
+    def add_route(self, destination: Union[str, int], mask: Union[str, int],
+                  next_hop: Union[str, int], interface: str):
         """Adiciona uma rota à tabela de roteamento"""
-        self.routing_table.append({
-            'destination': destination,
-            'mask': mask,
-            'next_hop': next_hop,
-            'interface': interface
-        })
+        self._check_writable()
+        network = as_address(destination)
+        prefix_len = prefix_length(mask)
+        if network & ~prefix_mask(prefix_len) & 0xFFFFFFFF:
+            raise ValueError(f"Rede com bits de host: {int_to_ip(network)}/{prefix_len}")
+        self.routing_table.append(Route(network, prefix_len, as_address(next_hop), interface))
+        self.invalidate_forwarding_table()
+    
+    def summarize_routes(self) -> Tuple[int, int]:
+        """Substitui a tabela de roteamento pela versão sumarizada
+        
+        Retorna o número de rotas antes e depois da sumarização.
+        """
+        self._check_writable()
+        before = len(self.routing_table)
+        self.routing_table = RouteTable(summarize_routes(self.routing_table))
+        self.invalidate_forwarding_table()
+        return before, len(self.routing_table)
+    
+    def invalidate_forwarding_table(self):
+        """Descarta a tabela de encaminhamento compilada
+        
+        Deve ser chamado se `interfaces` ou `routing_table` forem alterados
+        diretamente, sem passar por add_interface/add_route.
+        """
+        self._forwarding_table = None
+        self._notify_changed()
     
-    def get_route(self, destination_ip: str) -> Optional[Dict]:
-        """Encontra a rota para um IP de destino"""
-        dest_ip = ipaddress.ip_address(destination_ip)
-        
-        # Verifica se é uma rede diretamente conectada
-        for iface_name, iface in self.interfaces.items():
-            if dest_ip in iface.network:
-                return {
-                    'destination': str(iface.network.network_address),
-                    'mask': str(iface.network.prefixlen),
-                    'next_hop': 'directly connected',
-                    'interface': iface_name
-                }
-        
-        # Busca na tabela de roteamento
-        best_match = None
-        best_prefix_len = -1
-        
-        for route in self.routing_table:
-            network = ipaddress.ip_network(f"{route['destination']}/{route['mask']}")
-            if dest_ip in network:
-                prefix_len = network.prefixlen
-                if prefix_len > best_prefix_len:
-                    best_match = route
-                    best_prefix_len = prefix_len
-        
-        return best_match
+    def _check_writable(self):
+        """Impede alterações em dispositivos de um snapshot somente leitura"""
+        if self.topology is not None and self.topology.read_only:
+            raise RuntimeError(f"Topologia somente leitura: {self.name} não pode ser alterado")
+    
+    def _notify_changed(self):
+        """Avisa a topologia que o estado do dispositivo mudou"""
+        if self.topology is not None:
+            self.topology._on_device_changed(self)
+    
+    def get_forwarding_table(self) -> ForwardingTable:
+        """Retorna a tabela de encaminhamento, compilando-a se necessário"""
+        if self._forwarding_table is None:
+            self._forwarding_table = ForwardingTable(self.interfaces, self.routing_table,
+                                                     zlib.crc32(self.name.encode()))
+        return self._forwarding_table
+    
+    def lookup_many(self, dest_ips, flow_hashes=None):
+        """Busca em lote as rotas de IPs inteiros (ver ForwardingTable.lookup_many)
+        
+        Os índices retornados referem-se a get_forwarding_table().entries.
+        """
+        return self.get_forwarding_table().lookup_many(dest_ips, flow_hashes)
+    
+    def get_route(self, destination_ip: str, flow_hash: Optional[int] = None) -> Optional[Route]:
+        """Encontra a rota para um IP de destino
+        
+        Com `flow_hash` escolhe a rota do fluxo entre as de custo igual.
+        """
+        topology = self.topology
+        if topology is None:
+            cache = metrics = None
+        else:
+            cache = topology.route_cache
+            metrics = topology.metrics
+            if metrics is not None:
+                started = time.perf_counter_ns()
+        if cache is not None:
+            key = ('route', self.name, destination_ip) if flow_hash is None \
+                else ('route', self.name, destination_ip, flow_hash)
+            route = cache.get(key)
+            if route is not RouteCache.MISSING:
+                if metrics is not None:
+                    metrics.record_route(self.name, started, True)
+                return route
+        
+        try:
+            route = self.get_forwarding_table().lookup(ip_to_int(destination_ip), flow_hash)
+        except ValueError:
+            # Endereços IPv6 válidos nunca casam com as redes IPv4
+            ipaddress.ip_address(destination_ip)
+            route = None
+        
+        if cache is not None:
+            cache.put(key, route, (self.name,))
+        if metrics is not None:
+            metrics.record_route(self.name, started, False)
+        return route
+    
+    def __getstate__(self):
+        # Conexões são serializadas por nome para não encadear a recursão
+        # do pickle por toda a topologia; NetworkTopology as religa
+        state = {slot: getattr(self, slot)
+                 for cls in type(self).__mro__ for slot in getattr(cls, '__slots__', ())}
+        state['connections'] = {iface: peer.name for iface, peer in self.connections.items()}
+        return state
+    
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
     
     def __str__(self):
         return f"{self.device_type} {self.name}"
 
 
+class _HostInterfaces(Mapping):
+    """Visão somente leitura da interface de um host, no formato de `interfaces`"""
+    
+    __slots__ = ('_interface',)
+    
+    def __init__(self, interface: Optional[NetworkInterface]):
+        self._interface = interface
+    
+    def __getitem__(self, interface_name: str) -> NetworkInterface:
+        if interface_name != Host.INTERFACE or self._interface is None:
+            raise KeyError(interface_name)
+        return self._interface
+    
+    def __iter__(self) -> Iterator[str]:
+        if self._interface is not None:
+            yield Host.INTERFACE
+    
+    def __len__(self) -> int:
+        return 0 if self._interface is None else 1
+    
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
 class Host(NetworkDevice):
-    """Representa um host na rede"""
+    """Representa um host na rede
     
-    def __init__(self, name: str, ip: str, mask: str, gateway: str):
+    O host tem uma única interface (eth0), guardada em um slot; `interfaces`
+    é uma visão somente leitura dela e `interface` dá acesso direto.
+    """
+    
+    __slots__ = ('_interface', '_gateway', '_active')
+    
+    INTERFACE = 'eth0'
+    
+    def __init__(self, name: str, ip: Union[str, int], mask: Union[str, int], gateway: Union[str, int]):
         super().__init__(name, "Host")
-        self.add_interface("eth0", ip, mask)
-        self.gateway = gateway
-        self.active = True
+        self._interface: Optional[NetworkInterface] = None
+        self.add_interface(self.INTERFACE, ip, mask)
+        self._gateway = as_address(gateway)
+        self._active = True
+    
+    @property
+    def gateway(self) -> str:
+        return int_to_ip(self._gateway)
+    
+    @gateway.setter
+    def gateway(self, value: Union[str, int]):
+        self._check_writable()
+        self._gateway = as_address(value)
+        self._notify_changed()
+    
+    @property
+    def gateway_address(self) -> int:
+        """Endereço do gateway como inteiro"""
+        return self._gateway
+    
+    @property
+    def active(self) -> bool:
+        return self._active
+    
+    @active.setter
+    def active(self, value: bool):
+        self._check_writable()
+        if value != self._active:
+            self._active = value
+            self._notify_changed()
+    
+    @property
+    def interface(self) -> Optional[NetworkInterface]:
+        return self._interface
+    
+    @property
+    def interfaces(self) -> Mapping:
+        return _HostInterfaces(self._interface)
+    
+    @interfaces.setter
+    def interfaces(self, interfaces: Mapping):
+        # Substitui a interface de uma vez, antes de o host entrar na topologia
+        if set(interfaces) - {self.INTERFACE}:
+            raise ValueError(f"Host {self.name} tem uma única interface ({self.INTERFACE})")
+        self._interface = interfaces.get(self.INTERFACE)
+    
+    def _store_interface(self, interface_name: str, iface: NetworkInterface):
+        if interface_name != self.INTERFACE:
+            raise ValueError(f"Host {self.name} tem uma única interface ({self.INTERFACE})")
+        self._interface = iface
+    
+    def _pop_interface(self, interface_name: str) -> Optional[NetworkInterface]:
+        if interface_name != self.INTERFACE:
+            return None
+        iface, self._interface = self._interface, None
+        return iface
     
     def get_ip(self):
-        return self.interfaces["eth0"].ip
+        return self._interface.ip
 
 
 class Router(NetworkDevice):
     """Representa um roteador na rede"""
     
+    __slots__ = ('interfaces', 'router_type')
+    
     def __init__(self, name: str, router_type: str):
         super().__init__(name, f"Router-{router_type}")
+        self.interfaces: Dict[str, NetworkInterface] = {}
         self.router_type = router_type
 
 
+class RealClock:
+    """Relógio de tempo real: esperar bloqueia de fato"""
+    
+    def now(self) -> float:
+        return time.time()
+    
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+    
+    async def async_sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class SimulatedClock:
+    """Relógio simulado: esperar apenas avança o tempo virtual"""
+    
+    def __init__(self, start: Optional[float] = None):
+        self._now = time.time() if start is None else start
+    
+    def now(self) -> float:
+        return self._now
+    
+    def sleep(self, seconds: float):
+        self._now += seconds
+    
+    async def async_sleep(self, seconds: float):
+        # Avança o tempo virtual e apenas cede o loop; probes concorrentes
+        # em relógio simulado são escalonados por probe_many
+        self._now += seconds
+        await asyncio.sleep(0)
+
+
+def substream(seed: int, index: int) -> random.Random:
+    """Gerador independente número `index` derivado de `seed`
+    
+    Depende só de (seed, index), não da ordem, da thread ou do processo em
+    que é criado; campanhas com semente usam um por probe.
+    """
+    return random.Random(f"{seed}/{index}")
+
+
+class PathMatrix:
+    """Matriz de alcançabilidade, hops e caminhos entre todos os hosts
+    
+    Para cada destino é construída uma árvore de encaminhamento (IP de
+    entrada -> próximo IP) compartilhada por todas as origens, de modo que
+    o sufixo comum dos caminhos é percorrido uma única vez. Destinos na
+    mesma subrede compartilham a árvore quando nenhuma tabela possui
+    prefixo mais específico dentro dela. Os resultados são os mesmos de
+    trace_route: um par é alcançável quando o caminho termina no destino.
+    """
+    
+    def __init__(self, topology: 'NetworkTopology', hosts: List['Host'], keep_paths: bool = False):
+        self.topology = topology
+        self.hosts = hosts
+        self._host_index = {host.name: i for i, host in enumerate(hosts)}
+        
+        # Origens com o mesmo gateway compartilham a entrada na árvore
+        gateways: Dict[str, int] = {}
+        self._source_gateway = [gateways.setdefault(host.gateway, len(gateways)) for host in hosts]
+        self._gateways = list(gateways)
+        
+        self._dest_group: List[int] = []
+        self._group_hops: List[array] = []
+        self._group_trees: List[Dict[str, Tuple]] = []
+        self._build(keep_paths)
+    
+    def _build(self, keep_paths: bool):
+        """Calcula as árvores de encaminhamento por grupo de destinos"""
+        topology = self.topology
+        gateway_labels = [1 if topology.get_device_by_ip(ip) else 0 for ip in self._gateways]
+        
+        # Subredes dos destinos que não possuem prefixo mais específico em nenhuma tabela
+        subnets: Dict[Tuple[int, int], List[int]] = {}
+        for i, host in enumerate(self.hosts):
+            iface = host.interface
+            key = (iface.network_address, iface.prefix_len)
+            subnets.setdefault(key, []).append(i)
+        splittable = topology.subnets_with_specifics(set(subnets))
+        
+        self._dest_group = [0] * len(self.hosts)
+        for key, members in subnets.items():
+            pending = [members] if key not in splittable else [[i] for i in members]
+            while pending:
+                group = pending.pop()
+                tree: Dict[str, Tuple] = {}
+                representative = self.hosts[group[0]].get_ip()
+                hops = array('i', (self._walk(ip, representative, tree, label)
+                                   for ip, label in zip(self._gateways, gateway_labels)))
+                
+                if len(group) > 1 and any(self.hosts[i].get_ip() in tree for i in group):
+                    # Um IP da subrede aparece no caminho: calcula cada destino separadamente
+                    pending.extend([i] for i in group)
+                    continue
+                
+                for i in group:
+                    self._dest_group[i] = len(self._group_hops)
+                self._group_hops.append(hops)
+                self._group_trees.append(tree if keep_paths else None)
+    
+    def _walk(self, start_ip: str, dest_ip: str, tree: Dict[str, Tuple], start_label: int) -> int:
+        """Percorre a árvore a partir de um IP de entrada e retorna os hops (-1 se inalcançável)"""
+        topology = self.topology
+        chain = []
+        in_chain = set()
+        ip = start_ip
+        
+        while True:
+            if ip == dest_ip:
+                base = (0, True, None)
+                tree[ip] = base
+                break
+            if ip in tree:
+                base = tree[ip]
+                break
+            if ip in in_chain:
+                base = (0, False, None)  # Laço de roteamento
+                break
+            in_chain.add(ip)
+            
+            device = topology.get_device_by_ip(ip)
+            route = device.get_route(dest_ip) if device and not isinstance(device, Host) else None
+            if not route:
+                base = (0, False, None)
+                tree[ip] = base
+                break
+            
+            if route.next_hop is None:
+                reached = topology.get_device_by_ip(dest_ip) is not None
+                base = (1 if reached else 0, reached, None)
+                tree[ip] = base
+                break
+            
+            next_ip = int_to_ip(route.next_hop)
+            chain.append((ip, next_ip, 1 if topology.get_device_by_ip(next_ip) else 0))
+            ip = next_ip
+        
+        hops, reached, _ = base
+        for ip, next_ip, label in reversed(chain):
+            hops += label
+            tree[ip] = (hops, reached, next_ip)
+        
+        entry = tree[start_ip]
+        return entry[0] + start_label if entry[1] else -1
+    
+    def _lookup(self, source: str, dest: str) -> Tuple[int, int]:
+        return self._host_index[source], self._host_index[dest]
+    
+    def hops(self, source: str, dest: str) -> Optional[int]:
+        """Número de hops entre dois hosts (None se inalcançável)"""
+        src, dst = self._lookup(source, dest)
+        hops = self._group_hops[self._dest_group[dst]][self._source_gateway[src]]
+        return hops if hops >= 0 else None
+    
+    def reachable(self, source: str, dest: str) -> bool:
+        """Indica se o destino é alcançável a partir da origem"""
+        return self.hops(source, dest) is not None
+    
+    def path(self, source: str, dest: str) -> List[str]:
+        """Caminho entre dois hosts no mesmo formato de trace_route"""
+        src, dst = self._lookup(source, dest)
+        tree = self._group_trees[self._dest_group[dst]]
+        source_host, dest_host = self.hosts[src], self.hosts[dst]
+        if tree is None or not self.reachable(source, dest):
+            return self.topology.trace_route(source_host.get_ip(), dest_host.get_ip())
+        
+        topology = self.topology
+        dest_ip = dest_host.get_ip()
+        path = [f"{source_host.name} ({source_host.get_ip()})"]
+        ip = source_host.gateway
+        device = topology.get_device_by_ip(ip)
+        if device:
+            path.append(f"{device.name} ({ip})")
+        
+        while ip != dest_ip:
+            next_ip = tree[ip][2]
+            if next_ip is None:
+                # Rede diretamente conectada ao destino
+                path.append(f"{dest_host.name} ({dest_ip})")
+                break
+            ip = next_ip
+            device = topology.get_device_by_ip(ip)
+            if device:
+                path.append(f"{device.name} ({ip})")
+        return path
+    
+    def pairs(self):
+        """Itera sobre (origem, destino, alcançável, hops) para todos os pares"""
+        for source in self.hosts:
+            for dest in self.hosts:
+                hops = self.hops(source.name, dest.name)
+                yield source.name, dest.name, hops is not None, hops
+    
+    def summary(self) -> Dict:
+        """Resumo da matriz: total de pares, alcançáveis e inalcançáveis"""
+        sources_per_gateway = [0] * len(self._gateways)
+        for gateway in self._source_gateway:
+            sources_per_gateway[gateway] += 1
+        dests_per_group = [0] * len(self._group_hops)
+        for group in self._dest_group:
+            dests_per_group[group] += 1
+        
+        total = len(self.hosts) ** 2
+        reachable = 0
+        for hops, num_dests in zip(self._group_hops, dests_per_group):
+            reachable += num_dests * sum(count for count, value in zip(sources_per_gateway, hops)
+                                         if value >= 0)
+        return {
+            'hosts': len(self.hosts),
+            'pairs': total,
+            'reachable': reachable,
+            'unreachable': total - reachable
+        }
+
+
 class NetworkTopology:
     """Gerencia a topologia completa da rede"""
     
-    def __init__(self):
+    def __init__(self, clock=None, cache_size: int = 65536, build: bool = True, seed: Optional[int] = None):
+        # Relógio usado no espaçamento das amostras (RealClock ou SimulatedClock)
+        self.clock = clock if clock is not None else RealClock()
+        # Gerador do jitter e das perdas das amostras (com `seed`, reprodutível)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # Cache de get_route/trace_route (cache_size=0 desativa)
+        self.route_cache: Optional[RouteCache] = RouteCache(cache_size) if cache_size > 0 else None
         self.devices: Dict[str, NetworkDevice] = {}
         self.links: List[Tuple] = []
-        self._build_network()
+        # Índice IP (inteiro) -> (dispositivo, interface)
+        self._ip_index: Dict[int, Tuple[NetworkDevice, str]] = {}
+        self._link_table: Optional[LinkTable] = None
+        self._packet_engine: Optional[PacketEngine] = None
+        # Roteamento dinâmico (None: apenas rotas estáticas)
+        self.link_state: Optional['LinkStateRouting'] = None
+        # Contadores dos caminhos críticos (None: instrumentação desativada)
+        self.metrics: Optional[Instrumentation] = None
+        # Probabilidades de perda de pacotes por enlace (par de nomes ordenado) e por dispositivo
+        self.link_loss: Dict[Tuple[str, str], float] = {}
+        self.device_loss: Dict[str, float] = {}
+        self.read_only = False
+        # build=False cria uma topologia vazia (ex.: para topology_loader)
+        if build:
+            self._build_network()
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.route_cache is not None:
+            state['route_cache'] = RouteCache(self.route_cache.maxsize)
+        state['_link_table'] = None
+        state['_packet_engine'] = None
+        state['metrics'] = None
+        # Sem semente, cada cópia (ex.: o snapshot de cada worker) sorteia
+        # a sua própria sequência em vez de repetir a do original
+        if self.seed is None:
+            state['rng'] = None
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.rng is None:
+            self.rng = random.Random()
+        for device in self.devices.values():
+            device.connections = {iface: self.devices[name] for iface, name in device.connections.items()}
+    
+    def reseed(self, seed: Optional[int]):
+        """Reinicia o gerador do jitter e das perdas (None: semente aleatória)
+        
+        Cópias (snapshot, pickle) de uma topologia com semente continuam a
+        sequência do original; sem semente, cada cópia tem a sua.
+        """
+        self.seed = seed
+        self.rng.seed(seed)
+    
+    def snapshot(self, clock=None) -> 'NetworkTopology':
+        """Retorna uma cópia somente leitura da topologia
+        
+        A cópia tem caches e motor de pacotes próprios e, por padrão, um
+        SimulatedClock; tentar alterá-la levanta RuntimeError.
+        """
+        topology = pickle.loads(pickle.dumps(self, pickle.HIGHEST_PROTOCOL))
+        topology.clock = clock if clock is not None else SimulatedClock()
+        topology.read_only = True
+        return topology
+    
+    def add_device(self, device: NetworkDevice) -> NetworkDevice:
+        """Adiciona um dispositivo à topologia e indexa seus endereços
+        
+        Dispositivos devem entrar na topologia por aqui (e não atribuindo
+        diretamente em `devices`) para que o índice de IPs fique correto.
+        """
+        if self.read_only:
+            raise RuntimeError("Topologia somente leitura")
+        if device.name in self.devices:
+            self.remove_device(device.name)
+        self.devices[device.name] = device
+        device.topology = self
+        for iface_name in device.interfaces:
+            self._index_interface(device, iface_name)
+        self._on_device_changed(device)
+        return device
+    
+    def add_router(self, name: str, router_type: str) -> 'Router':
+        """Cria um roteador e o adiciona à topologia"""
+        return self.add_device(Router(name, router_type))
+    
+    def add_host(self, name: str, ip: str, mask: str, gateway: str) -> 'Host':
+        """Cria um host e o adiciona à topologia"""
+        return self.add_device(Host(name, ip, mask, gateway))
+    
+    def remove_device(self, name: str) -> Optional[NetworkDevice]:
+        """Remove um dispositivo da topologia"""
+        if self.read_only:
+            raise RuntimeError("Topologia somente leitura")
+        device = self.devices.get(name)
+        if device is None:
+            return None
+        # Tira os IPs do índice antes: num snapshot, o dono de cada entrada
+        # ainda não materializada é buscado pelo nome em self.devices
+        for iface_name, iface in device.interfaces.items():
+            self._unindex_interface(device, iface_name, iface)
+        del self.devices[name]
+        self._on_device_changed(device)
+        device.topology = None
+        return device
+    
+    def add_link(self, src: str, dst: str, link_type: str, capacity: str):
+        """Registra um enlace entre dois dispositivos com tipo e capacidade"""
+        if self.read_only:
+            raise RuntimeError("Topologia somente leitura")
+        self.links.append((src, dst, link_type, capacity))
+        self.reset_packet_engine()
+    
+    @staticmethod
+    def _loss_probability(probability: float) -> float:
+        probability = float(probability)
+        if not 0.0 <= probability <= 1.0:
+            raise ValueError(f"Probabilidade de perda inválida: {probability} (use um valor entre 0 e 1)")
+        return probability
+    
+    def set_link_loss(self, src: str, dst: str, probability: float):
+        """Define a probabilidade de perda de cada pacote que atravessa o enlace src <-> dst
+        
+        Vale para os dois sentidos; 0 remove a perda do enlace.
+        """
+        if self.read_only:
+            raise RuntimeError("Topologia somente leitura")
+        probability = self._loss_probability(probability)
+        if not any({link[0], link[1]} == {src, dst} for link in self.links):
+            raise ValueError(f"Enlace {src} <-> {dst} não encontrado")
+        key = (src, dst) if src <= dst else (dst, src)
+        if probability:
+            self.link_loss[key] = probability
+        else:
+            self.link_loss.pop(key, None)
+    
+    def set_device_loss(self, name: str, probability: float):
+        """Define a probabilidade de um dispositivo descartar cada pacote que recebe (0 remove)"""
+        if self.read_only:
+            raise RuntimeError("Topologia somente leitura")
+        probability = self._loss_probability(probability)
+        if name not in self.devices:
+            raise ValueError(f"Dispositivo '{name}' não encontrado")
+        if probability:
+            self.device_loss[name] = probability
+        else:
+            self.device_loss.pop(name, None)
+    
+    def path_loss(self, hops: List[Tuple[NetworkDevice, str]]) -> float:
+        """Probabilidade de uma amostra de probe (pedido e resposta) se perder no caminho
+        
+        Pedido e resposta atravessam cada enlace e cada dispositivo
+        intermediário; cada extremidade recebe um dos dois pacotes.
+        """
+        if not self.link_loss and not self.device_loss:
+            return 0.0
+        losses = self.hop_losses(hops)
+        return losses[-1] if losses else 0.0
+    
+    def hop_losses(self, hops: List[Tuple[NetworkDevice, str]]) -> List[float]:
+        """Probabilidade de perda de uma amostra até cada hop, em uma única passada
+        
+        O k-ésimo valor vale para um probe que termina em hops[k + 1] (TTL
+        k + 1): o hop que responde recebe só o pedido, e a origem só a
+        resposta, como em path_loss.
+        """
+        names = [device.name for device, _ in hops]
+        if not self.link_loss and not self.device_loss:
+            return [0.0] * (len(names) - 1)
+        link_loss, device_loss = self.link_loss, self.device_loss
+        # Chance de pedido e resposta atravessarem o caminho até o hop anterior
+        through = 1.0 - device_loss.get(names[0], 0.0)
+        losses = []
+        for src, dst in zip(names, names[1:]):
+            through *= (1.0 - link_loss.get((src, dst) if src <= dst else (dst, src), 0.0)) ** 2
+            kept = 1.0 - device_loss.get(dst, 0.0)
+            losses.append(1.0 - through * kept)
+            through *= kept * kept
+        return losses
+    
+    def _on_device_changed(self, device: NetworkDevice):
+        """Invalida os resultados em cache que dependem do dispositivo"""
+        if self.route_cache is not None:
+            self.route_cache.invalidate(device.name)
+    
+    def _index_interface(self, device: NetworkDevice, iface_name: str):
+        """Registra o IP de uma interface no índice (o primeiro dono vence)"""
+        ip = device.interfaces[iface_name].address
+        if ip not in self._ip_index:
+            self._ip_index[ip] = (device, iface_name)
+            if self.route_cache is not None:
+                self.route_cache.invalidate(('ip', ip))
+    
+    def _unindex_interface(self, device: NetworkDevice, iface_name: str, iface: NetworkInterface):
+        """Remove o IP de uma interface do índice"""
+        ip = iface.address
+        if self._ip_index.get(ip) != (device, iface_name):
+            return
+        del self._ip_index[ip]
+        if self.route_cache is not None:
+            self.route_cache.invalidate(('ip', ip))
+        
+        # IP duplicado: outro dispositivo pode ainda usar o mesmo endereço
+        for other in self.devices.values():
+            if other is device:
+                continue
+            for other_name, other_iface in other.interfaces.items():
+                if other_iface.address == ip:
+                    self._ip_index[ip] = (other, other_name)
+                    return
     
     def _build_network(self):
-        """Constrói a topologia da rede conforme especificação"""
-        
-        # ===== HOSTS =====
-        self.devices['h1'] = Host('h1', '192.168.1.2', '28', '192.168.1.1')
-        self.devices['h2'] = Host('h2', '192.168.1.3', '28', '192.168.1.1')
-        self.devices['h3'] = Host('h3', '192.168.2.2', '28', '192.168.2.1')
-        self.devices['h4'] = Host('h4', '192.168.2.3', '28', '192.168.2.1')
-        self.devices['h5'] = Host('h5', '192.168.3.2', '27', '192.168.3.1')
-        self.devices['h6'] = Host('h6', '192.168.3.3', '27', '192.168.3.1')
-        self.devices['h7'] = Host('h7', '192.168.4.2', '27', '192.168.4.1')
-        self.devices['h8'] = Host('h8', '192.168.4.3', '27', '192.168.4.1')
-        
-        # ===== EDGE ROUTERS =====
-        self.devices['e1'] = Router('e1', 'Edge')
-        self.devices['e1'].add_interface('eth0', '192.168.1.1', '28')  # Para hosts h1, h2
-        self.devices['e1'].add_interface('eth1', '192.168.11.2', '30')  # Link com a1
-        
-        self.devices['e2'] = Router('e2', 'Edge')
-        self.devices['e2'].add_interface('eth0', '192.168.2.1', '28')  # Para hosts h3, h4
-        self.devices['e2'].add_interface('eth1', '192.168.12.2', '30')  # Link com a1
-        
-        self.devices['e3'] = Router('e3', 'Edge')
-        self.devices['e3'].add_interface('eth0', '192.168.3.1', '27')  # Para hosts h5, h6
-        self.devices['e3'].add_interface('eth1', '192.168.13.2', '30')  # Link com a2
-        
-        self.devices['e4'] = Router('e4', 'Edge')
-        self.devices['e4'].add_interface('eth0', '192.168.4.1', '27')  # Para hosts h7, h8
-        self.devices['e4'].add_interface('eth1', '192.168.14.2', '30')  # Link com a2
-        
-        # ===== AGGREGATION ROUTERS =====
-        self.devices['a1'] = Router('a1', 'Aggregation')
-        self.devices['a1'].add_interface('eth0', '192.168.11.1', '30')  # Link com e1
-        self.devices['a1'].add_interface('eth1', '192.168.12.1', '30')  # Link com e2
-        self.devices['a1'].add_interface('eth2', '192.168.21.2', '30')  # Link com c1
-        
-        self.devices['a2'] = Router('a2', 'Aggregation')
-        self.devices['a2'].add_interface('eth0', '192.168.13.1', '30')  # Link com e3
-        self.devices['a2'].add_interface('eth1', '192.168.14.1', '30')  # Link com e4
-        self.devices['a2'].add_interface('eth2', '192.168.22.2', '30')  # Link com c1
-        
-        # ===== CORE ROUTER =====
-        self.devices['c1'] = Router('c1', 'Core')
-        self.devices['c1'].add_interface('eth0', '192.168.21.1', '30')  # Link com a1
-        self.devices['c1'].add_interface('eth1', '192.168.22.1', '30')  # Link com a2
-        
-        # ===== CONFIGURAR CONEXÕES =====
-        self._setup_connections()
-        
-        # ===== CONFIGURAR TABELAS DE ROTEAMENTO =====
-        self._setup_routing_tables()
-        
-        # ===== CONFIGURAR LINKS =====
-        self._setup_links()
-    
-    def _setup_connections(self):
-        """Configura as conexões entre dispositivos"""
-        # Core <-> Aggregation
-        self.devices['c1'].add_connection('eth0', self.devices['a1'])
-        self.devices['c1'].add_connection('eth1', self.devices['a2'])
-        
-        # Aggregation <-> Edge
-        self.devices['a1'].add_connection('eth0', self.devices['e1'])
-        self.devices['a1'].add_connection('eth1', self.devices['e2'])
-        self.devices['a1'].add_connection('eth2', self.devices['c1'])
-        
-        self.devices['a2'].add_connection('eth0', self.devices['e3'])
-        self.devices['a2'].add_connection('eth1', self.devices['e4'])
-        self.devices['a2'].add_connection('eth2', self.devices['c1'])
-        
-        # Edge <-> Aggregation e Hosts
-        self.devices['e1'].add_connection('eth1', self.devices['a1'])
-        self.devices['e2'].add_connection('eth1', self.devices['a1'])
-        self.devices['e3'].add_connection('eth1', self.devices['a2'])
-        self.devices['e4'].add_connection('eth1', self.devices['a2'])
-    
-    def _setup_routing_tables(self):
-        """Configura as tabelas de roteamento estáticas"""
-        
-        # ===== ROUTER e1 =====
-        # Rota padrão via a1
-        self.devices['e1'].add_route('0.0.0.0', '0', '192.168.11.1', 'eth1')
-        
-        # ===== ROUTER e2 =====
-        self.devices['e2'].add_route('0.0.0.0', '0', '192.168.12.1', 'eth1')
-        
-        # ===== ROUTER e3 =====
-        self.devices['e3'].add_route('0.0.0.0', '0', '192.168.13.1', 'eth1')
-        
-        # ===== ROUTER e4 =====
-        self.devices['e4'].add_route('0.0.0.0', '0', '192.168.14.1', 'eth1')
-        
-        # ===== ROUTER a1 =====
-        # Redes locais via edge routers
-        self.devices['a1'].add_route('192.168.1.0', '28', '192.168.11.2', 'eth0')
-        self.devices['a1'].add_route('192.168.2.0', '28', '192.168.12.2', 'eth1')
-        # Redes do outro lado via core
-        self.devices['a1'].add_route('192.168.3.0', '27', '192.168.21.1', 'eth2')
-        self.devices['a1'].add_route('192.168.4.0', '27', '192.168.21.1', 'eth2')
-        # Redes do a2
-        self.devices['a1'].add_route('192.168.13.0', '30', '192.168.21.1', 'eth2')
-        self.devices['a1'].add_route('192.168.14.0', '30', '192.168.21.1', 'eth2')
-        self.devices['a1'].add_route('192.168.22.0', '30', '192.168.21.1', 'eth2')
-        
-        # ===== ROUTER a2 =====
-        # Redes locais via edge routers
-        self.devices['a2'].add_route('192.168.3.0', '27', '192.168.13.2', 'eth0')
-        self.devices['a2'].add_route('192.168.4.0', '27', '192.168.14.2', 'eth1')
-        # Redes do outro lado via core
-        self.devices['a2'].add_route('192.168.1.0', '28', '192.168.22.1', 'eth2')
-        self.devices['a2'].add_route('192.168.2.0', '28', '192.168.22.1', 'eth2')
-        # Redes do a1
-        self.devices['a2'].add_route('192.168.11.0', '30', '192.168.22.1', 'eth2')
-        self.devices['a2'].add_route('192.168.12.0', '30', '192.168.22.1', 'eth2')
-        self.devices['a2'].add_route('192.168.21.0', '30', '192.168.22.1', 'eth2')
-        
-        # ===== ROUTER c1 (CORE) =====
-        # Redes via a1
-        self.devices['c1'].add_route('192.168.1.0', '28', '192.168.21.2', 'eth0')
-        self.devices['c1'].add_route('192.168.2.0', '28', '192.168.21.2', 'eth0')
-        self.devices['c1'].add_route('192.168.11.0', '30', '192.168.21.2', 'eth0')
-        self.devices['c1'].add_route('192.168.12.0', '30', '192.168.21.2', 'eth0')
-        # Redes via a2
-        self.devices['c1'].add_route('192.168.3.0', '27', '192.168.22.2', 'eth1')
-        self.devices['c1'].add_route('192.168.4.0', '27', '192.168.22.2', 'eth1')
-        self.devices['c1'].add_route('192.168.13.0', '30', '192.168.22.2', 'eth1')
-        self.devices['c1'].add_route('192.168.14.0', '30', '192.168.22.2', 'eth1')
-    
-    def _setup_links(self):
-        """Define os links da topologia com tipos de enlace"""
-        self.links = [
-            # Core <-> Aggregation (Fibra Óptica - alta capacidade)
-            ('c1', 'a1', 'Fibra Óptica', '10 Gbps'),
-            ('c1', 'a2', 'Fibra Óptica', '10 Gbps'),
-            # Aggregation <-> Edge (Fibra Óptica ou Par Trançado Cat6)
-            ('a1', 'e1', 'Par Trançado Cat6', '1 Gbps'),
-            ('a1', 'e2', 'Par Trançado Cat6', '1 Gbps'),
-            ('a2', 'e3', 'Par Trançado Cat6', '1 Gbps'),
-            ('a2', 'e4', 'Par Trançado Cat6', '1 Gbps'),
-            # Edge <-> Hosts (Par Trançado Cat5e)
-            ('e1', 'h1', 'Par Trançado Cat5e', '100 Mbps'),
-            ('e1', 'h2', 'Par Trançado Cat5e', '100 Mbps'),
-            ('e2', 'h3', 'Par Trançado Cat5e', '100 Mbps'),
-            ('e2', 'h4', 'Par Trançado Cat5e', '100 Mbps'),
-            ('e3', 'h5', 'Par Trançado Cat5e', '100 Mbps'),
-            ('e3', 'h6', 'Par Trançado Cat5e', '100 Mbps'),
-            ('e4', 'h7', 'Par Trançado Cat5e', '100 Mbps'),
-            ('e4', 'h8', 'Par Trançado Cat5e', '100 Mbps'),
-        ]
+        """Constrói a topologia padrão do projeto a partir de DEFAULT_TOPOLOGY"""
+        with open(DEFAULT_TOPOLOGY, encoding='utf-8') as f:
+            load_records(self, f)
+    
+    def summarize_routing_tables(self) -> Dict:
+        """Sumariza as tabelas de roteamento de todos os roteadores
+        
+        Retorna a redução por dispositivo, (rotas antes, rotas depois), e o total.
+        """
+        devices = {}
+        for device in self.devices.values():
+            if device.routing_table:
+                devices[device.name] = device.summarize_routes()
+        before = sum(counts[0] for counts in devices.values())
+        after = sum(counts[1] for counts in devices.values())
+        return {
+            'devices': devices,
+            'routes_before': before,
+            'routes_after': after,
+            'reduction': round(1 - after / before, 4) if before else 0.0
+        }
+    
+    def enable_link_state(self, reference_bandwidth: float = REFERENCE_BANDWIDTH,
+                          max_paths: int = ECMP_MAX_PATHS) -> Dict:
+        """Ativa o roteamento dinâmico por estado de enlace (LinkStateRouting)
+        
+        As rotas estáticas dos roteadores são substituídas pelas calculadas
+        pelo SPF, com até `max_paths` caminhos de custo igual por rede;
+        retorna o resumo da computação completa.
+        """
+        if self.read_only:
+            raise RuntimeError("Topologia somente leitura")
+        from link_state import LinkStateRouting
+        self.link_state = LinkStateRouting(self, reference_bandwidth, max_paths)
+        return self.link_state.compute()
+    
+    def _require_link_state(self) -> 'LinkStateRouting':
+        if self.read_only:
+            raise RuntimeError("Topologia somente leitura")
+        if self.link_state is None:
+            raise RuntimeError("Roteamento dinâmico inativo: use enable_link_state()")
+        return self.link_state
+    
+    def fail_link(self, src: str, dst: str) -> Dict:
+        """Simula a falha do enlace entre dois roteadores (roteamento dinâmico)
+        
+        Retorna o resumo da reconvergência incremental (ver LinkStateRouting).
+        """
+        return self._require_link_state().fail_link(src, dst)
+    
+    def restore_link(self, src: str, dst: str) -> Dict:
+        """Restabelece o enlace entre dois roteadores (roteamento dinâmico)"""
+        return self._require_link_state().restore_link(src, dst)
+    
+    def fail_device(self, name: str) -> Dict:
+        """Simula a falha de um roteador (roteamento dinâmico)"""
+        return self._require_link_state().fail_device(name)
+    
+    def restore_device(self, name: str) -> Dict:
+        """Restabelece um roteador (roteamento dinâmico)"""
+        return self._require_link_state().restore_device(name)
+    
+    def lookup_many(self, dest_ips, devices: Optional[List[str]] = None, flow_hashes=None) -> Dict:
+        """Busca em lote as rotas dos mesmos destinos em vários roteadores
+        
+        Retorna {nome do roteador: índices em entries} para `devices` (por
+        padrão, todos os roteadores); os arrays de destinos e de hashes de
+        fluxo (opcional) são convertidos uma única vez.
+        """
+        if NUMPY_AVAILABLE:
+            dest_ips = np.asarray(dest_ips, dtype=np.uint32)
+            if flow_hashes is not None:
+                flow_hashes = np.asarray(flow_hashes, dtype=np.uint64)
+        else:
+            dest_ips = array('I', dest_ips)
+            if flow_hashes is not None:
+                flow_hashes = array('L', flow_hashes)
+        if devices is None:
+            selected = [device for device in self.devices.values() if not isinstance(device, Host)]
+        else:
+            selected = [self.devices[name] for name in devices]
+        return {device.name: device.lookup_many(dest_ips, flow_hashes) for device in selected}
+    
+    def enable_instrumentation(self, dump_interval: Optional[float] = None,
+                               dump: Union[str, Callable[[Dict], None], None] = None) -> Instrumentation:
+        """Ativa (ou reinicia) a contagem dos caminhos críticos (ver Instrumentation)"""
+        self.metrics = Instrumentation(dump_interval, dump)
+        return self.metrics
+    
+    def disable_instrumentation(self) -> Optional[Dict]:
+        """Desativa a instrumentação e retorna o último snapshot"""
+        metrics, self.metrics = self.metrics, None
+        return metrics.snapshot() if metrics is not None else None
+    
+    def instrumentation_snapshot(self) -> Optional[Dict]:
+        """Snapshot dos contadores com as estatísticas do cache; None se desativada"""
+        if self.metrics is None:
+            return None
+        snapshot = self.metrics.snapshot()
+        snapshot['cache'] = self.route_cache.stats() if self.route_cache is not None else None
+        return snapshot
+    
+    @property
+    def link_table(self) -> LinkTable:
+        """Enlaces tipados (capacidade, propagação e MTU) por par de dispositivos, criados a partir de `links`"""
+        if self._link_table is None:
+            self._link_table = LinkTable(self.links)
+        return self._link_table
+    
+    def get_link(self, src: str, dst: str) -> Optional[Link]:
+        """Retorna o enlace de `src` para `dst` na tabela de enlaces, ou None"""
+        return self.link_table.get(src, dst)
+    
+    def get_packet_engine(self) -> PacketEngine:
+        """Retorna o motor de eventos de pacotes, criando-o a partir da tabela de enlaces"""
+        if self._packet_engine is None:
+            self._packet_engine = PacketEngine(self.link_table)
+        return self._packet_engine
+    
+    def reset_packet_engine(self):
+        """Descarta a tabela de enlaces e o motor de eventos (filas) após mudar `links`"""
+        self._link_table = None
+        self._packet_engine = None
+    
+    @property
+    def ip_index(self) -> Mapping:
+        """Índice IP (inteiro) -> (dispositivo, interface), somente para leitura"""
+        return self._ip_index
+    
+    def get_interface_by_ip(self, ip: str) -> Optional[Tuple[NetworkDevice, str]]:
+        """Encontra o dispositivo e a interface que possuem um IP"""
+        try:
+            return self._ip_index.get(ip_to_int(ip))
+        except ValueError:
+            return None
     
     def get_device_by_ip(self, ip: str) -> Optional[NetworkDevice]:
         """Encontra um dispositivo pelo seu IP"""
-        for device in self.devices.values():
-            if isinstance(device, Host):
-                if device.get_ip() == ip:
-                    return device
-            else:
-                for iface in device.interfaces.values():
-                    if iface.ip == ip:
-                        return device
-        return None
+        metrics = self.metrics
+        if metrics is None:
+            entry = self.get_interface_by_ip(ip)
+            return entry[0] if entry else None
+        started = time.perf_counter_ns()
+        entry = self.get_interface_by_ip(ip)
+        metrics.record_device_lookup(started, entry is not None)
+        return entry[0] if entry else None
     
-    def trace_route(self, source_ip: str, dest_ip: str) -> List[str]:
-        """Traça a rota entre origem e destino"""
-        path = []
-        current_ip = source_ip
+    @staticmethod
+    def _flow_hash(source_ip: str, dest_ip: str, flow: Optional[Tuple[int, int, int]]) -> Optional[int]:
+        """Hash de um fluxo (protocolo, porta de origem, porta de destino); None sem fluxo"""
+        if flow is None:
+            return None
+        try:
+            return flow_hash(ip_to_int(source_ip), ip_to_int(dest_ip), *flow)
+        except ValueError:
+            return None
+    
+    def _trace_path(self, source_ip: str, dest_ip: str,
+                    flow_hash: Optional[int] = None) -> List[Tuple[NetworkDevice, str]]:
+        """Traça a rota entre origem e destino como pares (dispositivo, IP)"""
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter_ns()
+        cache = self.route_cache
+        if cache is None:
+            hops = self._compute_trace_path(source_ip, dest_ip, set(), flow_hash)
+            if metrics is not None:
+                metrics.record_trace(hops, started, False)
+            return hops
+        
+        key = ('trace', source_ip, dest_ip) if flow_hash is None else ('trace', source_ip, dest_ip, flow_hash)
+        hops = cache.get(key)
+        hit = hops is not RouteCache.MISSING
+        if not hit:
+            deps = set()
+            hops = self._compute_trace_path(source_ip, dest_ip, deps, flow_hash)
+            cache.put(key, hops, deps)
+        if metrics is not None:
+            metrics.record_trace(hops, started, hit)
+        return list(hops)
+    
+    def _resolve(self, ip: str, deps: set) -> Optional[NetworkDevice]:
+        """get_device_by_ip registrando o IP como dependência do trace"""
+        try:
+            deps.add(('ip', ip_to_int(ip)))
+        except ValueError:
+            return None
+        return self.get_device_by_ip(ip)
+    
+    def _compute_trace_path(self, source_ip: str, dest_ip: str, deps: set,
+                            flow_hash: Optional[int] = None) -> List[Tuple[NetworkDevice, str]]:
+        """Executa o trace, acumulando em `deps` os dispositivos e IPs consultados"""
+        hops = []
         visited = set()
         
         # Encontra o dispositivo de origem
-        source_device = self.get_device_by_ip(source_ip)
+        source_device = self._resolve(source_ip, deps)
         if not source_device:
             return []
         
-        path.append(f"{source_device.name} ({source_ip})")
+        hops.append((source_device, source_ip))
+        current_ip = source_ip
+        current_device = source_device
         
         # Se for um host, começa pelo gateway
         if isinstance(source_device, Host):
+            deps.add(source_device.name)
             current_ip = source_device.gateway
-            gateway_device = self.get_device_by_ip(current_ip)
-            if gateway_device:
-                path.append(f"{gateway_device.name} ({current_ip})")
+            current_device = self._resolve(current_ip, deps)
+            if current_device:
+                hops.append((current_device, current_ip))
         
         # Traça a rota através dos roteadores
         while current_ip != dest_ip:
@@ -297,68 +1558,323 @@ class NetworkTopology:
                 break
             visited.add(current_ip)
             
-            current_device = self.get_device_by_ip(current_ip)
             if not current_device or isinstance(current_device, Host):
                 break
             
             # Encontra a próxima hop
-            route = current_device.get_route(dest_ip)
+            deps.add(current_device.name)
+            route = current_device.get_route(dest_ip, flow_hash)
             if not route:
                 break
             
-            if route['next_hop'] == 'directly connected':
+            if route.next_hop is None:
                 # Chegou na rede de destino
-                dest_device = self.get_device_by_ip(dest_ip)
+                dest_device = self._resolve(dest_ip, deps)
                 if dest_device:
-                    path.append(f"{dest_device.name} ({dest_ip})")
+                    hops.append((dest_device, dest_ip))
                 break
             else:
-                current_ip = route['next_hop']
-                next_device = self.get_device_by_ip(current_ip)
-                if next_device:
-                    path.append(f"{next_device.name} ({current_ip})")
+                current_ip = int_to_ip(route.next_hop)
+                current_device = self._resolve(current_ip, deps)
+                if current_device:
+                    hops.append((current_device, current_ip))
         
-        return path
+        return hops
     
-    def calculate_rtt(self, source_ip: str, dest_ip: str, num_samples: int = 3) -> Tuple[bool, List[float], float]:
-        """Calcula o RTT entre origem e destino"""
+    def trace_route(self, source_ip: str, dest_ip: str, flow: Optional[Tuple[int, int, int]] = None) -> List[str]:
+        """Traça a rota entre origem e destino
+        
+        `flow` = (protocolo, porta de origem, porta de destino) escolhe, pelo
+        hash da 5-tupla, o caminho do fluxo entre os de custo igual; sem
+        ele é seguida a primeira rota de cada grupo ECMP.
+        """
+        hops = self._trace_path(source_ip, dest_ip, self._flow_hash(source_ip, dest_ip, flow))
+        return [f"{device.name} ({ip})" for device, ip in hops]
+    
+    def compute_path_matrix(self, hosts: Optional[List[str]] = None, keep_paths: bool = False) -> PathMatrix:
+        """Calcula alcançabilidade, hops e caminhos entre todos os pares de hosts
+        
+        Com `keep_paths` as árvores de encaminhamento ficam guardadas e
+        PathMatrix.path reconstrói os caminhos sem novos traces.
+        """
+        if hosts is None:
+            selected = [device for device in self.devices.values() if isinstance(device, Host)]
+        else:
+            selected = [self.devices[name] for name in hosts]
+        return PathMatrix(self, selected, keep_paths)
+    
+    def subnets_with_specifics(self, subnets) -> set:
+        """Retorna as subredes (rede, prefixo) que contêm algum prefixo mais específico"""
+        lengths = sorted({length for _, length in subnets})
+        found = set()
+        for device in self.devices.values():
+            prefixes = [(iface.network_address, iface.prefix_len) for iface in device.interfaces.values()]
+            prefixes.extend((route.destination, route.prefix_len) for route in device.routing_table)
+            for network, prefix_len in prefixes:
+                for length in lengths:
+                    if length >= prefix_len:
+                        break
+                    key = (network & prefix_mask(length), length)
+                    if key in subnets:
+                        found.add(key)
+        return found
+    
+    def simulate_traffic(self, demands: Iterable[Tuple]) -> 'TrafficMatrix':
+        """Distribui uma matriz de tráfego pelos caminhos de trace_route
+        
+        `demands` contém tuplas (origem, destino, taxa), com hosts por nome
+        ou IP e taxa em bits/s ou como texto ('10 Mbps'); ver traffic_matrix.
+        """
+        from traffic_matrix import TrafficMatrix
+        return TrafficMatrix(self, demands)
+    
+    def _start_probe(self, source_ip: str, dest_ip: str, flow: Optional[Tuple[int, int, int]] = None,
+                     num_samples: int = 0) -> Tuple[Dict, Optional[List[Tuple[NetworkDevice, str]]]]:
+        """Valida origem e destino e traça o caminho de um probe
+        
+        Se a origem pode enviar mas o destino é inalcançável, as
+        `num_samples` amostras contam como enviadas e perdidas.
+        """
+        result = {
+            'source': source_ip,
+            'dest': dest_ip,
+            'active': False,
+            'path': [],
+            'samples': [],
+            'timestamps': [],
+            'avg_rtt': 0.0,
+            'sent': 0,
+            'received': 0,
+            'loss_pct': 0.0,
+            'timed_out': False
+        }
+        
         source_device = self.get_device_by_ip(source_ip)
-        dest_device = self.get_device_by_ip(dest_ip)
+        if not source_device or (isinstance(source_device, Host) and not source_device.active):
+            return result, None
+        result.update({'sent': num_samples, 'loss_pct': 100.0 if num_samples else 0.0})
         
-        if not source_device or not dest_device:
-            return False, [], 0.0
+        dest_device = self.get_device_by_ip(dest_ip)
+        if not dest_device:
+            return result, None
         
         if isinstance(dest_device, Host) and not dest_device.active:
-            return False, [], 0.0
+            return result, None
         
-        # Traça a rota para calcular o número de hops
-        path = self.trace_route(source_ip, dest_ip)
-        if len(path) < 2:
-            return False, [], 0.0
+        # Traça a rota percorrida pelos pacotes
+        hops = self._trace_path(source_ip, dest_ip, self._flow_hash(source_ip, dest_ip, flow))
+        if len(hops) < 2:
+            return result, None
         
-        num_hops = len(path) - 1
+        return result, hops
+    
+    def _finish_probe(self, result: Dict, hops: List[Tuple[NetworkDevice, str]],
+                      timestamps: List[float], timeout: Optional[float] = None,
+                      packet_size: Optional[int] = None, rng: Optional[random.Random] = None,
+                      engine: Optional[PacketEngine] = None) -> float:
+        """Simula as amostras enviadas em `timestamps` e preenche o resultado
         
-        # Simula RTT com variação baseada no número de hops
-        samples = []
-        base_rtt = num_hops * random.uniform(0.5, 2.0)  # Base RTT por hop
+        Retorna o tempo, a partir do primeiro envio, até a última resposta
+        recebida (ou até o prazo `timeout`, se alguma amostra não chegou a
+        tempo). Amostras perdidas (path_loss) não prolongam esse tempo: a
+        perda é sorteada sem esperar pelo timeout. Os ecos são simulados em
+        `engine` (padrão: o motor da topologia, ver get_packet_engine).
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter_ns()
+        # Simula os ecos no motor de eventos (serialização, propagação e fila)
+        route = [device.name for device, _ in hops]
+        if engine is None:
+            engine = self.get_packet_engine()
+        rtts = engine.echo_rtts(route, timestamps, packet_size)
+        loss = self.path_loss(hops)
+        rng = self.rng if rng is None else rng
         
-        for _ in range(num_samples):
+        samples = []
+        received_at = []
+        duration = 0.0
+        for at, rtt in zip(timestamps, rtts):
+            if loss and rng.random() < loss:
+                continue
             # Adiciona variação (jitter)
-            variation = random.uniform(-0.3, 0.3)
-            sample_rtt = base_rtt + variation
-            samples.append(round(sample_rtt, 2))
-            time.sleep(0.1)  # Simula delay entre amostras
+            variation = rng.uniform(0.0, JITTER_MS)
+            sample = round(rtt * 1000 + variation, 3)
+            arrival = at - timestamps[0] + sample / 1000
+            if timeout is not None and arrival > timeout:
+                result['timed_out'] = True
+                duration = timeout
+                continue
+            samples.append(sample)
+            received_at.append(at)
+            duration = max(duration, arrival)
+        
+        sent = len(timestamps)
+        result.update({
+            'active': bool(samples),
+            'path': [f"{device.name} ({ip})" for device, ip in hops],
+            'samples': samples,
+            'timestamps': received_at,
+            'avg_rtt': round(sum(samples) / len(samples), 3) if samples else 0.0,
+            'sent': sent,
+            'received': len(samples),
+            'loss_pct': round(100.0 * (sent - len(samples)) / sent, 1) if sent else 0.0
+        })
+        if metrics is not None:
+            metrics.record_probe(hops, len(timestamps), len(samples), started)
+        return duration
+    
+    def probe(self, source_ip: str, dest_ip: str, num_samples: int = 3,
+              flow: Optional[Tuple[int, int, int]] = None, timeout: Optional[float] = None,
+              packet_size: Optional[int] = None, rng: Optional[random.Random] = None) -> Dict:
+        """Executa um probe e retorna as amostras de RTT com seus instantes de envio
         
-        avg_rtt = round(sum(samples) / len(samples), 2)
+        `flow` escolhe o caminho ECMP como em trace_route, e `packet_size`
+        (bytes, padrão DEFAULT_PACKET_SIZE) o tamanho dos pacotes. 'sent',
+        'received' e 'loss_pct' contam as amostras perdidas no caminho
+        (set_link_loss, set_device_loss) ou que chegariam depois de
+        `timeout` segundos do início; `timeout` é um prazo, e amostras que
+        seriam enviadas depois dele não são enviadas. Jitter e perdas são
+        sorteados em `rng` (padrão: o gerador da topologia, ver reseed).
+        """
+        result, hops = self._start_probe(source_ip, dest_ip, flow, num_samples)
+        if hops is None:
+            return result
         
-        return True, samples, avg_rtt
+        timestamps = []
+        for i in range(num_samples):
+            if i > 0:
+                if timeout is not None and i * SAMPLE_INTERVAL >= timeout:
+                    break
+                self.clock.sleep(SAMPLE_INTERVAL)  # Simula delay entre amostras
+            timestamps.append(self.clock.now())
+        
+        self._finish_probe(result, hops, timestamps, timeout, packet_size, rng)
+        return result
+    
+    async def probe_async(self, source_ip: str, dest_ip: str, num_samples: int = 3,
+                          flow: Optional[Tuple[int, int, int]] = None, timeout: Optional[float] = None,
+                          packet_size: Optional[int] = None, rng: Optional[random.Random] = None) -> Dict:
+        """Variante assíncrona de probe
+        
+        As amostras são enviadas a cada SAMPLE_INTERVAL sem esperar a resposta
+        anterior, e a corrotina aguarda no relógio da topologia até a última
+        resposta ou até o prazo `timeout` (segundos), o que vier antes.
+        Amostras que chegariam depois do prazo são descartadas e marcam o
+        resultado com 'timed_out'. Em relógio simulado a espera avança o
+        tempo virtual; probes simultâneos devem ser escalonados por
+        probe_campaign.probe_many, que usa probe_at.
+        """
+        result, duration = self.probe_at(source_ip, dest_ip, self.clock.now(), num_samples,
+                                         flow, timeout, packet_size, rng)
+        await self.clock.async_sleep(duration)
+        return result
+    
+    def probe_at(self, source_ip: str, dest_ip: str, start: float, num_samples: int = 3,
+                 flow: Optional[Tuple[int, int, int]] = None, timeout: Optional[float] = None,
+                 packet_size: Optional[int] = None, rng: Optional[random.Random] = None,
+                 engine: Optional[PacketEngine] = None) -> Tuple[Dict, float]:
+        """Simula um probe com a primeira amostra no instante `start`, sem esperar no relógio
+        
+        Retorna o resultado (como em probe_async) e a duração do probe em
+        segundos, a partir de `start`, para quem escalona os probes. Com
+        `engine` (um PacketEngine próprio) as filas da topologia não são
+        usadas nem alteradas.
+        """
+        result, hops = self._start_probe(source_ip, dest_ip, flow, num_samples)
+        if hops is None:
+            return result, 0.0
+        
+        timestamps = [start + i * SAMPLE_INTERVAL for i in range(num_samples)
+                      if i == 0 or timeout is None or i * SAMPLE_INTERVAL < timeout]
+        return result, self._finish_probe(result, hops, timestamps, timeout, packet_size, rng, engine)
+    
+    def xtrace(self, source_ip: str, dest_ip: str, num_samples: int = 3,
+               flow: Optional[Tuple[int, int, int]] = None, timeout: Optional[float] = None,
+               packet_size: Optional[int] = None, rng: Optional[random.Random] = None) -> Dict:
+        """Traceroute: amostras de RTT até cada hop do caminho, como com TTL crescente
+        
+        O caminho é traçado uma vez, e os RTTs (PacketEngine.hop_rtts) e as
+        perdas (hop_losses) de todos os prefixos saem de uma única passada
+        por ele, então o custo é linear no número de hops. Em 'samples' de
+        cada hop, None marca uma amostra perdida ou acima de `timeout`
+        segundos (por amostra, como no traceroute). 'reached' indica se o
+        destino respondeu.
+        """
+        result = {'source': source_ip, 'dest': dest_ip, 'reached': False, 'hops': []}
+        
+        source_device = self.get_device_by_ip(source_ip)
+        if not source_device or (isinstance(source_device, Host) and not source_device.active):
+            return result
+        
+        hops = self._trace_path(source_ip, dest_ip, self._flow_hash(source_ip, dest_ip, flow))
+        if len(hops) < 2:
+            return result
+        
+        rtts = self.get_packet_engine().hop_rtts([device.name for device, _ in hops], packet_size)
+        losses = self.hop_losses(hops)
+        rng = self.rng if rng is None else rng
+        for ttl, ((device, ip), rtt, loss) in enumerate(zip(hops[1:], rtts, losses), 1):
+            # Hosts inativos não respondem; roteadores sempre respondem ao TTL esgotado
+            answers = not isinstance(device, Host) or device.active
+            samples = []
+            for _ in range(num_samples):
+                if not answers or (loss and rng.random() < loss):
+                    samples.append(None)
+                    continue
+                sample = round(rtt * 1000 + rng.uniform(0.0, JITTER_MS), 3)
+                samples.append(None if timeout is not None and sample / 1000 > timeout else sample)
+            received = [sample for sample in samples if sample is not None]
+            result['hops'].append({
+                'ttl': ttl,
+                'device': device.name,
+                'ip': ip,
+                'samples': samples,
+                'received': len(received),
+                'loss_pct': round(100.0 * (num_samples - len(received)) / num_samples, 1) if num_samples else 0.0,
+                'avg_rtt': round(sum(received) / len(received), 3) if received else None
+            })
+        
+        result['reached'] = hops[-1][1] == dest_ip and result['hops'][-1]['received'] > 0
+        return result
+    
+    def path_rtt(self, source_ip: str, dest_ip: str, packet_size: Optional[int] = None,
+                 flow: Optional[Tuple[int, int, int]] = None) -> Optional[float]:
+        """RTT (ms) do caminho sem fila nem jitter, calculado pela tabela de enlaces
+        
+        Soma serialização (com fragmentação acima da MTU), propagação e
+        processamento de cada enlace, em O(tamanho do caminho) e sem
+        aleatoriedade. Retorna None se o destino for inalcançável.
+        """
+        result, hops = self._start_probe(source_ip, dest_ip, flow)
+        if hops is None:
+            return None
+        rtt = self.get_packet_engine().path_rtt([device.name for device, _ in hops], packet_size)
+        return round(rtt * 1000, 3)
+    
+    def calculate_rtt(self, source_ip: str, dest_ip: str, num_samples: int = 3,
+                      flow: Optional[Tuple[int, int, int]] = None,
+                      timeout: Optional[float] = None,
+                      packet_size: Optional[int] = None) -> Tuple[bool, List[float], float]:
+        """Calcula o RTT entre origem e destino"""
+        result = self.probe(source_ip, dest_ip, num_samples, flow, timeout, packet_size)
+        return result['active'], result['samples'], result['avg_rtt']
+    
+    async def calculate_rtt_async(self, source_ip: str, dest_ip: str, num_samples: int = 3,
+                                  flow: Optional[Tuple[int, int, int]] = None,
+                                  timeout: Optional[float] = None,
+                                  packet_size: Optional[int] = None
+                                  ) -> Tuple[bool, List[float], float]:
+        """Variante assíncrona de calculate_rtt"""
+        result = await self.probe_async(source_ip, dest_ip, num_samples, flow, timeout, packet_size)
+        return result['active'], result['samples'], result['avg_rtt']
 
 
 class NetworkSimulator:
     """Simulador principal com interface de usuário"""
     
-    def __init__(self):
-        self.topology = NetworkTopology()
+    def __init__(self, clock=None, topology: Optional[NetworkTopology] = None):
+        self.topology = topology if topology is not None else NetworkTopology(clock)
     
     def display_network_info(self):
         """Exibe informações sobre a rede"""
@@ -394,15 +1910,17 @@ class NetworkSimulator:
                     print(f"  └─ {device}")
                     for iface_name, iface in device.interfaces.items():
                         print(f"      ├─ {iface_name}: {iface}")
-                    if isinstance(device, Host):
+                    if device.device_type == 'Host':
                         print(f"      └─ Gateway: {device.gateway}")
         
         print("\n" + "="*80)
         print("\n🔗 ENLACES DA REDE:")
         print("-" * 80)
         for src, dst, link_type, capacity in self.topology.links:
+            link = self.topology.get_link(src, dst)
             print(f"  {src} <---> {dst}")
-            print(f"    Tipo: {link_type} | Capacidade: {capacity}")
+            print(f"    Tipo: {link_type} | Capacidade: {capacity} | "
+                  f"Propagação: {link.propagation_delay * 1e6:.2f} µs | MTU: {link.mtu} bytes")
         
         print("\n" + "="*80)
     
@@ -420,32 +1938,51 @@ class NetworkSimulator:
         
         # Redes diretamente conectadas
         for iface_name, iface in device.interfaces.items():
-            print(f"{str(iface.network.network_address):<20} "
-                  f"/{iface.network.prefixlen:<9} "
+            print(f"{int_to_ip(iface.network_address):<20} "
+                  f"/{iface.prefix_len:<9} "
                   f"{'Directly Connected':<20} {iface_name:<15}")
         
         # Rotas da tabela
         for route in device.routing_table:
-            print(f"{route['destination']:<20} "
-                  f"/{route['mask']:<9} "
-                  f"{route['next_hop']:<20} {route['interface']:<15}")
+            print(f"{int_to_ip(route.destination):<20} "
+                  f"/{route.prefix_len:<9} "
+                  f"{int_to_ip(route.next_hop):<20} {route.interface:<15}")
         
         print("-" * 80)
     
+    def routers(self) -> List[str]:
+        """Nomes dos roteadores, da camada Core para a Edge"""
+        layers = ('Core', 'Aggregation', 'Edge')
+        
+        def rank(device: NetworkDevice) -> int:
+            return next((i for i, layer in enumerate(layers) if layer in device.device_type), len(layers))
+        
+        routers = [device for device in self.topology.devices.values() if device.device_type != 'Host']
+        return [device.name for device in sorted(routers, key=lambda device: (rank(device), device.name))]
+    
     def display_all_routing_tables(self):
         """Exibe todas as tabelas de roteamento"""
-        routers = ['c1', 'a1', 'a2', 'e1', 'e2', 'e3', 'e4']
-        for router_name in routers:
+        for router_name in self.routers():
             self.display_routing_table(router_name)
             print()
     
-    def xprobe(self, source_ip: str, dest_ip: str):
-        """Comando XProbe - verifica conectividade e RTT"""
+    def xprobe(self, source_ip: str, dest_ip: str, flow: Optional[Tuple[int, int, int]] = None,
+               num_samples: int = 3, timeout: Optional[float] = None,
+               packet_size: Optional[int] = None) -> bool:
+        """Comando XProbe - verifica conectividade e RTT
+        
+        `flow` = (protocolo, porta de origem, porta de destino) seleciona o
+        caminho ECMP do fluxo (ver NetworkTopology.trace_route). Retorna se
+        o destino respondeu a alguma amostra.
+        """
         print("\n" + "="*80)
         print(" XPROBE - VERIFICAÇÃO DE CONECTIVIDADE E RTT")
         print("="*80)
         print(f"\n🔍 Origem: {source_ip}")
         print(f"🎯 Destino: {dest_ip}")
+        if flow is not None:
+            protocol, source_port, dest_port = flow
+            print(f"🔀 Fluxo: protocolo {protocol}, portas {source_port} → {dest_port}")
         
         # Verifica se os IPs existem
         source_device = self.topology.get_device_by_ip(source_ip)
@@ -453,11 +1990,11 @@ class NetworkSimulator:
         
         if not source_device:
             print(f"\n❌ ERRO: IP de origem {source_ip} não encontrado na rede!")
-            return
+            return False
         
         if not dest_device:
             print(f"\n❌ ERRO: IP de destino {dest_ip} não encontrado na rede!")
-            return
+            return False
         
         print(f"\n📍 Dispositivo Origem: {source_device}")
         print(f"📍 Dispositivo Destino: {dest_device}")
@@ -465,34 +2002,132 @@ class NetworkSimulator:
         # Traça a rota
         print(f"\n🛣️  TRAÇANDO ROTA:")
         print("-" * 80)
-        path = self.topology.trace_route(source_ip, dest_ip)
+        path = self.topology.trace_route(source_ip, dest_ip, flow)
         for i, hop in enumerate(path, 1):
             print(f"  {i}. {hop}")
         
         # Calcula RTT
-        print(f"\n⏱️  MEDINDO RTT (3 amostras)...")
+        size = f" de {packet_size} bytes" if packet_size is not None else ""
+        print(f"\n⏱️  MEDINDO RTT ({num_samples} amostras{size})...")
         print("-" * 80)
         
-        is_active, samples, avg_rtt = self.topology.calculate_rtt(source_ip, dest_ip)
+        result = self.topology.probe(source_ip, dest_ip, num_samples, flow, timeout, packet_size)
+        samples = result['samples']
         
-        if not is_active:
-            print(f"\n❌ Host {dest_ip} está INATIVO ou INACESSÍVEL!")
-            return
+        if not result['active']:
+            if result['path']:
+                print(f"\n❌ Nenhuma resposta de {dest_ip}: {result['sent']} pacotes enviados, "
+                      f"{result['loss_pct']:g}% de perda!")
+            else:
+                print(f"\n❌ Host {dest_ip} está INATIVO ou INACESSÍVEL!")
+            return False
         
         for i, sample in enumerate(samples, 1):
             print(f"  Amostra {i}: {sample} ms")
         
         print("\n📊 ESTATÍSTICAS DO XPROBE:")
         print("-" * 80)
+        mark = '✓' if result['received'] == result['sent'] else '⚠️ '
         print(f"  ✓ Status: ATIVO")
-        print(f"  ✓ Pacotes enviados: 3")
-        print(f"  ✓ Pacotes recebidos: 3")
-        print(f"  ✓ Perda de pacotes: 0%")
+        print(f"  ✓ Pacotes enviados: {result['sent']}")
+        print(f"  {mark} Pacotes recebidos: {result['received']}")
+        print(f"  {mark} Perda de pacotes: {result['loss_pct']:g}%")
+        if result['timed_out']:
+            print(f"  ⚠️  Respostas após o timeout de {timeout} s descartadas")
         print(f"  ✓ RTT Mínimo: {min(samples)} ms")
         print(f"  ✓ RTT Máximo: {max(samples)} ms")
-        print(f"  ✓ RTT Médio: {avg_rtt} ms")
+        print(f"  ✓ RTT Médio: {result['avg_rtt']} ms")
         print(f"  ✓ Número de Hops: {len(path) - 1}")
         print("="*80)
+        return True
+    
+    def xtrace(self, source_ip: str, dest_ip: str, flow: Optional[Tuple[int, int, int]] = None,
+               num_samples: int = 3, timeout: Optional[float] = None,
+               packet_size: Optional[int] = None) -> bool:
+        """Comando XTrace - RTT de cada hop do caminho (traceroute)
+        
+        Retorna se o destino respondeu a alguma amostra.
+        """
+        print("\n" + "="*80)
+        print(" XTRACE - RTT POR HOP")
+        print("="*80)
+        print(f"\n🔍 Origem: {source_ip}")
+        print(f"🎯 Destino: {dest_ip}")
+        if flow is not None:
+            protocol, source_port, dest_port = flow
+            print(f"🔀 Fluxo: protocolo {protocol}, portas {source_port} → {dest_port}")
+        
+        if not self.topology.get_device_by_ip(source_ip):
+            print(f"\n❌ ERRO: IP de origem {source_ip} não encontrado na rede!")
+            return False
+        
+        if not self.topology.get_device_by_ip(dest_ip):
+            print(f"\n❌ ERRO: IP de destino {dest_ip} não encontrado na rede!")
+            return False
+        
+        result = self.topology.xtrace(source_ip, dest_ip, num_samples, flow, timeout, packet_size)
+        if not result['hops']:
+            print(f"\n❌ Nenhum hop alcançável a partir de {source_ip}!")
+            return False
+        
+        print(f"\n🛣️  HOPS ({num_samples} amostras por hop):")
+        print("-" * 80)
+        print(f"  {'TTL':>3}  {'Hop':<28} {'Amostras (ms)':<28} {'Média':>8} {'Perda':>7}")
+        print("-" * 80)
+        for hop in result['hops']:
+            samples = '  '.join('*' if sample is None else f"{sample:.3f}" for sample in hop['samples'])
+            average = '*' if hop['avg_rtt'] is None else f"{hop['avg_rtt']:.3f}"
+            print(f"  {hop['ttl']:>3}  {hop['device'] + ' (' + hop['ip'] + ')':<28} {samples:<28} "
+                  f"{average:>8} {hop['loss_pct']:>6g}%")
+        print("-" * 80)
+        
+        if result['reached']:
+            print(f"  ✓ Destino alcançado em {len(result['hops'])} hops")
+        else:
+            print(f"  ❌ Destino {dest_ip} não respondeu")
+        print("="*80)
+        return result['reached']
+    
+    def display_instrumentation(self, top: int = 10):
+        """Exibe os contadores de instrumentação da topologia"""
+        print("\n" + "="*80)
+        print(" INSTRUMENTAÇÃO - CAMINHOS CRÍTICOS")
+        print("="*80)
+        
+        snapshot = self.topology.instrumentation_snapshot()
+        if snapshot is None:
+            print("\n⚠️  Instrumentação desativada (NetworkTopology.enable_instrumentation)")
+            return
+        
+        def average(kind: str, count: str) -> str:
+            return f"{snapshot[kind] / snapshot[count] / 1000:.2f} µs" if snapshot[count] else '-'
+        
+        print(f"\n⏱️  Tempo coletado: {snapshot['elapsed_s']:.1f} s")
+        print(f"  Buscas de rota:        {snapshot['route_lookups']:>10,} "
+              f"(cache: {snapshot['route_cache_hits']:,}, média {average('route_ns', 'route_lookups')})")
+        print(f"  Buscas de dispositivo: {snapshot['device_lookups']:>10,} "
+              f"(não encontrados: {snapshot['device_lookup_misses']:,}, "
+              f"média {average('device_lookup_ns', 'device_lookups')})")
+        print(f"  Traces:                {snapshot['traces']:>10,} "
+              f"(cache: {snapshot['trace_cache_hits']:,}, média {average('trace_ns', 'traces')})")
+        print(f"  Hops percorridos:      {snapshot['hops']:>10,}")
+        print(f"  Probes:                {snapshot['probes']:>10,} "
+              f"(amostras: {snapshot['probe_samples']:,} enviadas, "
+              f"{snapshot['probe_samples_received']:,} recebidas, média {average('probe_ns', 'probes')})")
+        
+        devices = sorted(snapshot['devices'].items(),
+                         key=lambda item: (-item[1]['route_lookups'] - item[1]['hops'], item[0]))[:top]
+        if devices:
+            print(f"\n{'Dispositivo':<14} {'Rotas':>10} {'Cache':>10} {'Média':>12} {'Hops':>10} "
+                  f"{'Probes':>8} {'Amostras':>10}")
+            print("-" * 80)
+            for name, counters in devices:
+                mean = f"{counters['route_ns'] / counters['route_lookups'] / 1000:.2f} µs" \
+                    if counters['route_lookups'] else '-'
+                print(f"{name:<14} {counters['route_lookups']:>10,} {counters['route_cache_hits']:>10,} "
+                      f"{mean:>12} {counters['hops']:>10,} "
+                      f"{counters['probes']:>8,} {counters['probe_samples']:>10,}")
+        print("="*80)
     
     def run(self):
         """Executa o simulador com menu interativo"""
@@ -506,6 +2141,8 @@ class NetworkSimulator:
             print("4. Executar XProbe (ping com RTT)")
             print("5. Exemplo: XProbe de h1 para h8")
             print("6. Exemplo: XProbe de h3 para h5")
+            print("7. Instrumentação (contadores dos caminhos críticos)")
+            print("8. Executar XTrace (RTT por hop)")
             print("0. Sair")
             
             choice = input("\nEscolha uma opção: ").strip()
@@ -534,6 +2171,18 @@ class NetworkSimulator:
             elif choice == '6':
                 self.xprobe('192.168.2.2', '192.168.3.2')
             
+            elif choice == '7':
+                if self.topology.metrics is None:
+                    self.topology.enable_instrumentation()
+                    print("\n✓ Instrumentação ativada: as próximas operações serão contadas")
+                else:
+                    self.display_instrumentation()
+            
+            elif choice == '8':
+                source_ip = input("\nDigite o IP de origem: ").strip()
+                dest_ip = input("Digite o IP de destino: ").strip()
+                self.xtrace(source_ip, dest_ip)
+            
             elif choice == '0':
                 print("\n👋 Encerrando simulador...")
                 break
@@ -544,20 +2193,288 @@ class NetworkSimulator:
             input("\nPressione ENTER para continuar...")
 
 
-def main():
-    """Função principal"""
-    print("\n" + "="*80)
-    print(" SIMULADOR DE REDE HIERÁRQUICA")
-    print(" Projeto 2 - Redes de Computadores")
-    print("="*80)
-    print("\nInicializando rede...")
+def parse_flow(text: str) -> Tuple[int, int, int]:
+    """Converte 'PROTOCOLO,PORTA_ORIGEM,PORTA_DESTINO' no fluxo usado por trace_route"""
+    try:
+        protocol, source_port, dest_port = (int(value) for value in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"fluxo inválido: {text!r} (use PROTOCOLO,PORTA_ORIGEM,PORTA_DESTINO)") from None
+    return protocol, source_port, dest_port
+
+
+def parse_loss(text: str) -> Tuple[Tuple[str, ...], float]:
+    """Converte 'DISPOSITIVO=P' ou 'ORIGEM,DESTINO=P' em (nomes, probabilidade de perda)"""
+    target, _, value = text.rpartition('=')
+    names = tuple(name.strip() for name in target.split(','))
+    try:
+        probability = float(value)
+    except ValueError:
+        probability = -1.0
+    if len(names) not in (1, 2) or not all(names) or not 0.0 <= probability <= 1.0:
+        raise argparse.ArgumentTypeError(
+            f"perda inválida: {text!r} (use DISPOSITIVO=P ou ORIGEM,DESTINO=P, com P entre 0 e 1)")
+    return names, probability
+
+
+def parse_packet_size(text: str) -> int:
+    """Converte o tamanho de pacote da linha de comando (bytes, inteiro positivo)"""
+    try:
+        return check_packet_size(int(text))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"tamanho de pacote inválido: {text!r} (use um inteiro positivo, em bytes)") from None
+
+
+def resolve_address(topology: NetworkTopology, key: str) -> str:
+    """Aceita o nome de um host ou um IP e retorna o IP"""
+    device = topology.devices.get(key)
+    return device.get_ip() if device is not None and device.device_type == 'Host' else key
+
+
+def device_info(device: NetworkDevice) -> Dict:
+    """Descrição de um dispositivo em tipos simples (para saída JSON)"""
+    info = {
+        'name': device.name,
+        'type': device.device_type,
+        'interfaces': {iface_name: str(iface) for iface_name, iface in device.interfaces.items()}
+    }
+    if device.device_type == 'Host':
+        info['gateway'] = device.gateway
+        info['active'] = device.active
+    return info
+
+
+def link_info(src: str, dst: str, link: Link, capacity: str) -> Dict:
+    """Descrição de um enlace em tipos simples (para saída JSON)"""
+    return {
+        'source': src,
+        'dest': dst,
+        'type': link.medium,
+        'capacity': capacity,
+        'capacity_bps': link.capacity,
+        'propagation_delay': link.propagation_delay,
+        'mtu': link.mtu
+    }
+
+
+def routing_table_info(device: NetworkDevice) -> List[Dict]:
+    """Redes conectadas e rotas de um dispositivo (next_hop None: conectada)"""
+    rows = [{'destination': f"{int_to_ip(iface.network_address)}/{iface.prefix_len}",
+             'next_hop': None, 'interface': iface_name}
+            for iface_name, iface in device.interfaces.items()]
+    rows.extend({'destination': f"{int_to_ip(route.destination)}/{route.prefix_len}",
+                 'next_hop': int_to_ip(route.next_hop), 'interface': route.interface}
+                for route in device.routing_table)
+    return rows
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Argumentos da linha de comando (sem subcomando: menu interativo)"""
+    parser = argparse.ArgumentParser(description="Simulador de Rede Hierárquica")
+    parser.add_argument('--topology', help="arquivo de topologia, texto ou snapshot (padrão: topologia do projeto)")
+    parser.add_argument('--instrument', action='store_true',
+                        help="conta e cronometra os caminhos críticos e exibe os contadores ao sair")
+    parser.add_argument('--dump-interval', type=float,
+                        help="grava um snapshot dos contadores a cada N segundos (implica --instrument)")
+    parser.add_argument('--dump-file', help="arquivo JSON Lines dos snapshots (padrão: saída de erro)")
+    parser.add_argument('--seed', type=int,
+                        help="semente do jitter e das perdas (com relógio simulado a partir de 0: saída reprodutível)")
+    parser.add_argument('--loss', type=parse_loss, action='append', default=[], metavar='ALVO=P',
+                        help="probabilidade de perda de um dispositivo (NOME=P) ou enlace (ORIGEM,DESTINO=P); "
+                             "pode ser repetida")
+    
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--json', action='store_true', help="saída em JSON (probe-batch: uma linha por probe)")
+    probing = argparse.ArgumentParser(add_help=False)
+    probing.add_argument('--samples', type=int, default=3, help="amostras por probe")
+    probing.add_argument('--flow', type=parse_flow, help="fluxo PROTOCOLO,PORTA_ORIGEM,PORTA_DESTINO (ECMP)")
+    probing.add_argument('--timeout', type=float,
+                         help="descarta respostas que chegariam após N segundos do início do probe")
+    probing.add_argument('--packet-size', type=parse_packet_size, help="tamanho dos pacotes em bytes (padrão: 1500)")
+    
+    commands = parser.add_subparsers(dest='command', metavar='COMANDO')
+    commands.add_parser('info', parents=[output], help="dispositivos, interfaces e enlaces")
+    routes = commands.add_parser('routes', parents=[output], help="tabelas de roteamento")
+    routes.add_argument('devices', nargs='*', metavar='DISPOSITIVO', help="padrão: todos os roteadores")
+    xprobe = commands.add_parser('xprobe', parents=[output, probing], help="XProbe entre dois hosts")
+    xprobe.add_argument('source', metavar='ORIGEM', help="IP ou nome do host")
+    xprobe.add_argument('dest', metavar='DESTINO', help="IP ou nome do host")
+    xtrace = commands.add_parser('xtrace', parents=[output, probing], help="XTrace (RTT por hop) entre dois hosts")
+    xtrace.add_argument('source', metavar='ORIGEM', help="IP ou nome do host")
+    xtrace.add_argument('dest', metavar='DESTINO', help="IP ou nome do host")
+    batch = commands.add_parser('probe-batch', parents=[output, probing],
+                                help="probes para os pares 'origem destino' de um arquivo")
+    batch.add_argument('pairs_file', metavar='ARQUIVO', help="um par por linha ('-' lê da entrada padrão)")
+    batch.add_argument('--output', help="grava cada resultado em JSON Lines (ou CSV, se terminar em .csv)")
+    return parser
+
+
+def run_command(simulator: NetworkSimulator, args: argparse.Namespace) -> int:
+    """Executa um subcomando e retorna o código de saída"""
+    topology = simulator.topology
+    
+    if args.command == 'info':
+        if not args.json:
+            simulator.display_network_info()
+            return 0
+        print(json.dumps({
+            'devices': [device_info(device) for device in topology.devices.values()],
+            'links': [link_info(src, dst, topology.get_link(src, dst), capacity)
+                      for src, dst, _, capacity in topology.links]
+        }, ensure_ascii=False, indent=2))
+        return 0
+    
+    if args.command == 'routes':
+        names = args.devices or simulator.routers()
+        missing = [name for name in names if name not in topology.devices]
+        if missing:
+            print(f"❌ Dispositivo(s) não encontrado(s): {', '.join(missing)}", file=sys.stderr)
+            return 1
+        if args.json:
+            print(json.dumps([{'device': name, 'routes': routing_table_info(topology.devices[name])}
+                              for name in names], indent=2))
+        else:
+            for name in names:
+                simulator.display_routing_table(name)
+                print()
+        return 0
+    
+    if args.command == 'xprobe':
+        source = resolve_address(topology, args.source)
+        dest = resolve_address(topology, args.dest)
+        if not args.json:
+            return 0 if simulator.xprobe(source, dest, args.flow, args.samples, args.timeout, args.packet_size) else 1
+        result = topology.probe(source, dest, args.samples, args.flow, args.timeout, args.packet_size)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0 if result['active'] else 1
+    
+    if args.command == 'xtrace':
+        source = resolve_address(topology, args.source)
+        dest = resolve_address(topology, args.dest)
+        if not args.json:
+            return 0 if simulator.xtrace(source, dest, args.flow, args.samples, args.timeout, args.packet_size) else 1
+        result = topology.xtrace(source, dest, args.samples, args.flow, args.timeout, args.packet_size)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0 if result['reached'] else 1
+    
+    # probe-batch: os resultados são escritos à medida que os probes terminam
+    from probe_campaign import StatsSink, iter_pairs, open_sink
+    
+    if args.pairs_file == '-':
+        stream, name = sys.stdin, '<stdin>'
+    else:
+        try:
+            stream, name = open(args.pairs_file, encoding='utf-8'), args.pairs_file
+        except OSError as error:
+            print(f"❌ {error}", file=sys.stderr)
+            return 1
+    # Estatísticas em memória constante, qualquer que seja o número de probes
+    stats = StatsSink(per_pair=False)
+    sink = None
+    try:
+        if args.output:
+            sink = open_sink(args.output)
+        for source, dest in iter_pairs(stream, name):
+            result = topology.probe(resolve_address(topology, source), resolve_address(topology, dest),
+                                    args.samples, args.flow, args.timeout, args.packet_size)
+            stats.write(result)
+            if sink is not None:
+                sink.write(result)
+            if args.json:
+                print(json.dumps(result, ensure_ascii=False))
+            elif result['active']:
+                print(f"{source} -> {dest}: {result['avg_rtt']} ms ({len(result['path']) - 1} hops, "
+                      f"{result['loss_pct']:g}% de perda)")
+            else:
+                print(f"{source} -> {dest}: inalcançável")
+    except (ValueError, OSError) as error:
+        print(f"❌ {error}", file=sys.stderr)
+        return 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if sink is not None:
+            sink.close()
+    
+    report = stats.summary()
+    summary = (f"Probes: {report['pairs']} | Alcançáveis: {report['reachable']} | "
+               f"Inalcançáveis: {report['unreachable']} | Perda: {report['loss_pct']:g}%")
+    if report['reachable']:
+        summary += (f" | RTT mín/méd/máx: {report['rtt_min']}/{report['rtt_avg']}/{report['rtt_max']} ms"
+                    f" | p50/p95/p99: {report['p50']}/{report['p95']}/{report['p99']} ms")
+    print(summary, file=sys.stderr if args.json else sys.stdout)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Função principal
+    
+    Sem subcomando abre o menu interativo; com um subcomando (info,
+    routes, xprobe, xtrace, probe-batch) executa-o sem prompts, com relógio
+    simulado, e retorna o código de saída.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    interactive = args.command is None
+    if interactive:
+        clock = None
+    else:
+        clock = SimulatedClock(0.0 if args.seed is not None else None)
+    
+    if interactive:
+        print("\n" + "="*80)
+        print(" SIMULADOR DE REDE HIERÁRQUICA")
+        print(" Projeto 2 - Redes de Computadores")
+        print("="*80)
+        print("\nInicializando rede...")
+    
+    if args.topology:
+        from topology_snapshot import open_topology
+        simulator = NetworkSimulator(topology=open_topology(args.topology, clock))
+    else:
+        simulator = NetworkSimulator(clock)
+    
+    if args.seed is not None:
+        simulator.topology.reseed(args.seed)
+    
+    try:
+        for names, probability in args.loss:
+            if len(names) == 1:
+                simulator.topology.set_device_loss(names[0], probability)
+            else:
+                simulator.topology.set_link_loss(*names, probability)
+    except ValueError as error:
+        parser.error(str(error))
+    
+    if args.instrument or args.dump_interval:
+        simulator.topology.enable_instrumentation(args.dump_interval, args.dump_file)
     
-    simulator = NetworkSimulator()
-    print("✓ Rede configurada com sucesso!")
-    print("✓ Topologia: 1 Core, 2 Aggregation, 4 Edge, 8 Hosts")
+    if interactive:
+        print("✓ Rede configurada com sucesso!")
+        if args.topology:
+            print(f"✓ Topologia: {args.topology} ({len(simulator.topology.devices)} dispositivos)")
+        else:
+            print("✓ Topologia: 1 Core, 2 Aggregation, 4 Edge, 8 Hosts")
+        if simulator.topology.metrics is not None:
+            print("✓ Instrumentação ativada")
+        simulator.run()
+        status = 0
+    else:
+        status = run_command(simulator, args)
     
-    simulator.run()
+    if simulator.topology.metrics is not None:
+        if args.command is not None and args.json:
+            print(json.dumps(simulator.topology.instrumentation_snapshot()), file=sys.stderr)
+        else:
+            simulator.display_instrumentation()
+    return status
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        sys.exit(main())
+    except BrokenPipeError:
+        # Saída fechada antes do fim (ex.: '| head'): encerra sem traceback
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
@@ -0,0 +1,310 @@
+"""
+Motor de Simulação de Pacotes por Eventos Discretos
+Modela atraso de serialização, propagação e fila em cada enlace do caminho
+"""
+
+import heapq
+import itertools
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+
+# Multiplicadores das unidades de capacidade usadas em NetworkTopology.links
+CAPACITY_UNITS = {
+    'bps': 1.0,
+    'kbps': 1e3,
+    'mbps': 1e6,
+    'gbps': 1e9,
+    'tbps': 1e12,
+}
+
+# Velocidade de propagação típica em cobre/fibra (~2/3 da luz, em m/s)
+PROPAGATION_SPEED = 2e8
+SPEED_OF_LIGHT = 299792458.0
+DEFAULT_LINK_LENGTH = 100.0        # metros
+DEFAULT_PACKET_SIZE = 1500         # bytes
+DEFAULT_PROCESSING_DELAY = 10e-6   # segundos por roteador
+DEFAULT_CAPACITY = 1e9             # bits/s para enlaces fora de `links`
+DEFAULT_MTU = 1500                 # bytes
+IP_HEADER_SIZE = 20                # bytes, repetidos em cada fragmento
+
+# Meios físicos, pela palavra-chave no tipo do enlace:
+# (fator de velocidade em relação à luz, comprimento típico em metros, MTU em bytes)
+MEDIA = {
+    'fib': (0.68, 1000.0, 9000),   # Fibra óptica (índice ~1,47), enlaces de backbone com jumbo frames
+    'cat6': (0.65, 100.0, 1500),   # Par trançado Cat6
+    'cat5': (0.64, 100.0, 1500),   # Par trançado Cat5/Cat5e
+}
+
+
+@lru_cache(maxsize=None)
+def parse_capacity(capacity: str) -> float:
+    """Converte uma capacidade como '10 Gbps' em bits/s"""
+    text = capacity.strip().lower().replace(' ', '')
+    for unit in sorted(CAPACITY_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return float(text[:-len(unit)]) * CAPACITY_UNITS[unit]
+    raise ValueError(f"Capacidade inválida: {capacity!r}")
+
+
+def check_packet_size(size: int) -> int:
+    """Valida um tamanho de pacote em bytes (precisa ser positivo)"""
+    if size <= 0:
+        raise ValueError(f"Tamanho de pacote inválido: {size} (use um valor positivo em bytes)")
+    return size
+
+
+def link_medium(link_type: str) -> Tuple[float, float, int]:
+    """Velocidade de propagação (m/s), comprimento (m) e MTU de um tipo de enlace
+    
+    Tipos sem meio conhecido em MEDIA usam PROPAGATION_SPEED,
+    DEFAULT_LINK_LENGTH e DEFAULT_MTU.
+    """
+    text = link_type.lower().replace(' ', '')
+    for keyword, (factor, length, mtu) in MEDIA.items():
+        if keyword in text:
+            return factor * SPEED_OF_LIGHT, length, mtu
+    return PROPAGATION_SPEED, DEFAULT_LINK_LENGTH, DEFAULT_MTU
+
+
+class Link(NamedTuple):
+    """Propriedades de um enlace: capacidade em bits/s, propagação em segundos e MTU em bytes"""
+    medium: str
+    capacity: float
+    propagation_delay: float
+    mtu: int
+    
+    def serialization_delay(self, size: int) -> float:
+        """Tempo para transmitir `size` bytes; acima da MTU, cada fragmento repete o cabeçalho IP"""
+        if size > self.mtu:
+            payload = self.mtu - IP_HEADER_SIZE
+            fragments = -(-(size - IP_HEADER_SIZE) // payload)
+            size += (fragments - 1) * IP_HEADER_SIZE
+        return size * 8 / self.capacity
+
+
+class LinkTable:
+    """Enlaces tipados indexados pelo par (origem, destino), nos dois sentidos
+    
+    Construída a partir das tuplas (origem, destino, tipo, capacidade) de
+    NetworkTopology.links; cada combinação distinta de tipo e capacidade
+    vira um único Link, compartilhado pelos enlaces iguais.
+    """
+    
+    def __init__(self, links: Sequence[Tuple]):
+        # (origem, destino) -> Link
+        self.pairs: Dict[Tuple[str, str], Link] = {}
+        specs: Dict[Tuple[str, str], Link] = {}
+        pairs = self.pairs
+        for src, dst, link_type, capacity in links:
+            link = specs.get((link_type, capacity))
+            if link is None:
+                speed, length, mtu = link_medium(link_type)
+                link = specs[(link_type, capacity)] = Link(link_type, parse_capacity(capacity), length / speed, mtu)
+            pairs[(src, dst)] = pairs[(dst, src)] = link
+    
+    def get(self, src: str, dst: str) -> Optional[Link]:
+        """Retorna o enlace de `src` para `dst`, ou None"""
+        return self.pairs.get((src, dst))
+    
+    def __getitem__(self, pair: Tuple[str, str]) -> Link:
+        return self.pairs[pair]
+    
+    def __contains__(self, pair: Tuple[str, str]) -> bool:
+        return pair in self.pairs
+    
+    def __len__(self) -> int:
+        return len(self.pairs)
+    
+    def __iter__(self) -> Iterator[Link]:
+        return iter(self.pairs.values())
+    
+    def capacities(self) -> Dict[Tuple[str, str], float]:
+        """Capacidade (bits/s) por direção de enlace"""
+        return {pair: link.capacity for pair, link in self.pairs.items()}
+    
+    def path_mtu(self, path: Sequence[str]) -> Optional[int]:
+        """Menor MTU dos enlaces conhecidos ao longo de `path` (None se nenhum)"""
+        mtus = [link.mtu for link in map(self.pairs.get, zip(path, path[1:])) if link is not None]
+        return min(mtus) if mtus else None
+
+
+class PacketEngine:
+    """Simulador de eventos discretos para pacotes ao longo de caminhos
+    
+    Cada direção de enlace é um servidor FIFO: o pacote espera o
+    transmissor ficar livre (fila), ocupa-o pelo tempo de serialização
+    (tamanho / capacidade) e chega ao próximo nó após o atraso de
+    propagação. Os eventos são processados em ordem de tempo por um heap.
+    
+    Os tempos são relativos ao primeiro pacote agendado, para preservar a
+    precisão de ponto flutuante quando os instantes vêm de time.time().
+    
+    Capacidade, propagação e MTU vêm da LinkTable; enlaces fora dela usam
+    `default_capacity`, `link_length` a PROPAGATION_SPEED e não fragmentam.
+    """
+    
+    def __init__(self, links: Union[LinkTable, Sequence[Tuple]], packet_size: int = DEFAULT_PACKET_SIZE,
+                 link_length: float = DEFAULT_LINK_LENGTH,
+                 processing_delay: float = DEFAULT_PROCESSING_DELAY,
+                 default_capacity: float = DEFAULT_CAPACITY):
+        self.packet_size = check_packet_size(packet_size)
+        self.propagation_delay = link_length / PROPAGATION_SPEED
+        self.processing_delay = processing_delay
+        self.default_capacity = default_capacity
+        self.link_table = links if isinstance(links, LinkTable) else LinkTable(links)
+        
+        self.epoch: Optional[float] = None
+        self.now = 0.0
+        self._events: List[Tuple[float, int, int, int]] = []
+        self._seq = itertools.count()
+        self._link_free: Dict[Tuple[str, str], float] = {}
+        self.link_busy: Dict[Tuple[str, str], float] = {}
+        
+        # Estado dos pacotes, em listas paralelas indexadas pelo id
+        self._routes: List[Tuple[str, ...]] = []
+        self._sizes: List[int] = []
+        self._sent: List[float] = []
+        self._delivered: List[Optional[float]] = []
+        self._route_pool: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+    
+    def schedule(self, route: Sequence[str], at: float, size: Optional[int] = None) -> int:
+        """Agenda um pacote que percorre `route` (nomes de dispositivos)"""
+        if self.epoch is None:
+            self.epoch = at
+        start = max(at - self.epoch, self.now)
+        
+        route = tuple(route)
+        route = self._route_pool.setdefault(route, route)
+        packet_id = len(self._routes)
+        self._routes.append(route)
+        self._sizes.append(self.packet_size if size is None else check_packet_size(size))
+        self._sent.append(start)
+        self._delivered.append(None)
+        heapq.heappush(self._events, (start, next(self._seq), packet_id, 0))
+        return packet_id
+    
+    def schedule_echo(self, path: Sequence[str], at: float, size: Optional[int] = None) -> int:
+        """Agenda um pedido de eco: ida pelo caminho e volta pelo inverso"""
+        path = list(path)
+        return self.schedule(path + path[-2::-1], at, size)
+    
+    def run(self, until: Optional[float] = None):
+        """Processa os eventos pendentes (até o instante relativo `until`)"""
+        events = self._events
+        table = self.link_table.pairs
+        link_free = self._link_free
+        link_busy = self.link_busy
+        default_propagation = self.propagation_delay
+        processing = self.processing_delay
+        default_capacity = self.default_capacity
+        routes, sizes, delivered = self._routes, self._sizes, self._delivered
+        seq = self._seq
+        heappush, heappop = heapq.heappush, heapq.heappop
+        now = self.now
+        
+        while events:
+            if until is not None and events[0][0] > until:
+                break
+            now, _, packet_id, hop = heappop(events)
+            route = routes[packet_id]
+            
+            if hop == len(route) - 1:
+                delivered[packet_id] = now
+                continue
+            
+            link = (route[hop], route[hop + 1])
+            if link[0] == link[1]:
+                heappush(events, (now, next(seq), packet_id, hop + 1))
+                continue
+            
+            ready = now + processing if hop > 0 else now
+            free = link_free.get(link, 0.0)
+            start = ready if ready > free else free
+            info = table.get(link)
+            if info is None:
+                serialization = sizes[packet_id] * 8 / default_capacity
+                propagation = default_propagation
+            else:
+                serialization = info.serialization_delay(sizes[packet_id])
+                propagation = info.propagation_delay
+            finish = start + serialization
+            link_free[link] = finish
+            link_busy[link] = link_busy.get(link, 0.0) + serialization
+            heappush(events, (finish + propagation, next(seq), packet_id, hop + 1))
+        
+        self.now = now
+    
+    def latency(self, packet_id: int) -> Optional[float]:
+        """Retorna o tempo de trânsito de um pacote (segundos) ou None se não entregue"""
+        delivered = self._delivered[packet_id]
+        if delivered is None:
+            return None
+        return delivered - self._sent[packet_id]
+    
+    def latencies(self) -> List[Optional[float]]:
+        """Retorna o tempo de trânsito de todos os pacotes agendados"""
+        return [None if delivered is None else delivered - sent
+                for sent, delivered in zip(self._sent, self._delivered)]
+    
+    def reset(self):
+        """Volta ao estado inicial: sem pacotes, filas vazias e nova origem dos tempos"""
+        self.epoch = None
+        self.now = 0.0
+        self._events.clear()
+        self._seq = itertools.count()
+        self._link_free.clear()
+        self.link_busy.clear()
+        self.compact()
+    
+    def compact(self):
+        """Libera o estado dos pacotes já entregues se não houver eventos pendentes
+        
+        Os ids de pacotes anteriores deixam de ser válidos.
+        """
+        if self._events:
+            return
+        self._routes.clear()
+        self._sizes.clear()
+        self._sent.clear()
+        self._delivered.clear()
+        self._route_pool.clear()
+    
+    def hop_rtts(self, path: Sequence[str], size: Optional[int] = None) -> List[float]:
+        """RTT de um eco, sem fila, até cada nó de `path`, em uma única passada
+        
+        O k-ésimo valor é o RTT até path[k + 1] (como em um traceroute com
+        TTL k + 1): serialização e propagação nos dois sentidos dos k + 1
+        primeiros enlaces, acumuladas, mais o processamento em cada roteador
+        atravessado. Não consome eventos nem altera o estado das filas.
+        """
+        size = self.packet_size if size is None else check_packet_size(size)
+        table = self.link_table.pairs
+        processing = self.processing_delay
+        default = size * 8 / self.default_capacity + self.propagation_delay
+        # A origem não processa o pedido que ela mesma envia
+        total = -processing
+        rtts = []
+        for src, dst in zip(path, path[1:]):
+            if src != dst:
+                for link in (table.get((src, dst)), table.get((dst, src))):
+                    if link is None:
+                        total += default + processing
+                    else:
+                        total += link.serialization_delay(size) + link.propagation_delay + processing
+            rtts.append(max(total, 0.0))
+        return rtts
+    
+    def path_rtt(self, path: Sequence[str], size: Optional[int] = None) -> float:
+        """RTT de um eco, sem fila, até o fim de `path` (O(tamanho do caminho))"""
+        rtts = self.hop_rtts(path, size)
+        return rtts[-1] if rtts else 0.0
+    
+    def echo_rtts(self, path: Sequence[str], send_times: Sequence[float],
+                  size: Optional[int] = None) -> List[float]:
+        """Simula uma série de ecos e retorna os RTTs (segundos)"""
+        packet_ids = [self.schedule_echo(path, at, size) for at in send_times]
+        self.run()
+        rtts = [self.latency(packet_id) for packet_id in packet_ids]
+        self.compact()
+        return rtts
@@ -0,0 +1,622 @@
+"""
+Campanhas de XProbe
+Executa probes não interativos para listas de pares origem/destino,
+distribuídos em um pool de threads ou processos, ou em fluxo, com os
+resultados gravados por sinks e agregados em memória constante
+"""
+
+import argparse
+import asyncio
+import csv
+import heapq
+import io
+import json
+import pickle
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+
+from network_simulator import NetworkTopology, SimulatedClock, substream
+from packet_engine import PacketEngine
+
+
+# Snapshot da topologia usado pelo worker atual (um por thread/processo)
+_worker_state = threading.local()
+
+
+def iter_pairs(lines: Iterable[str], name: str = '<stdin>') -> Iterator[Tuple[str, str]]:
+    """Itera sobre pares 'origem destino' (um por linha, '#' comenta) sem carregá-los todos"""
+    for line_number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].replace(',', ' ').strip()
+        if not line:
+            continue
+        fields = line.split()
+        if len(fields) != 2:
+            raise ValueError(f"{name}:{line_number}: esperado 'origem destino', obtido {line!r}")
+        yield fields[0], fields[1]
+
+
+def load_pairs(path: str) -> List[Tuple[str, str]]:
+    """Lê pares 'origem destino' de um arquivo (um por linha, '#' comenta)"""
+    with open(path, encoding='utf-8') as f:
+        return list(iter_pairs(f, path))
+
+
+def _init_worker(topology_blob: bytes):
+    """Carrega o snapshot somente leitura da topologia no worker"""
+    _worker_state.topology = pickle.loads(topology_blob)
+
+
+def seeded_probe(topology: NetworkTopology, seed: int, index: int, source: str, dest: str,
+                 num_samples: int = 3, flow: Optional[Tuple[int, int, int]] = None,
+                 timeout: Optional[float] = None) -> Dict:
+    """Executa o probe número `index` de uma campanha com semente `seed`
+    
+    O probe sorteia jitter e perdas em substream(seed, index) e começa no
+    instante 0 de um PacketEngine próprio, com filas vazias, então o
+    resultado depende só de (seed, index, par), e não de quantos workers ou
+    lotes a campanha usa nem dos probes anteriores. O relógio e as filas da
+    topologia não são alterados, e várias threads podem usá-la ao mesmo tempo.
+    """
+    result, _ = topology.probe_at(source, dest, 0.0, num_samples, flow, timeout,
+                                  rng=substream(seed, index), engine=PacketEngine(topology.link_table))
+    return result
+
+
+def _probe_chunk(chunk: Sequence[Tuple[str, str]], num_samples: int, seed: Optional[int] = None,
+                 offset: int = 0) -> List[Dict]:
+    """Executa os probes de um lote de pares no snapshot do worker"""
+    return _probe_pairs(_worker_state.topology, chunk, num_samples, seed, offset)
+
+
+def _probe_pairs(topology: NetworkTopology, chunk: Sequence[Tuple[str, str]], num_samples: int,
+                 seed: Optional[int] = None, offset: int = 0) -> List[Dict]:
+    """Executa os probes de um lote; com `seed`, `offset` é o índice do primeiro par na campanha"""
+    if seed is None:
+        return [topology.probe(source, dest, num_samples) for source, dest in chunk]
+    return [seeded_probe(topology, seed, index, source, dest, num_samples)
+            for index, (source, dest) in enumerate(chunk, offset)]
+
+
+def _summarize(results: List[Dict]) -> Dict:
+    """Agrega os resultados de uma campanha"""
+    reachable = [result for result in results if result['active']]
+    averages = [result['avg_rtt'] for result in reachable]
+    sent = sum(result['sent'] for result in results)
+    received = sum(result['received'] for result in results)
+    summary = {
+        'pairs': len(results),
+        'reachable': len(reachable),
+        'unreachable': len(results) - len(reachable),
+        'sent': sent,
+        'received': received,
+        'loss_pct': round(100.0 * (sent - received) / sent, 2) if sent else 0.0,
+        'rtt_min': None,
+        'rtt_max': None,
+        'rtt_avg': None
+    }
+    if reachable:
+        summary['rtt_min'] = min(min(result['samples']) for result in reachable)
+        summary['rtt_max'] = max(max(result['samples']) for result in reachable)
+        summary['rtt_avg'] = round(sum(averages) / len(averages), 3)
+    return summary
+
+
+def run_campaign(topology: NetworkTopology, pairs: Sequence[Tuple[str, str]],
+                 workers: int = 1, executor: str = 'process', num_samples: int = 3,
+                 chunk_size: Optional[int] = None, seed: Optional[int] = None) -> Dict:
+    """Executa uma campanha de probes e retorna um relatório consolidado
+    
+    Cada worker recebe um snapshot somente leitura da topologia (com relógio
+    simulado) e processa lotes de pares; os resultados mantêm a ordem de
+    `pairs`. `executor` é 'process' ou 'thread'. Com `seed` cada probe é
+    executado por seeded_probe, e os resultados são idênticos, bit a bit,
+    para qualquer número de workers e tamanho de lote.
+    """
+    if executor not in ('process', 'thread'):
+        raise ValueError(f"Executor inválido: {executor!r}")
+    
+    start = time.perf_counter()
+    snapshot = topology.snapshot()
+    pairs = list(pairs)
+    
+    if workers <= 1:
+        results = _probe_pairs(snapshot, pairs, num_samples, seed)
+    else:
+        blob = pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+        if chunk_size is None:
+            chunk_size = max(1, min(1000, len(pairs) // (workers * 4) or 1))
+        offsets = range(0, len(pairs), chunk_size)
+        chunks = [pairs[i:i + chunk_size] for i in offsets]
+        pool_class = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        with pool_class(max_workers=workers, initializer=_init_worker, initargs=(blob,)) as pool:
+            results = []
+            for chunk_results in pool.map(_probe_chunk, chunks, [num_samples] * len(chunks),
+                                          [seed] * len(chunks), offsets):
+                results.extend(chunk_results)
+    
+    report = _summarize(results)
+    report.update({
+        'workers': workers,
+        'executor': executor if workers > 1 else 'serial',
+        'seed': seed,
+        'elapsed': round(time.perf_counter() - start, 3),
+        'results': results
+    })
+    return report
+
+
+async def probe_many(topology: NetworkTopology, pairs: Sequence[Tuple[str, str]],
+                     concurrency: int = 1000, num_samples: int = 3,
+                     timeout: Optional[float] = None, seed: Optional[int] = None) -> List[Dict]:
+    """Executa probes concorrentes em um único loop de eventos
+    
+    No máximo `concurrency` probes ficam em trânsito ao mesmo tempo; cada
+    um respeita o prazo `timeout` (segundos) de probe_async. Os resultados
+    mantêm a ordem de `pairs`. Em relógio simulado os probes são eventos
+    discretos: cada um começa no instante em que uma vaga se libera e o
+    relógio termina no fim do último, então com `concurrency`=1 os RTTs
+    são os de probes sequenciais. Com `seed`, a campanha usa um relógio
+    simulado a partir de 0 e um PacketEngine próprios (o relógio e as filas
+    da topologia não são alterados), e o probe i sorteia jitter e perdas em
+    substream(seed, i); como as filas são compartilhadas pelos probes
+    simultâneos, os RTTs se repetem para a mesma `concurrency`.
+    """
+    if seed is None:
+        if isinstance(topology.clock, SimulatedClock):
+            return await _schedule_probes(topology, pairs, concurrency, num_samples, timeout)
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def run_one(source: str, dest: str) -> Dict:
+            async with semaphore:
+                return await topology.probe_async(source, dest, num_samples, timeout=timeout)
+        
+        return await asyncio.gather(*(run_one(source, dest) for source, dest in pairs))
+    
+    return await _schedule_probes(topology, pairs, concurrency, num_samples, timeout, seed,
+                                  SimulatedClock(0.0), PacketEngine(topology.link_table))
+
+
+async def _schedule_probes(topology: NetworkTopology, pairs: Sequence[Tuple[str, str]],
+                           concurrency: int, num_samples: int, timeout: Optional[float],
+                           seed: Optional[int] = None, clock: Optional[SimulatedClock] = None,
+                           engine: Optional[PacketEngine] = None) -> List[Dict]:
+    """Escalona os probes em um relógio simulado, com até `concurrency` em trânsito
+    
+    Por padrão usa o relógio e o motor de pacotes da topologia.
+    """
+    if clock is None:
+        clock = topology.clock
+    in_flight = []  # Heap com os instantes de término dos probes em trânsito
+    results = []
+    for index, (source, dest) in enumerate(pairs):
+        if len(in_flight) >= concurrency:
+            clock.sleep(max(0.0, heapq.heappop(in_flight) - clock.now()))
+        rng = substream(seed, index) if seed is not None else None
+        start = clock.now()
+        result, duration = topology.probe_at(source, dest, start, num_samples, timeout=timeout, rng=rng,
+                                             engine=engine)
+        heapq.heappush(in_flight, start + duration)
+        results.append(result)
+        await asyncio.sleep(0)
+    if in_flight:
+        clock.sleep(max(0.0, max(in_flight) - clock.now()))
+    return results
+
+
+def run_async_campaign(topology: NetworkTopology, pairs: Sequence[Tuple[str, str]],
+                       concurrency: int = 1000, num_samples: int = 3,
+                       timeout: Optional[float] = None, seed: Optional[int] = None) -> Dict:
+    """Executa uma campanha assíncrona e retorna o mesmo relatório de run_campaign"""
+    start = time.perf_counter()
+    results = asyncio.run(probe_many(topology, pairs, concurrency, num_samples, timeout, seed))
+    
+    report = _summarize(results)
+    report.update({
+        'workers': 1,
+        'executor': 'asyncio',
+        'concurrency': concurrency,
+        'seed': seed,
+        'timed_out': sum(1 for result in results if result['timed_out']),
+        'elapsed': round(time.perf_counter() - start, 3),
+        'results': results
+    })
+    return report
+
+
+class P2Quantile:
+    """Estimativa de um quantil em memória constante (algoritmo P², Jain e Chlamtac)
+    
+    Enquanto a série tem até EXACT valores distintos, as observações são
+    guardadas como contagens por valor e o quantil é exato; assim séries
+    discretas ou com muitos empates (onde o P² erra bastante) continuam
+    exatas. No primeiro valor distinto além desse limite, cinco marcadores
+    são iniciados a partir das contagens e passam a ter as alturas
+    ajustadas por interpolação parabólica a cada nova observação.
+    """
+    
+    EXACT = 64
+    
+    __slots__ = ('p', 'count', '_counts', '_heights', '_positions', '_desired', '_increments')
+    
+    def __init__(self, p: float):
+        if not 0 < p < 1:
+            raise ValueError(f"Quantil inválido: {p}")
+        self.p = p
+        self.count = 0
+        # Valor -> ocorrências, até EXACT valores distintos (None: modo P²)
+        self._counts: Optional[Dict[float, int]] = {}
+        self._heights: List[float] = []
+        self._positions: List[int] = []
+        self._desired: List[float] = []
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+    
+    def _ranked(self) -> Tuple[List[float], List[int]]:
+        """Valores distintos ordenados e as contagens acumuladas até cada um"""
+        values = sorted(self._counts)
+        return values, list(accumulate(self._counts[value] for value in values))
+    
+    def _start_markers(self):
+        """Troca as contagens guardadas pelos cinco marcadores do P²"""
+        values, cumulative = self._ranked()
+        last = self.count - 1
+        positions = [round(last * increment) + 1 for increment in self._increments]
+        # Marcadores em posições distintas e crescentes
+        for i in (3, 2, 1):
+            positions[i] = min(positions[i], positions[i + 1] - 1)
+        for i in (1, 2, 3):
+            positions[i] = max(positions[i], positions[i - 1] + 1)
+        self._positions = positions
+        self._heights = [values[bisect_left(cumulative, position)] for position in positions]
+        self._desired = [1 + last * increment for increment in self._increments]
+        self._counts = None
+    
+    def add(self, value: float):
+        """Acrescenta uma observação"""
+        counts = self._counts
+        if counts is not None:
+            if value in counts or len(counts) < self.EXACT:
+                counts[value] = counts.get(value, 0) + 1
+                self.count += 1
+                return
+            self._start_markers()
+        self.count += 1
+        heights = self._heights
+        
+        positions, desired = self._positions, self._desired
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = bisect_right(heights, value) - 1
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            desired[i] += self._increments[i]
+        
+        # Ajusta os marcadores centrais que se afastaram da posição desejada
+        for i in (1, 2, 3):
+            offset = desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = heights[i] + step / (positions[i + 1] - positions[i - 1]) * (
+                    (positions[i] - positions[i - 1] + step) * (heights[i + 1] - heights[i])
+                    / (positions[i + 1] - positions[i])
+                    + (positions[i + 1] - positions[i] - step) * (heights[i] - heights[i - 1])
+                    / (positions[i] - positions[i - 1]))
+                if not heights[i - 1] < height < heights[i + 1]:
+                    # Parábola fora do intervalo: interpolação linear
+                    height = heights[i] + step * (heights[i + step] - heights[i]) \
+                        / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+    
+    def value(self) -> Optional[float]:
+        """Quantil atual (None sem observações), exato enquanto há até EXACT valores distintos"""
+        if not self.count:
+            return None
+        if self._counts is not None:
+            values, cumulative = self._ranked()
+            rank = self.p * (self.count - 1)
+            low = int(rank)
+            high = min(low + 1, self.count - 1)
+            low_value = values[bisect_right(cumulative, low)]
+            high_value = values[bisect_right(cumulative, high)]
+            return low_value + (high_value - low_value) * (rank - low)
+        return self._heights[2]
+
+
+class RollingStats:
+    """Contagem, mínimo, máximo, média e quantis de uma série, em memória constante"""
+    
+    QUANTILES = (0.5, 0.95, 0.99)
+    
+    __slots__ = ('count', 'min', 'max', 'mean', '_quantiles')
+    
+    def __init__(self, quantiles: Sequence[float] = QUANTILES):
+        self.count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.mean = 0.0
+        self._quantiles = [P2Quantile(p) for p in quantiles]
+    
+    def add(self, value: float):
+        """Acrescenta uma observação"""
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.mean += (value - self.mean) / self.count
+        for quantile in self._quantiles:
+            quantile.add(value)
+    
+    def summary(self) -> Dict:
+        """Estatísticas atuais; quantis com chaves 'p50', 'p95', 'p99'..."""
+        summary = {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'mean': round(self.mean, 3) if self.count else None
+        }
+        for quantile in self._quantiles:
+            value = quantile.value()
+            summary[f"p{quantile.p * 100:g}"] = round(value, 3) if value is not None else None
+        return summary
+
+
+class _FileSink:
+    """Base dos sinks em arquivo: acumula linhas e grava em blocos de `buffer_size`"""
+    
+    def __init__(self, output: Union[str, TextIO], buffer_size: int = 1000):
+        if isinstance(output, str):
+            self._file = open(output, 'w', encoding='utf-8', newline='')
+            self._owned = True
+        else:
+            self._file = output
+            self._owned = False
+        self.buffer_size = buffer_size
+        self._buffer: List[str] = []
+        self.records = 0
+    
+    def _append(self, line: str):
+        self._buffer.append(line)
+        self.records += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+    
+    def flush(self):
+        """Grava as linhas acumuladas"""
+        if self._buffer:
+            self._file.write(''.join(self._buffer))
+            self._buffer.clear()
+        self._file.flush()
+    
+    def close(self):
+        """Grava o que falta e fecha o arquivo (se foi aberto pelo sink)"""
+        self.flush()
+        if self._owned:
+            self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonLinesSink(_FileSink):
+    """Grava cada resultado de probe como uma linha JSON"""
+    
+    def write(self, record: Dict):
+        self._append(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+class CsvSink(_FileSink):
+    """Grava os resultados de probe em CSV, uma linha por probe (amostras separadas por ';')"""
+    
+    FIELDS = ('source', 'dest', 'active', 'hops', 'sent', 'received', 'samples', 'rtt_min', 'rtt_avg', 'rtt_max',
+              'timed_out')
+    
+    def __init__(self, output: Union[str, TextIO], buffer_size: int = 1000):
+        super().__init__(output, buffer_size)
+        self._line = io.StringIO()
+        self._writer = csv.writer(self._line, lineterminator='\n')
+        self._buffer.append(self._row(self.FIELDS))
+    
+    def _row(self, values: Sequence) -> str:
+        self._line.seek(0)
+        self._line.truncate()
+        self._writer.writerow(values)
+        return self._line.getvalue()
+    
+    def write(self, record: Dict):
+        samples = record['samples']
+        self._append(self._row((
+            record['source'], record['dest'], int(record['active']), max(len(record['path']) - 1, 0),
+            record['sent'], record['received'], ';'.join(str(sample) for sample in samples),
+            min(samples) if samples else '', record['avg_rtt'] if samples else '',
+            max(samples) if samples else '', int(record['timed_out']))))
+
+
+class StatsSink:
+    """Agrega as amostras de RTT em RollingStats, no total e por par origem/destino
+    
+    A memória cresce com o número de pares distintos, não com o de probes.
+    """
+    
+    def __init__(self, per_pair: bool = True):
+        self.per_pair = per_pair
+        self.probes = 0
+        self.reachable = 0
+        self.timed_out = 0
+        self.sent = 0
+        self.received = 0
+        self.overall = RollingStats()
+        self.pairs: Dict[Tuple[str, str], RollingStats] = {}
+    
+    def write(self, record: Dict):
+        self.probes += 1
+        if record['active']:
+            self.reachable += 1
+        if record['timed_out']:
+            self.timed_out += 1
+        self.sent += record['sent']
+        self.received += record['received']
+        stats = None
+        if self.per_pair:
+            key = (record['source'], record['dest'])
+            stats = self.pairs.get(key)
+            if stats is None:
+                stats = self.pairs[key] = RollingStats()
+        for sample in record['samples']:
+            self.overall.add(sample)
+            if stats is not None:
+                stats.add(sample)
+    
+    def close(self):
+        pass
+    
+    def summary(self) -> Dict:
+        """Resumo no formato de run_campaign, com os quantis das amostras"""
+        overall = self.overall.summary()
+        summary = {
+            'pairs': self.probes,
+            'reachable': self.reachable,
+            'unreachable': self.probes - self.reachable,
+            'timed_out': self.timed_out,
+            'sent': self.sent,
+            'received': self.received,
+            'loss_pct': round(100.0 * (self.sent - self.received) / self.sent, 2) if self.sent else 0.0,
+            'rtt_min': overall['min'],
+            'rtt_max': overall['max'],
+            'rtt_avg': overall['mean']
+        }
+        summary.update((key, value) for key, value in overall.items() if key.startswith('p'))
+        return summary
+    
+    def pair_summary(self) -> Dict[Tuple[str, str], Dict]:
+        """Estatísticas de cada par origem/destino"""
+        return {key: stats.summary() for key, stats in self.pairs.items()}
+
+
+def open_sink(path: str, buffer_size: int = 1000) -> _FileSink:
+    """Abre um sink pelo formato do arquivo: .csv para CSV, qualquer outro para JSON Lines"""
+    if path.lower().endswith('.csv'):
+        return CsvSink(path, buffer_size)
+    return JsonLinesSink(path, buffer_size)
+
+
+def iter_probes(topology: NetworkTopology, pairs: Iterable[Tuple[str, str]], num_samples: int = 3,
+                flow: Optional[Tuple[int, int, int]] = None, timeout: Optional[float] = None,
+                seed: Optional[int] = None) -> Iterator[Dict]:
+    """Gera o resultado de cada probe à medida que é executado, sem guardá-los
+    
+    Com `seed` os probes são executados por seeded_probe.
+    """
+    if seed is None:
+        for source, dest in pairs:
+            yield topology.probe(source, dest, num_samples, flow, timeout)
+        return
+    for index, (source, dest) in enumerate(pairs):
+        yield seeded_probe(topology, seed, index, source, dest, num_samples, flow, timeout)
+
+
+def stream_campaign(topology: NetworkTopology, pairs: Iterable[Tuple[str, str]], sinks: Sequence = (),
+                    num_samples: int = 3, flow: Optional[Tuple[int, int, int]] = None,
+                    per_pair: bool = False, timeout: Optional[float] = None,
+                    seed: Optional[int] = None) -> Dict:
+    """Executa uma campanha em fluxo: cada resultado vai para os `sinks` e é descartado
+    
+    `pairs` pode ser um iterador (ex.: iter_pairs sobre um arquivo), então
+    a memória não cresce com o número de probes. Retorna o resumo de
+    StatsSink (com p50/p95/p99 das amostras) e, com `per_pair`, as
+    estatísticas por par em 'per_pair'.
+    """
+    start = time.perf_counter()
+    stats = StatsSink(per_pair)
+    sinks = list(sinks) + [stats]
+    for record in iter_probes(topology, pairs, num_samples, flow, timeout, seed):
+        for sink in sinks:
+            sink.write(record)
+    
+    report = stats.summary()
+    report.update({
+        'workers': 1,
+        'executor': 'stream',
+        'seed': seed,
+        'elapsed': round(time.perf_counter() - start, 3)
+    })
+    if per_pair:
+        report['per_pair'] = {f"{source} {dest}": summary
+                              for (source, dest), summary in stats.pair_summary().items()}
+    return report
+
+
+def main():
+    """Executa uma campanha a partir de um arquivo de pares"""
+    parser = argparse.ArgumentParser(description="Campanha de XProbe em lote")
+    parser.add_argument('pairs_file', help="arquivo com pares 'origem destino' por linha")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--executor', choices=['process', 'thread', 'asyncio', 'stream'], default='process',
+                        help="'stream' executa em série, sem guardar os resultados (memória constante)")
+    parser.add_argument('--samples', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=1000,
+                        help="probes simultâneos no modo asyncio")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="timeout por probe em segundos (modos asyncio e stream)")
+    parser.add_argument('--output', help="grava cada resultado em JSON Lines (ou CSV, se terminar em .csv)")
+    parser.add_argument('--seed', type=int,
+                        help="semente: resultados reprodutíveis e iguais com qualquer número de workers")
+    args = parser.parse_args()
+    
+    if args.executor == 'stream':
+        sink = open_sink(args.output) if args.output else None
+        try:
+            with open(args.pairs_file, encoding='utf-8') as f:
+                report = stream_campaign(NetworkTopology(SimulatedClock()), iter_pairs(f, args.pairs_file),
+                                         [sink] if sink else [], num_samples=args.samples,
+                                         timeout=args.timeout, seed=args.seed)
+        finally:
+            if sink is not None:
+                sink.close()
+        print_report(report)
+        return
+    
+    pairs = load_pairs(args.pairs_file)
+    if args.executor == 'asyncio':
+        topology = NetworkTopology(SimulatedClock())
+        report = run_async_campaign(topology, pairs, concurrency=args.concurrency,
+                                    num_samples=args.samples, timeout=args.timeout, seed=args.seed)
+    else:
+        report = run_campaign(NetworkTopology(), pairs, workers=args.workers,
+                              executor=args.executor, num_samples=args.samples, seed=args.seed)
+    if args.output:
+        with open_sink(args.output) as sink:
+            for result in report['results']:
+                sink.write(result)
+    print_report(report)
+
+
+def print_report(report: Dict):
+    """Exibe o resumo de uma campanha"""
+    print(f"Pares: {report['pairs']} | Alcançáveis: {report['reachable']} | "
+          f"Inalcançáveis: {report['unreachable']}")
+    print(f"Amostras enviadas: {report['sent']} | Recebidas: {report['received']} | "
+          f"Perda: {report['loss_pct']:g}%")
+    if report['reachable']:
+        print(f"RTT mín/méd/máx: {report['rtt_min']}/{report['rtt_avg']}/{report['rtt_max']} ms")
+        if 'p50' in report:
+            print(f"RTT p50/p95/p99: {report['p50']}/{report['p95']}/{report['p99']} ms")
+    print(f"Tempo: {report['elapsed']} s ({report['workers']} workers, {report['executor']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -135,16 +135,20 @@ def run_analysis():
         ('192.168.1.2', '192.168.1.3'),  # h1 -> h2
     ]
     
+    # Calcula a matriz de alcançabilidade de todos os pares de uma vez
+    matrix = simulator.topology.compute_path_matrix()
+    summary = matrix.summary()
+    print(f"\n  Pares de hosts alcançáveis: {summary['reachable']}/{summary['pairs']}")
+    
     print("\n  Testando conectividade entre hosts selecionados:\n")
     
     for source, dest in test_pairs:
         source_dev = simulator.topology.get_device_by_ip(source)
         dest_dev = simulator.topology.get_device_by_ip(dest)
-        path = simulator.topology.trace_route(source, dest)
+        hops = matrix.hops(source_dev.name, dest_dev.name)
         
-        if len(path) >= 2:
+        if hops is not None:
             status = "✓ ALCANÇÁVEL"
-            hops = len(path) - 1
         else:
             status = "✗ INALCANÇÁVEL"
             hops = 0
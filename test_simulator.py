@@ -0,0 +1,614 @@
+"""
+Testes do simulador
+Verificações automáticas (pytest) da topologia, dos probes e das campanhas
+"""
+
+import asyncio
+import inspect
+import json
+import os
+import pickle
+import random
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import benchmark
+import link_state
+import network_simulator
+import traffic_matrix
+from network_simulator import (DEFAULT_TOPOLOGY, PROTOCOL_TCP, PROTOCOL_UDP, ForwardingTable, Host, NetworkTopology,
+                               Route, Router, SimulatedClock, build_parser, flow_hash, int_to_ip, ip_to_int, main,
+                               prefix_mask, summarize_routes)
+from probe_campaign import P2Quantile, iter_probes, probe_many, run_campaign, seeded_probe
+from topology_generator import generate_hierarchical
+from topology_loader import iter_topology_lines, load_records, load_topology, save_topology
+from topology_snapshot import load_snapshot, save_snapshot
+from traffic_matrix import TrafficMatrix
+
+
+def make_topology(seed: int = 1) -> NetworkTopology:
+    """Topologia padrão com relógio simulado em 0 e semente fixa"""
+    return NetworkTopology(SimulatedClock(0.0), seed=seed)
+
+
+def host_pairs(topology: NetworkTopology, count: int = 30):
+    """Pares origem/destino distintos entre os hosts da topologia"""
+    hosts = [device.get_ip() for device in topology.devices.values() if device.device_type == 'Host']
+    pairs = [(hosts[i % len(hosts)], hosts[(i * 7 + 3) % len(hosts)]) for i in range(count)]
+    return [(source, dest) for source, dest in pairs if source != dest]
+
+
+def test_async_sequential_matches_sync_probes():
+    """Com concurrency=1 os probes assíncronos reproduzem os RTTs dos síncronos"""
+    sync_topology = make_topology()
+    pairs = host_pairs(sync_topology)
+    sync = [sync_topology.probe(source, dest)['samples'] for source, dest in pairs]
+    
+    async_topology = make_topology()
+    results = asyncio.run(probe_many(async_topology, pairs, concurrency=1))
+    assert [result['samples'] for result in results] == sync
+    assert async_topology.clock.now() > sync_topology.clock.now()
+
+
+def test_async_seeded_sequential_matches_seeded_probes():
+    """Com semente, concurrency=1 reproduz os probes de seeded_probe"""
+    topology = make_topology()
+    pairs = host_pairs(topology)
+    expected = [result['samples'] for result in iter_probes(topology, pairs, seed=5)]
+    results = asyncio.run(probe_many(make_topology(), pairs, concurrency=1, seed=5))
+    assert [result['samples'] for result in results] == expected
+
+
+def test_probe_async_advances_simulated_clock():
+    """A espera de probe_async avança o relógio simulado até a última resposta"""
+    topology = make_topology()
+    source, dest = host_pairs(topology)[0]
+    result = asyncio.run(topology.probe_async(source, dest))
+    assert result['timestamps'] == [0.0, 0.1, 0.2]
+    assert topology.clock.now() == 0.2 + result['samples'][-1] / 1000
+
+
+def test_probe_timeout_is_a_deadline():
+    """Amostras que seriam enviadas depois do prazo não são enviadas"""
+    topology = make_topology()
+    source, dest = host_pairs(topology)[0]
+    result = asyncio.run(topology.probe_async(source, dest, timeout=0.15))
+    assert result['sent'] == 2
+    assert topology.clock.now() < 0.15
+    assert topology.probe(source, dest, timeout=0.15)['sent'] == 2
+
+
+def test_probe_variants_share_parameter_order():
+    """probe_async, probe_at, calculate_rtt e calculate_rtt_async aceitam as opções na ordem de probe"""
+    def options(method, skip=()):
+        return [name for name in inspect.signature(method).parameters if name not in skip]
+    
+    expected = options(NetworkTopology.probe)
+    assert expected[3:] == ['num_samples', 'flow', 'timeout', 'packet_size', 'rng']
+    assert options(NetworkTopology.probe_async) == expected
+    assert options(NetworkTopology.probe_at, ('start', 'engine')) == expected
+    assert options(NetworkTopology.calculate_rtt) == expected[:-1]
+    assert options(NetworkTopology.calculate_rtt_async) == expected[:-1]
+    
+    topology = make_topology()
+    source, dest = host_pairs(topology)[0]
+    result = asyncio.run(topology.probe_async(source, dest, 3, None, 0.15))
+    assert result['sent'] == 2
+    assert topology.probe_at(source, dest, 0.0, 3, None, 0.15)[0]['sent'] == 2
+
+
+def test_default_topology_comes_from_file():
+    """A topologia padrão é a descrita em topologia_padrao.txt"""
+    topology = make_topology()
+    with open(DEFAULT_TOPOLOGY, encoding='utf-8') as f:
+        loaded = load_records(NetworkTopology(build=False), f)
+    assert list(iter_topology_lines(topology)) == list(iter_topology_lines(loaded))
+    assert list(topology.devices) == list(loaded.devices)
+
+
+def test_loader_does_not_import_the_simulator():
+    """topology_loader não importa network_simulator (que o usa na topologia padrão)"""
+    code = "import sys, topology_loader; sys.exit('network_simulator' in sys.modules)"
+    directory = os.path.dirname(os.path.abspath(__file__))
+    assert subprocess.run([sys.executable, '-c', code], cwd=directory).returncode == 0
+
+
+def test_text_format_keeps_inactive_hosts(tmp_path):
+    """O estado dos hosts sobrevive a gravar e carregar o formato texto"""
+    path = os.path.join(tmp_path, 'topologia.txt')
+    original = make_topology()
+    original.devices['h3'].active = False
+    save_topology(original, path)
+    topology = load_topology(path)
+    inactive = [name for name, device in topology.devices.items()
+                if isinstance(device, Host) and not device.active]
+    assert inactive == ['h3']
+
+
+def test_host_interface_view():
+    """O host guarda uma única interface, exposta por uma visão somente leitura"""
+    host = Host('h', '10.0.0.2', '24', '10.0.0.1')
+    assert dict(host.interfaces) == {'eth0': host.interface}
+    assert host.get_ip() == '10.0.0.2'
+    host.add_interface('eth0', '10.0.0.3', '24')
+    assert host.interfaces['eth0'].ip == '10.0.0.3'
+    with pytest.raises(ValueError):
+        host.add_interface('eth1', '10.0.1.2', '24')
+    assert host.remove_interface('eth0') is not None and len(host.interfaces) == 0
+
+
+def test_route_keeps_dict_access():
+    """Route aceita as chaves do antigo formato em dict"""
+    topology = make_topology()
+    route = topology.devices['e1'].get_route('192.168.4.3')
+    assert route['next_hop'] == route.as_dict()['next_hop'] != 'directly connected'
+    assert route['interface'] == route.interface and route[3] == route.interface
+    connected = topology.devices['e1'].get_route('192.168.1.2')
+    assert connected['next_hop'] == 'directly connected' and connected.get('mask') == '28'
+
+
+def test_script_with_topology_file_shows_hosts():
+    """Como script, --topology carrega o arquivo e os hosts aparecem com gateway"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run([sys.executable, 'network_simulator.py', '--topology', DEFAULT_TOPOLOGY,
+                                'info', '--json'], cwd=directory, capture_output=True, text=True)
+    assert completed.returncode == 0
+    devices = json.loads(completed.stdout)['devices']
+    assert [device['gateway'] for device in devices if device['name'] == 'h1'] == ['192.168.1.1']
+
+
+def test_probe_batch_probes_each_pair(tmp_path, capsys):
+    """probe-batch faz um probe por linha do arquivo de pares"""
+    path = os.path.join(tmp_path, 'pares.txt')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("h1 h8\n# comentário\nh2 192.168.3.2\n")
+    assert main(['probe-batch', path]) == 0
+    output = capsys.readouterr().out
+    assert 'h1 -> h8:' in output and 'h2 -> 192.168.3.2:' in output and 'Probes: 2' in output
+
+
+def test_probe_batch_reports_unreadable_file(tmp_path, capsys):
+    """Um arquivo de pares ilegível é reportado sem traceback, com código 1"""
+    assert main(['probe-batch', os.path.join(tmp_path, 'inexistente.txt')]) == 1
+    assert 'inexistente.txt' in capsys.readouterr().err
+
+
+def test_remove_device_from_lazy_snapshot(tmp_path):
+    """Remover um dispositivo de um snapshot preguiçoso tira os seus IPs do índice"""
+    path = os.path.join(tmp_path, 'topologia.snap')
+    original = make_topology()
+    save_snapshot(original, path)
+    ip = original.devices['h7'].get_ip()
+    topology = load_snapshot(path)
+    
+    assert topology.remove_device('h7') is not None
+    assert 'h7' not in topology.devices
+    assert topology.get_device_by_ip(ip) is None
+    owners = {device.name for device, _ in topology._ip_index.values()}
+    assert 'h7' not in owners and len(owners) == len(topology.devices)
+    assert topology.simulate_traffic([('h1', 'h8', '10 Mbps')]) is not None
+
+
+def test_lazy_snapshot_dict_stays_consistent(tmp_path):
+    """len, in, del e iteração concordam em um snapshot preguiçoso"""
+    path = os.path.join(tmp_path, 'topologia.snap')
+    original = make_topology()
+    save_snapshot(original, path)
+    devices = load_snapshot(path).devices
+    
+    devices['e1']
+    devices['h1'] = devices['h1']
+    del devices['h2']
+    del devices['e1']
+    devices['novo'] = None
+    expected = [name for name in original.devices if name not in ('h2', 'e1')] + ['novo']
+    assert len(devices) == len(expected)
+    assert 'h2' not in devices and 'e1' not in devices and 'h3' in devices
+    assert list(devices) == expected
+    assert len(devices) == len(expected)
+
+
+def test_snapshot_keeps_loss_probabilities(tmp_path):
+    """As probabilidades de perda sobrevivem a gravar e carregar o snapshot"""
+    path = os.path.join(tmp_path, 'topologia.snap')
+    original = make_topology()
+    original.set_link_loss('e1', 'a1', 0.25)
+    original.set_device_loss('h8', 0.5)
+    save_snapshot(original, path)
+    for lazy in (True, False):
+        topology = load_snapshot(path, lazy=lazy)
+        assert topology.link_loss == original.link_loss
+        assert topology.device_loss == original.device_loss
+
+
+def exact_quantile(values, p: float) -> float:
+    """Quantil com interpolação linear entre as posições vizinhas"""
+    values = sorted(values)
+    rank = p * (len(values) - 1)
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def p2_quantile(values, p: float) -> P2Quantile:
+    quantile = P2Quantile(p)
+    for value in values:
+        quantile.add(value)
+    return quantile
+
+
+def test_p2_quantile_is_exact_up_to_the_limit():
+    """Com EXACT valores (todos distintos) o quantil ainda é exato"""
+    rng = random.Random(1)
+    values = [rng.lognormvariate(0, 1) for _ in range(P2Quantile.EXACT)]
+    for p in (0.5, 0.95, 0.99):
+        assert p2_quantile(values, p).value() == pytest.approx(exact_quantile(values, p))
+        assert p2_quantile(values[:-1], p).value() == pytest.approx(exact_quantile(values[:-1], p))
+
+
+def test_p2_quantile_keeps_discrete_series_exact():
+    """Séries com poucos valores distintos continuam exatas em qualquer tamanho"""
+    rng = random.Random(2)
+    values = [rng.choice((0.6, 1.4)) for _ in range(1000)]
+    values += [round(rng.uniform(0.5, 0.7), 2) for _ in range(1000)]
+    for p in (0.5, 0.95, 0.99):
+        assert p2_quantile(values, p).value() == pytest.approx(exact_quantile(values, p))
+
+
+def test_p2_quantile_estimates_continuous_series():
+    """Além do limite de valores distintos, a estimativa do P² fica próxima do exato"""
+    rng = random.Random(3)
+    values = [rng.gauss(10, 1) for _ in range(20000)]
+    quantile = p2_quantile(values, 0.5)
+    assert quantile._counts is None
+    assert quantile.value() == pytest.approx(exact_quantile(values, 0.5), abs=0.05)
+
+
+@pytest.mark.parametrize('size', [0, -100])
+def test_packet_size_must_be_positive(size):
+    """Tamanhos de pacote não positivos são rejeitados na API e na linha de comando"""
+    topology = make_topology()
+    source, dest = host_pairs(topology)[0]
+    with pytest.raises(ValueError):
+        topology.path_rtt(source, dest, size)
+    with pytest.raises(ValueError):
+        topology.probe(source, dest, packet_size=size)
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(['xprobe', 'h1', 'h8', '--packet-size', str(size)])
+
+
+def test_unseeded_workers_draw_different_jitter():
+    """Sem semente, workers de processo não repetem a sequência de jitter uns dos outros"""
+    topology = NetworkTopology(SimulatedClock(0.0))
+    pairs = [(topology.devices['h1'].get_ip(), topology.devices['h8'].get_ip())] * 8
+    results = run_campaign(topology, pairs, workers=2, executor='process', chunk_size=4)['results']
+    samples = [result['samples'] for result in results]
+    assert samples[:4] != samples[4:]
+
+
+def test_seeded_topology_copies_repeat_the_sequence():
+    """Cópias de uma topologia com semente continuam a sequência do original"""
+    topology = make_topology(seed=9)
+    copy = topology.snapshot(SimulatedClock(0.0))
+    source, dest = host_pairs(topology)[0]
+    assert copy.probe(source, dest)['samples'] == topology.probe(source, dest)['samples']
+
+
+def random_router(rng: random.Random, name: str = 'r') -> Router:
+    """Roteador com interfaces e rotas aleatórias que se sobrepõem em 10.0.0.0/16
+    
+    Inclui rota padrão, rotas /32 e prefixos repetidos com saídas distintas.
+    """
+    router = Router(name, 'Core')
+    for i in range(rng.randint(1, 6)):
+        address = 0x0A000000 | rng.getrandbits(16)
+        router.add_interface(f"eth{i}", address, rng.choice((8, 16, 20, 24, 28, 30, 32)))
+    names = list(router.interfaces)
+    for _ in range(rng.randint(0, 40)):
+        prefix_len = rng.choice((0, 8, 12, 16, 20, 24, 24, 26, 28, 30, 32, 32))
+        address = 0x0A000000 | rng.getrandbits(16) if rng.random() < 0.9 else rng.getrandbits(32)
+        router.add_route(address & prefix_mask(prefix_len), prefix_len,
+                         0x0A000000 | rng.getrandbits(16), rng.choice(names))
+    return router
+
+
+def random_destinations(rng: random.Random, router: Router, count: int):
+    """Destinos aleatórios, concentrados nas redes do roteador e nas suas bordas"""
+    networks = [(iface.network_address, iface.prefix_len) for iface in router.interfaces.values()]
+    networks += [(route.destination, route.prefix_len) for route in router.routing_table]
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.5:
+            yield 0x0A000000 | rng.getrandbits(16)
+        elif choice < 0.6:
+            yield rng.getrandbits(32)
+        else:
+            network, prefix_len = rng.choice(networks)
+            host_bits = ~prefix_mask(prefix_len) & 0xFFFFFFFF
+            yield network | rng.choice((0, host_bits, rng.getrandbits(32) & host_bits))
+
+
+def linear_scan(router: Router, dest_ip: int):
+    """Busca da versão original: a primeira interface que casa, senão a rota de prefixo mais longo (a primeira)"""
+    for iface_name, iface in router.interfaces.items():
+        if dest_ip & prefix_mask(iface.prefix_len) == iface.network_address:
+            return Route(iface.network_address, iface.prefix_len, None, iface_name)
+    best = None
+    for route in router.routing_table:
+        if dest_ip & prefix_mask(route.prefix_len) == route.destination:
+            if best is None or route.prefix_len > best.prefix_len:
+                best = route
+    return best
+
+
+def test_get_route_matches_linear_scan():
+    """get_route devolve a rota da varredura linear; com hash de fluxo, um membro do mesmo grupo"""
+    rng = random.Random(1)
+    for i in range(60):
+        router = random_router(rng)
+        routes = list(router.routing_table)
+        for dest_ip in random_destinations(rng, router, 300):
+            expected = linear_scan(router, dest_ip)
+            assert router.get_route(int_to_ip(dest_ip)) == expected, (i, int_to_ip(dest_ip))
+            
+            route = router.get_route(int_to_ip(dest_ip), rng.getrandbits(8))
+            if expected is None or expected.next_hop is None:
+                assert route == expected
+            else:
+                assert route[:2] == expected[:2] and route in routes
+
+
+def random_routes(rng: random.Random, count: int):
+    """Rotas dentro de 10.0.0.0/22 com poucas saídas, para que irmãos e rotas cobertas se repitam"""
+    exits = [(0x0A000101, 'eth0'), (0x0A000102, 'eth0'), (0x0A000201, 'eth1')]
+    routes = []
+    for _ in range(count):
+        prefix_len = rng.choice((0, 20, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32))
+        network = (0x0A000000 | rng.getrandbits(10)) & prefix_mask(prefix_len)
+        for next_hop, interface in rng.sample(exits, 2 if rng.random() < 0.15 else 1):
+            routes.append(Route(network, prefix_len, next_hop, interface))
+    return routes
+
+
+def test_summarize_routes_keeps_forwarding():
+    """A tabela sumarizada encaminha todo endereço de 10.0.0.0/22 como a original, com e sem hash de fluxo"""
+    rng = random.Random(11)
+    removed = 0
+    for i in range(80):
+        routes = random_routes(rng, rng.randint(1, 60))
+        summary = summarize_routes(routes)
+        original = ForwardingTable({}, routes, seed=i)
+        summarized = ForwardingTable({}, summary, seed=i)
+        removed += len(routes) - len(summary)
+        for dest_ip in list(range(0x0A000000, 0x0A000400)) + [0x09FFFFFF, 0x0A000400, 0x0A0FFFFF, 0x0B000000]:
+            flow = rng.getrandbits(16)
+            for expected, route in ((original.lookup(dest_ip), summarized.lookup(dest_ip)),
+                                    (original.lookup(dest_ip, flow), summarized.lookup(dest_ip, flow))):
+                assert (route and route[2:]) == (expected and expected[2:]), (i, int_to_ip(dest_ip))
+    assert removed > 0
+    
+    # Irmãos com saídas distintas ficam; a rota coberta pela menos específica de mesma saída sai
+    a, b = (0x0A000101, 'eth0'), (0x0A000201, 'eth1')
+    routes = [Route(0x0A000000, 25, *a), Route(0x0A000080, 25, *b),
+              Route(0x0A000100, 24, *a), Route(0x0A000180, 25, *a), Route(0x0A000100, 26, *b)]
+    assert summarize_routes(routes) == [Route(0x0A000000, 25, *a), Route(0x0A000080, 25, *b),
+                                        Route(0x0A000100, 24, *a), Route(0x0A000100, 26, *b)]
+
+
+@pytest.mark.parametrize('numpy_path', [True, False])
+def test_lookup_many_matches_lookup(monkeypatch, numpy_path):
+    """lookup_many(ds)[i] é a rota de lookup(ds[i]), vetorizado ou não, com e sem hashes de fluxo"""
+    if numpy_path and not network_simulator.NUMPY_AVAILABLE:
+        pytest.skip("NumPy não instalado")
+    monkeypatch.setattr(network_simulator, 'NUMPY_AVAILABLE', numpy_path)
+    
+    def routes(table, indices):
+        return [table.entries[index] if index >= 0 else None for index in indices]
+    
+    rng = random.Random(13)
+    for _ in range(40):
+        router = random_router(rng)
+        table = router.get_forwarding_table()
+        dests = list(random_destinations(rng, router, 200))
+        hashes = [rng.getrandbits(32) for _ in dests]
+        assert routes(table, table.lookup_many(dests)) == [table.lookup(dest) for dest in dests]
+        assert routes(table, table.lookup_many(dests, hashes)) == [table.lookup(d, h) for d, h in zip(dests, hashes)]
+    
+    topology = generate_hierarchical(cores=2, ecmp=True, clock=SimulatedClock(0.0))
+    dests = [ip_to_int(device.get_ip()) for device in topology.devices.values() if device.device_type == 'Host']
+    dests += [rng.getrandbits(32) for _ in range(100)]
+    hashes = [rng.getrandbits(32) for _ in dests]
+    for flow_hashes in (None, hashes):
+        results = topology.lookup_many(dests, flow_hashes=flow_hashes)
+        assert set(results) == {name for name, device in topology.devices.items() if device.device_type != 'Host'}
+        for name, indices in results.items():
+            table = topology.devices[name].get_forwarding_table()
+            expected = [table.lookup(dest, None if flow_hashes is None else flow_hashes[i])
+                        for i, dest in enumerate(dests)]
+            assert routes(table, indices) == expected, name
+
+
+def trace_load(topology: NetworkTopology, demands):
+    """Carga por enlace e número de demandas não roteáveis, somando o trace_route de cada demanda"""
+    load, unroutable = {}, 0
+    for order, (source, dest, rate) in enumerate(demands):
+        source_host, dest_host = topology.devices[source], topology.devices[dest]
+        if not source_host.active or not dest_host.active:
+            unroutable += 1
+            continue
+        flow = (TrafficMatrix.FLOW_PROTOCOL, order % 16384 + 49152, TrafficMatrix.FLOW_DEST_PORT)
+        hops = topology.trace_route(source_host.get_ip(), dest_host.get_ip(), flow)
+        if not hops or hops[-1] != f"{dest} ({dest_host.get_ip()})":
+            unroutable += 1
+            continue
+        names = [hop.split(' (')[0] for hop in hops]
+        for link in zip(names, names[1:]):
+            load[link] = load.get(link, 0.0) + rate
+    return load, unroutable
+
+
+@pytest.mark.parametrize('numpy_path', [True, False])
+def test_traffic_matrix_matches_trace_route(monkeypatch, numpy_path):
+    """A carga de cada enlace é a soma dos trace_route das demandas, com o mesmo fluxo, vetorizado ou não"""
+    if numpy_path and not traffic_matrix.NUMPY_AVAILABLE:
+        pytest.skip("NumPy não instalado")
+    monkeypatch.setattr(traffic_matrix, 'NUMPY_AVAILABLE', numpy_path)
+    
+    topology = generate_hierarchical(cores=2, edges=6, hosts=30, ecmp=True, clock=SimulatedClock(0.0))
+    hosts = sorted(name for name, device in topology.devices.items() if device.device_type == 'Host')
+    topology.devices[hosts[3]].active = False
+    topology.devices[hosts[5]].gateway = '10.255.255.1'
+    rng = random.Random(14)
+    demands = [(rng.choice(hosts), rng.choice(hosts), rng.choice((1e6, 2.5e6, 10e6))) for _ in range(600)]
+    demands = [(source, dest, rate) for source, dest, rate in demands if source != dest]
+    
+    traffic = topology.simulate_traffic(demands)
+    load, unroutable = trace_load(topology, demands)
+    assert traffic.unroutable == unroutable > 0
+    assert traffic.link_load == pytest.approx(load)
+    # Os fluxos de cada Aggregation se espalham pelos dois Core
+    assert {('a1', 'c1'), ('a1', 'c2'), ('a2', 'c1'), ('a2', 'c2')} <= set(load)
+
+
+def routing_tables(topology: NetworkTopology):
+    """Rotas de cada roteador, em ordem"""
+    return {name: list(device.routing_table) for name, device in topology.devices.items()
+            if device.device_type != 'Host'}
+
+
+@pytest.mark.parametrize('numpy_path', [True, False])
+def test_link_state_updates_match_full_compute(monkeypatch, numpy_path):
+    """Após cada falha ou recuperação, as tabelas incrementais são as de um compute() completo"""
+    if numpy_path and not link_state.NUMPY_AVAILABLE:
+        pytest.skip("NumPy não instalado")
+    monkeypatch.setattr(link_state, 'NUMPY_AVAILABLE', numpy_path)
+    
+    topology = generate_hierarchical(cores=3, aggregations=4, edges=24, hosts=48, clock=SimulatedClock(0.0))
+    topology.enable_link_state(max_paths=2)
+    routers = sorted(routing_tables(topology))
+    adjacent = sorted({tuple(sorted((name, peer.name))) for name in routers
+                       for peer in topology.devices[name].connections.values() if peer.device_type != 'Host'})
+    rng = random.Random(15)
+    failed_links, failed_devices = set(), set()
+    for step in range(80):
+        action = rng.choice(('fail_link', 'restore_link', 'fail_device', 'restore_device'))
+        if action == 'fail_link':
+            pair = rng.choice(adjacent)
+            failed_links.add(pair)
+            topology.fail_link(*pair)
+        elif action == 'restore_link' and failed_links:
+            pair = rng.choice(sorted(failed_links))
+            failed_links.discard(pair)
+            topology.restore_link(*pair)
+        elif action == 'fail_device':
+            name = rng.choice(routers)
+            failed_devices.add(name)
+            topology.fail_device(name)
+        elif action == 'restore_device' and failed_devices:
+            name = rng.choice(sorted(failed_devices))
+            failed_devices.discard(name)
+            topology.restore_device(name)
+        
+        fresh = pickle.loads(pickle.dumps(topology))
+        fresh.link_state.compute()
+        assert routing_tables(topology) == routing_tables(fresh), (step, action)
+
+
+def test_ecmp_flows_are_stable_and_spread():
+    """Um fluxo segue sempre o mesmo Core; fluxos distintos se espalham pelo grupo, como escolhe select()"""
+    topology = generate_hierarchical(cores=4, hosts=16, ecmp=True, clock=SimulatedClock(0.0))
+    twin = generate_hierarchical(cores=4, hosts=16, ecmp=True, clock=SimulatedClock(0.0))
+    hosts = [device.get_ip() for device in topology.devices.values() if device.device_type == 'Host']
+    local, remote = hosts[:len(hosts) // 2], hosts[len(hosts) // 2:]
+    table = topology.devices['a1'].get_forwarding_table()
+    rng = random.Random(16)
+    chosen = {}
+    for port in range(2000):
+        source, dest = rng.choice(local), rng.choice(remote)
+        flow = (rng.choice((PROTOCOL_TCP, PROTOCOL_UDP)), 49152 + port, rng.choice((53, 80, 443)))
+        bucket = flow_hash(ip_to_int(source), ip_to_int(dest), *flow)
+        assert bucket == flow_hash(ip_to_int(source), ip_to_int(dest), *flow)
+        
+        names = [hop.split(' (')[0] for hop in topology.trace_route(source, dest, flow)]
+        assert names == [hop.split(' (')[0] for hop in twin.trace_route(source, dest, flow)]
+        assert names == [hop.split(' (')[0] for hop in topology.trace_route(source, dest, flow)]
+        
+        route = table.lookup(ip_to_int(dest))
+        group = [entry for entry in table.entries if entry[:2] == route[:2]]
+        member = group[table.select(bucket, len(group))]
+        core = topology.get_device_by_ip(int_to_ip(member.next_hop)).name
+        assert names[names.index('a1') + 1] == core
+        chosen[core] = chosen.get(core, 0) + 1
+    
+    assert len(group) == 4
+    assert sorted(chosen) == ['c1', 'c2', 'c3', 'c4']
+    assert all(400 <= count <= 600 for count in chosen.values()), chosen
+
+
+def test_seeded_probes_leave_topology_untouched():
+    """seeded_probe e probe_many com semente não trocam o relógio nem esvaziam as filas da topologia"""
+    topology = make_topology()
+    pairs = host_pairs(topology)
+    topology.probe(*pairs[0])
+    clock, engine = topology.clock, topology.get_packet_engine()
+    state = (clock.now(), engine.epoch, engine.now, dict(engine.link_busy))
+    
+    expected = [result['samples'] for result in iter_probes(make_topology(), pairs, seed=5)]
+    assert [result['samples'] for result in iter_probes(topology, pairs, seed=5)] == expected
+    with ThreadPoolExecutor(4) as pool:
+        results = pool.map(lambda item: seeded_probe(topology, 5, item[0], *item[1]), enumerate(pairs))
+        assert [result['samples'] for result in results] == expected
+    concurrent = asyncio.run(probe_many(make_topology(), pairs, concurrency=4, seed=5))
+    assert asyncio.run(probe_many(topology, pairs, concurrency=4, seed=5)) == concurrent
+    
+    assert topology.clock is clock and topology.get_packet_engine() is engine
+    assert (clock.now(), engine.epoch, engine.now, dict(engine.link_busy)) == state
+
+
+def test_benchmark_rejects_empty_runs_and_prints_missing_rates(monkeypatch, capsys):
+    """--queries/--repeat não positivos são recusados, e ops/s ausente aparece como '-'"""
+    for option in ('--queries', '--repeat'):
+        monkeypatch.setattr(sys, 'argv', ['benchmark.py', option, '0'])
+        with pytest.raises(SystemExit):
+            benchmark.main()
+    with pytest.raises(ValueError):
+        benchmark.run_benchmarks(['padrao'], queries=0)
+    
+    row = {'size': 'padrao', 'devices': 15, 'benchmark': 'get_route', 'calls': 1,
+           'best_ns': 0.0, 'median_ns': 0.0, 'mean_ns': 0.0, 'ops_per_s': None}
+    monkeypatch.setattr(benchmark, 'run_benchmarks', lambda *args, **kwargs: {'meta': {}, 'results': [row]})
+    monkeypatch.setattr(sys, 'argv', ['benchmark.py', '--sizes', 'padrao'])
+    benchmark.main()
+    assert capsys.readouterr().out.splitlines()[-1].split()[-1] == '-'
+
+
+@pytest.mark.parametrize('keep_paths', [True, False])
+def test_path_matrix_matches_trace_route(keep_paths):
+    """hops, path e reachable de PathMatrix são os de trace_route para todos os pares de hosts"""
+    default = make_topology()
+    default.devices['h3'].active = False
+    default.devices['h5'].gateway = '192.168.3.14'
+    # h10 divide a subrede de h7/h8; a rede de h9 forma um laço entre c1 e a1
+    default.add_host('h10', '192.168.4.9', '255.255.255.224', '192.168.4.1')
+    default.add_host('h9', '192.168.9.2', '255.255.255.240', '192.168.9.1')
+    default.devices['c1'].add_route('192.168.9.0', '255.255.255.240', '192.168.21.2', 'eth0')
+    default.devices['a1'].add_route('192.168.9.0', '255.255.255.240', '192.168.21.1', 'eth2')
+    generated = generate_hierarchical(cores=2, edges=6, hosts=24, summarize=True, clock=SimulatedClock(0.0))
+    
+    for topology in (default, generated):
+        hosts = [device for device in topology.devices.values() if device.device_type == 'Host']
+        matrix = topology.compute_path_matrix(keep_paths=keep_paths)
+        unreachable = 0
+        for source in hosts:
+            for dest in hosts:
+                trace = topology.trace_route(source.get_ip(), dest.get_ip())
+                reached = len(trace) > 1 and trace[-1] == f"{dest.name} ({dest.get_ip()})"
+                unreachable += not reached
+                assert matrix.reachable(source.name, dest.name) == reached, (source.name, dest.name)
+                assert matrix.hops(source.name, dest.name) == (len(trace) - 1 if reached else None)
+                assert matrix.path(source.name, dest.name) == trace
+        assert matrix.summary()['unreachable'] == unreachable
+    assert not matrix.summary()['unreachable']
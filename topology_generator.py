@@ -0,0 +1,226 @@
+"""
+Gerador de Topologias Hierárquicas
+Constrói redes Core/Aggregation/Edge/Host com fan-out arbitrário,
+endereçamento VLSM e rotas estáticas, em tempo linear
+"""
+
+import argparse
+import ipaddress
+import time
+from typing import List, Optional, Tuple
+
+from network_simulator import Host, NetworkTopology, Router
+
+
+# Tipos de enlace por camada (mesmos da topologia padrão)
+CORE_LINK = ('Fibra Óptica', '10 Gbps')
+AGGREGATION_LINK = ('Par Trançado Cat6', '1 Gbps')
+HOST_LINK = ('Par Trançado Cat5e', '100 Mbps')
+
+
+def subnet_prefix(num_hosts: int) -> int:
+    """Menor prefixo cuja subrede comporta `num_hosts` hosts mais o gateway"""
+    prefix_len = 30
+    while prefix_len > 0 and (1 << (32 - prefix_len)) - 2 < num_hosts + 1:
+        prefix_len -= 1
+    return prefix_len
+
+
+def split_evenly(total: int, parts: int) -> List[int]:
+    """Distribui `total` itens em `parts` grupos de tamanhos quase iguais"""
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+class AddressAllocator:
+    """Aloca subredes alinhadas sequencialmente dentro de um bloco"""
+    
+    def __init__(self, block: str):
+        network = ipaddress.ip_network(block)
+        self.block = block
+        self.next = int(network.network_address)
+        self.end = int(network.broadcast_address) + 1
+    
+    def allocate(self, prefix_len: int) -> int:
+        """Retorna o endereço de rede (inteiro) da próxima subrede livre"""
+        size = 1 << (32 - prefix_len)
+        network = (self.next + size - 1) & ~(size - 1)
+        if network + size > self.end:
+            raise ValueError(f"Bloco {self.block} esgotado ao alocar uma /{prefix_len}")
+        self.next = network + size
+        return network
+
+
+def generate_hierarchical(cores: int = 1, aggregations: int = 2, edges: int = 4, hosts: int = 8,
+                          host_block: str = '10.0.0.0/8', link_block: str = '172.16.0.0/12',
+                          min_hosts_per_edge: int = 0, summarize: bool = False,
+                          ecmp: bool = False, clock=None) -> NetworkTopology:
+    """Gera uma topologia hierárquica com rotas estáticas
+    
+    Os Edge são distribuídos em blocos contíguos entre os Aggregation e os
+    hosts igualmente entre os Edge. Cada Aggregation se conecta a todos os
+    Core e usa o Core de índice (i % cores) como saída para as redes remotas
+    ou, com `ecmp`, todos os Core (um grupo de rotas de custo igual).
+    As subredes de hosts usam VLSM (a menor máscara que comporta os hosts,
+    ou `min_hosts_per_edge`, mais o gateway), alocadas em ordem de
+    Aggregation para que as redes de cada um fiquem contíguas; os enlaces
+    ponto-a-ponto usam /30 de `link_block`. Com `summarize` as tabelas
+    são sumarizadas ao final (NetworkTopology.summarize_routing_tables).
+    """
+    if min(cores, aggregations, edges) < 1 or hosts < 0:
+        raise ValueError("São necessários ao menos 1 Core, 1 Aggregation e 1 Edge")
+    
+    topology = NetworkTopology(clock, build=False)
+    host_allocator = AddressAllocator(host_block)
+    link_allocator = AddressAllocator(link_block)
+    
+    core_names = [f"c{i + 1}" for i in range(cores)]
+    agg_names = [f"a{i + 1}" for i in range(aggregations)]
+    edge_names = [f"e{i + 1}" for i in range(edges)]
+    edges_per_agg = split_evenly(edges, aggregations)
+    hosts_per_edge = split_evenly(hosts, edges)
+    
+    for name in core_names:
+        topology.add_device(Router(name, 'Core'))
+    for name in agg_names:
+        topology.add_device(Router(name, 'Aggregation'))
+    for name in edge_names:
+        topology.add_device(Router(name, 'Edge'))
+    
+    # Redes de cada Aggregation: (rede, prefixo, próximo hop a partir do Aggregation, interface)
+    agg_networks: List[List[Tuple[int, int, Optional[int], str]]] = [[] for _ in agg_names]
+    # IPs do Aggregation em cada enlace com os Core: [agg][core]
+    agg_core_ips: List[List[int]] = [[] for _ in agg_names]
+    core_links: List[Tuple[int, int, int]] = []  # (core, agg, rede /30)
+    
+    # ===== EDGE E HOSTS =====
+    edge_index = 0
+    host_number = 1
+    for agg_index, agg_name in enumerate(agg_names):
+        agg = topology.devices[agg_name]
+        my_edges = range(edge_index, edge_index + edges_per_agg[agg_index])
+        edge_index += edges_per_agg[agg_index]
+        
+        # VLSM: subredes maiores primeiro para manter o alinhamento sem lacunas
+        for port, e in enumerate(sorted(my_edges, key=lambda e: -hosts_per_edge[e])):
+            edge = topology.devices[edge_names[e]]
+            prefix_len = subnet_prefix(max(hosts_per_edge[e], min_hosts_per_edge))
+            network = host_allocator.allocate(prefix_len)
+            gateway = network + 1
+            edge.add_interface('eth0', gateway, prefix_len)
+            
+            link = link_allocator.allocate(30)
+            agg_ip, edge_ip = link + 1, link + 2
+            agg.add_interface(f"eth{port}", agg_ip, 30)
+            edge.add_interface('eth1', edge_ip, 30)
+            agg.add_connection(f"eth{port}", edge)
+            edge.add_connection('eth1', agg)
+            topology.add_link(agg_name, edge.name, *AGGREGATION_LINK)
+            
+            # Rota padrão do Edge via Aggregation
+            edge.add_route(0, 0, agg_ip, 'eth1')
+            agg_networks[agg_index].append((network, prefix_len, edge_ip, f"eth{port}"))
+            agg_networks[agg_index].append((link, 30, None, f"eth{port}"))
+            
+            for offset in range(hosts_per_edge[e]):
+                host = Host(f"h{host_number}", network + 2 + offset, prefix_len, gateway)
+                topology.add_device(host)
+                topology.add_link(edge.name, host.name, *HOST_LINK)
+                host_number += 1
+    
+    # ===== CORE <-> AGGREGATION =====
+    for agg_index, agg_name in enumerate(agg_names):
+        agg = topology.devices[agg_name]
+        first_port = len(agg.interfaces)
+        for core_index, core_name in enumerate(core_names):
+            core = topology.devices[core_name]
+            link = link_allocator.allocate(30)
+            core_ip, agg_ip = link + 1, link + 2
+            core.add_interface(f"eth{agg_index}", core_ip, 30)
+            agg.add_interface(f"eth{first_port + core_index}", agg_ip, 30)
+            core.add_connection(f"eth{agg_index}", agg)
+            agg.add_connection(f"eth{first_port + core_index}", core)
+            topology.add_link(core_name, agg_name, *CORE_LINK)
+            agg_core_ips[agg_index].append(agg_ip)
+            core_links.append((core_index, agg_index, link))
+    
+    # ===== ROTAS DOS CORE =====
+    # Cada Core alcança as redes de um Aggregation pelo enlace direto com ele
+    for core_index, core_name in enumerate(core_names):
+        core = topology.devices[core_name]
+        for agg_index, networks in enumerate(agg_networks):
+            next_hop = agg_core_ips[agg_index][core_index]
+            for network, prefix_len, _, _ in networks:
+                core.add_route(network, prefix_len, next_hop, f"eth{agg_index}")
+        for other_core, agg_index, link in core_links:
+            if other_core != core_index:
+                core.add_route(link, 30, agg_core_ips[agg_index][core_index], f"eth{agg_index}")
+    
+    # ===== ROTAS DOS AGGREGATION =====
+    for agg_index, agg_name in enumerate(agg_names):
+        agg = topology.devices[agg_name]
+        # Redes locais via Edge (os enlaces /30 já são diretamente conectados)
+        for network, prefix_len, next_hop, iface_name in agg_networks[agg_index]:
+            if next_hop is not None:
+                agg.add_route(network, prefix_len, next_hop, iface_name)
+        
+        # Redes remotas via Core de saída
+        uplink_cores = range(cores) if ecmp else [agg_index % cores]
+        uplinks = [(core_links[agg_index * cores + core_index][2] + 1,
+                    f"eth{edges_per_agg[agg_index] + core_index}") for core_index in uplink_cores]
+        for other_index, networks in enumerate(agg_networks):
+            if other_index == agg_index:
+                continue
+            for network, prefix_len, _, _ in networks:
+                for core_ip, uplink_port in uplinks:
+                    agg.add_route(network, prefix_len, core_ip, uplink_port)
+        for core_index, other_agg, link in core_links:
+            if other_agg != agg_index:
+                for core_ip, uplink_port in uplinks:
+                    agg.add_route(link, 30, core_ip, uplink_port)
+    
+    if summarize:
+        topology.summarize_routing_tables()
+    return topology
+
+
+def main():
+    """Gera uma topologia e a grava no formato de topology_loader (ou como snapshot binário)"""
+    from topology_loader import save_topology
+    from topology_snapshot import save_snapshot
+    
+    parser = argparse.ArgumentParser(description="Gerador de topologias hierárquicas")
+    parser.add_argument('--cores', type=int, default=1)
+    parser.add_argument('--aggregations', type=int, default=2)
+    parser.add_argument('--edges', type=int, default=4)
+    parser.add_argument('--hosts', type=int, default=8)
+    parser.add_argument('--min-hosts-per-edge', type=int, default=0)
+    parser.add_argument('--summarize', action='store_true',
+                        help="sumariza as tabelas de roteamento geradas")
+    parser.add_argument('--ecmp', action='store_true',
+                        help="Aggregation usam todos os Core como saída (rotas de custo igual)")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="grava um snapshot binário (carga em milissegundos) em vez do formato texto")
+    parser.add_argument('-o', '--output', required=True, help="arquivo de saída")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    topology = generate_hierarchical(args.cores, args.aggregations, args.edges, args.hosts,
+                                     min_hosts_per_edge=args.min_hosts_per_edge, ecmp=args.ecmp)
+    report = topology.summarize_routing_tables() if args.summarize else None
+    elapsed = time.perf_counter() - start
+    if args.snapshot:
+        save_snapshot(topology, args.output)
+    else:
+        save_topology(topology, args.output)
+    
+    routes = sum(len(device.routing_table) for device in topology.devices.values())
+    print(f"✓ {len(topology.devices)} dispositivos, {len(topology.links)} enlaces, "
+          f"{routes} rotas gerados em {elapsed:.2f} s → {args.output}")
+    if report is not None:
+        print(f"✓ Sumarização: {report['routes_before']} → {report['routes_after']} rotas "
+              f"({report['reduction']:.1%} a menos)")
+
+
+if __name__ == "__main__":
+    main()
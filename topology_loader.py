@@ -0,0 +1,238 @@
+"""
+Carregador de Topologias
+Lê e grava topologias em um formato texto orientado a linhas
+
+Formato (um registro por linha, campos separados por espaços, '#' comenta):
+    
+    router NOME TIPO                        # TIPO: Core, Aggregation, Edge...
+    host NOME IP/MÁSCARA GATEWAY [inactive]  # inactive: host desligado
+    iface DISPOSITIVO INTERFACE IP/MÁSCARA
+    conn DISPOSITIVO INTERFACE VIZINHO
+    link ORIGEM DESTINO CAPACIDADE TIPO...  # ex.: link c1 a1 10Gbps Fibra Óptica
+    route DISPOSITIVO REDE/MÁSCARA PRÓXIMO_HOP INTERFACE
+
+Dispositivos devem ser declarados antes de suas interfaces, conexões,
+enlaces e rotas. Gateways e próximos hops podem aparecer depois: eles são
+conferidos ao final da leitura.
+"""
+
+import re
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from addressing import int_to_ip, ip_to_int, prefix_mask
+from packet_engine import parse_capacity
+
+if TYPE_CHECKING:
+    from network_simulator import NetworkTopology
+
+
+class TopologyFormatError(ValueError):
+    """Erro de sintaxe ou de consistência em um arquivo de topologia"""
+    
+    def __init__(self, message: str, line_number: Optional[int] = None):
+        if line_number is not None:
+            message = f"linha {line_number}: {message}"
+        super().__init__(message)
+        self.line_number = line_number
+
+
+_CAPACITY_RE = re.compile(r'^(\d+(?:\.\d+)?)([A-Za-z]+)$')
+
+# Número de campos fixos por tipo de registro ('link' aceita mais: o tipo do
+# enlace; 'host' aceita o estado opcional, ver _EXTRA_FIELDS)
+_FIELDS = {
+    'router': 2,
+    'host': 3,
+    'iface': 3,
+    'conn': 3,
+    'link': 4,
+    'route': 4,
+}
+
+# Campos opcionais além dos fixos (None: qualquer quantidade)
+_EXTRA_FIELDS = {
+    'host': 1,
+    'link': None,
+}
+
+# Estado opcional de um host desligado (Host.active False)
+_INACTIVE = 'inactive'
+
+
+def _split_address(text: str, line_number: int) -> Tuple[str, str, int, int]:
+    """Separa 'IP/MÁSCARA' validando ambos; retorna (ip, máscara, ip_int, prefixo)"""
+    ip, sep, mask = text.partition('/')
+    try:
+        prefix_len = int(mask)
+        value = ip_to_int(ip)
+    except ValueError:
+        raise TopologyFormatError(f"endereço inválido: {text!r}", line_number) from None
+    if not sep or not 0 <= prefix_len <= 32:
+        raise TopologyFormatError(f"endereço inválido: {text!r}", line_number)
+    return ip, mask, value, prefix_len
+
+
+def iter_records(lines: Iterable[str]) -> Iterator[Tuple[int, str, List[str]]]:
+    """Itera sobre (número da linha, tipo, campos) sem carregar o arquivo inteiro"""
+    for line_number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        kind, *fields = line.split()
+        expected = _FIELDS.get(kind)
+        if expected is None:
+            raise TopologyFormatError(f"registro desconhecido: {kind!r}", line_number)
+        extra = _EXTRA_FIELDS.get(kind, 0)
+        if len(fields) < expected or (extra is not None and len(fields) > expected + extra):
+            raise TopologyFormatError(f"'{kind}' espera {expected} campos, obtidos {len(fields)}", line_number)
+        yield line_number, kind, fields
+
+
+def load_records(topology: 'NetworkTopology', lines: Iterable[str]) -> 'NetworkTopology':
+    """Aplica os registros de `lines` a uma topologia, validando em uma única passagem
+    
+    Os dispositivos são criados pela própria topologia (add_router,
+    add_host), então este módulo não depende das classes de network_simulator.
+    """
+    # Referências a IPs que podem ser declarados depois: ip -> linha
+    pending_ips: Dict[str, int] = {}
+    prune_at = 4096
+    
+    for line_number, kind, fields in iter_records(lines):
+        if kind == 'router':
+            name, router_type = fields
+            if name in topology.devices:
+                raise TopologyFormatError(f"dispositivo duplicado: {name}", line_number)
+            topology.add_router(name, router_type)
+        
+        elif kind == 'host':
+            name, address, gateway, *state = fields
+            if state and state[0] != _INACTIVE:
+                raise TopologyFormatError(f"estado de host inválido: {state[0]!r} (use '{_INACTIVE}')",
+                                          line_number)
+            if name in topology.devices:
+                raise TopologyFormatError(f"dispositivo duplicado: {name}", line_number)
+            ip, mask, value, prefix_len = _split_address(address, line_number)
+            if topology.get_interface_by_ip(ip):
+                raise TopologyFormatError(f"IP duplicado: {ip}", line_number)
+            try:
+                gateway_value = ip_to_int(gateway)
+            except ValueError:
+                raise TopologyFormatError(f"gateway inválido: {gateway!r}", line_number) from None
+            if gateway_value & prefix_mask(prefix_len) != value & prefix_mask(prefix_len):
+                raise TopologyFormatError(f"gateway {gateway} fora da subrede de {name}", line_number)
+            host = topology.add_host(name, ip, mask, gateway)
+            host.active = not state
+            pending_ips.setdefault(gateway, line_number)
+        
+        elif kind == 'iface':
+            name, iface_name, address = fields
+            device = _get_device(topology, name, line_number)
+            if iface_name in device.interfaces:
+                raise TopologyFormatError(f"interface duplicada: {name} {iface_name}", line_number)
+            if device.device_type == 'Host':
+                raise TopologyFormatError(f"hosts têm uma única interface ({device.INTERFACE}): {name}", line_number)
+            ip, mask, _, _ = _split_address(address, line_number)
+            if topology.get_interface_by_ip(ip):
+                raise TopologyFormatError(f"IP duplicado: {ip}", line_number)
+            device.add_interface(iface_name, ip, mask)
+        
+        elif kind == 'conn':
+            name, iface_name, peer_name = fields
+            device = _get_device(topology, name, line_number)
+            peer = _get_device(topology, peer_name, line_number)
+            if iface_name not in device.interfaces:
+                raise TopologyFormatError(f"interface inexistente: {name} {iface_name}", line_number)
+            device.add_connection(iface_name, peer)
+        
+        elif kind == 'link':
+            src, dst, capacity, *link_type = fields
+            _get_device(topology, src, line_number)
+            _get_device(topology, dst, line_number)
+            match = _CAPACITY_RE.match(capacity)
+            if not match:
+                raise TopologyFormatError(f"capacidade inválida: {capacity!r}", line_number)
+            capacity = f"{match.group(1)} {match.group(2)}"
+            try:
+                parse_capacity(capacity)
+            except ValueError as error:
+                raise TopologyFormatError(str(error), line_number) from None
+            topology.add_link(src, dst, ' '.join(link_type), capacity)
+        
+        elif kind == 'route':
+            name, network, next_hop, iface_name = fields
+            device = _get_device(topology, name, line_number)
+            if device.device_type == 'Host':
+                raise TopologyFormatError(f"hosts não possuem tabela de roteamento: {name}", line_number)
+            _, _, value, prefix_len = _split_address(network, line_number)
+            if value & ~prefix_mask(prefix_len) & 0xFFFFFFFF:
+                raise TopologyFormatError(f"rede com bits de host: {network}", line_number)
+            iface = device.interfaces.get(iface_name)
+            if iface is None:
+                raise TopologyFormatError(f"interface inexistente: {name} {iface_name}", line_number)
+            try:
+                next_hop_value = ip_to_int(next_hop)
+            except ValueError:
+                raise TopologyFormatError(f"próximo hop inválido: {next_hop!r}", line_number) from None
+            if next_hop_value & prefix_mask(iface.prefix_len) != iface.network_address:
+                raise TopologyFormatError(
+                    f"próximo hop {next_hop} fora da rede de {name} {iface_name} ({iface})", line_number)
+            device.add_route(value, prefix_len, next_hop_value, iface_name)
+            pending_ips.setdefault(next_hop, line_number)
+        
+        # Descarta referências que já foram resolvidas para manter a memória limitada
+        if len(pending_ips) > prune_at:
+            pending_ips = {ip: line for ip, line in pending_ips.items()
+                           if not topology.get_interface_by_ip(ip)}
+            prune_at = max(4096, 2 * len(pending_ips))
+    
+    for ip, line_number in pending_ips.items():
+        if not topology.get_interface_by_ip(ip):
+            raise TopologyFormatError(f"nenhum dispositivo possui o IP {ip}", line_number)
+    
+    return topology
+
+
+def _get_device(topology: 'NetworkTopology', name: str, line_number: int):
+    device = topology.devices.get(name)
+    if device is None:
+        raise TopologyFormatError(f"dispositivo não declarado: {name}", line_number)
+    return device
+
+
+def load_topology(path: str, clock=None) -> 'NetworkTopology':
+    """Carrega uma topologia de um arquivo, lendo-o linha a linha"""
+    from network_simulator import NetworkTopology
+    topology = NetworkTopology(clock, build=False)
+    with open(path, encoding='utf-8') as f:
+        return load_records(topology, f)
+
+
+def iter_topology_lines(topology: 'NetworkTopology') -> Iterator[str]:
+    """Gera as linhas que descrevem a topologia no formato do carregador"""
+    routers = [device for device in topology.devices.values() if device.device_type != 'Host']
+    hosts = [device for device in topology.devices.values() if device.device_type == 'Host']
+    
+    for device in routers:
+        yield f"router {device.name} {getattr(device, 'router_type', device.device_type)}"
+        for iface_name, iface in device.interfaces.items():
+            yield f"iface {device.name} {iface_name} {iface}"
+    for device in hosts:
+        state = '' if device.active else f" {_INACTIVE}"
+        yield f"host {device.name} {device.interface} {device.gateway}{state}"
+    for device in topology.devices.values():
+        for iface_name, peer in device.connections.items():
+            yield f"conn {device.name} {iface_name} {peer.name}"
+    for src, dst, link_type, capacity in topology.links:
+        yield f"link {src} {dst} {capacity.replace(' ', '')} {link_type}"
+    for device in routers:
+        for route in device.routing_table:
+            yield (f"route {device.name} {int_to_ip(route.destination)}/{route.prefix_len} "
+                   f"{int_to_ip(route.next_hop)} {route.interface}")
+
+
+def save_topology(topology: 'NetworkTopology', path: str):
+    """Grava a topologia em um arquivo no formato do carregador"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in iter_topology_lines(topology):
+            f.write(line + '\n')
@@ -0,0 +1,530 @@
+"""
+Snapshots Binários de Topologias
+Grava uma topologia já construída em um arquivo binário compacto e a
+carrega de volta por mapeamento em memória, sem refazer a construção
+
+O arquivo é um cabeçalho seguido de seções de inteiros de 32 bits
+(little-endian, alinhadas em 8 bytes):
+    
+    strings   nomes separados por '\\0' (os primeiros são os dispositivos)
+    meta      JSON com versão, contagens, tamanho do cache e perdas
+    devices   12 inteiros por dispositivo (tipo, interfaces, conexões, rotas)
+    ifaces    nome, endereço e prefixo de cada interface
+    conns     nome da interface e índice do vizinho de cada conexão
+    routes    arrays das RouteTable, concatenados
+    rtifaces  nomes de interface usados por cada tabela de rotas
+    ipindex   IPs ordenados do índice da topologia
+    ipowner   dispositivo e interface dono de cada IP
+    links     origem, destino, tipo e capacidade de cada enlace
+
+Na carga, dispositivos, conexões e o índice de IPs são materializados sob
+demanda; a tabela de encaminhamento de cada roteador é compilada na
+primeira busca, como em uma topologia construída normalmente.
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+import time
+from abc import ABCMeta, abstractmethod
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from network_simulator import Host, NetworkDevice, NetworkInterface, NetworkTopology, RouteTable, Router
+
+
+MAGIC = b'NTSNAP\x00\x01'
+
+_HEADER = struct.Struct('<8sI')
+_SECTION = struct.Struct('<8sQQ')
+_SECTIONS = ('strings', 'meta', 'devices', 'ifaces', 'conns', 'routes', 'rtifaces',
+             'ipindex', 'ipowner', 'links')
+
+# Inteiros por registro de dispositivo: tipo (0 roteador, 1 host), tipo do
+# roteador, gateway, ativo e (início, quantidade) de interfaces, conexões,
+# rotas e nomes de interface das rotas
+_DEVICE_FIELDS = 12
+
+_MISSING = object()
+
+
+def _ints(values: Iterable[int] = ()) -> array:
+    return array('I', values)
+
+
+class SnapshotFormatError(ValueError):
+    """Arquivo que não é um snapshot válido (ou de outra versão)"""
+
+
+def is_snapshot(path: str) -> bool:
+    """Indica se o arquivo começa com a assinatura de snapshot"""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_snapshot(topology: NetworkTopology, path: str):
+    """Grava a topologia (dispositivos, interfaces, conexões, rotas, índice de IPs e enlaces)
+    
+    As probabilidades de perda (set_link_loss, set_device_loss) vão no
+    JSON de meta. Estado dinâmico (caches, motor de pacotes,
+    instrumentação, gerador de números aleatórios e o roteamento por
+    estado de enlace) não é gravado; as rotas instaladas pelo SPF são
+    gravadas como rotas comuns.
+    """
+    devices = list(topology.devices.values())
+    strings = [device.name for device in devices]
+    ids = {name: i for i, name in enumerate(strings)}
+    
+    def intern(text: str) -> int:
+        string_id = ids.get(text)
+        if string_id is None:
+            string_id = ids[text] = len(strings)
+            strings.append(text)
+        return string_id
+    
+    records, ifaces, conns, routes, route_ifaces = _ints(), _ints(), _ints(), _ints(), _ints()
+    for device in devices:
+        if isinstance(device, Host):
+            head = (1, 0, device.gateway_address, int(device.active))
+        elif isinstance(device, Router):
+            head = (0, intern(device.router_type), 0, 0)
+        else:
+            raise TypeError(f"Dispositivo sem representação no snapshot: {device}")
+        
+        iface_start = len(ifaces) // 3
+        for iface_name, iface in device.interfaces.items():
+            ifaces.extend((intern(iface_name), iface.address, iface.prefix_len))
+        conn_start = len(conns) // 2
+        for iface_name, peer in device.connections.items():
+            conns.extend((intern(iface_name), ids[peer.name]))
+        data, names = device.routing_table.as_array()
+        route_start = len(routes) // 4
+        routes.extend(data)
+        names_start = len(route_ifaces)
+        route_ifaces.extend(intern(name) for name in names)
+        
+        records.extend(head)
+        records.extend((iface_start, len(device.interfaces), conn_start, len(device.connections),
+                        route_start, len(data) // 4, names_start, len(names)))
+    
+    ips, owners = _ints(), _ints()
+    for ip, (device, iface_name) in sorted(topology.ip_index.items()):
+        ips.append(ip)
+        owners.extend((ids[device.name], intern(iface_name)))
+    
+    links = _ints()
+    for link in topology.links:
+        links.extend(intern(field) for field in link)
+    
+    meta = {
+        'version': 1,
+        'devices': len(devices),
+        'cache_size': topology.route_cache.maxsize if topology.route_cache is not None else 0,
+        'link_loss': [[src, dst, probability] for (src, dst), probability in topology.link_loss.items()],
+        'device_loss': topology.device_loss
+    }
+    sections = {
+        'strings': '\0'.join(strings).encode('utf-8'),
+        'meta': json.dumps(meta).encode('utf-8'),
+        'devices': records, 'ifaces': ifaces, 'conns': conns, 'routes': routes,
+        'rtifaces': route_ifaces, 'ipindex': ips, 'ipowner': owners, 'links': links
+    }
+    
+    blobs = []
+    for name in _SECTIONS:
+        data = sections[name]
+        if isinstance(data, array):
+            if sys.byteorder == 'big':
+                data = array('I', data)
+                data.byteswap()
+            data = data.tobytes()
+        blobs.append((name, data))
+    
+    offset = _HEADER.size + _SECTION.size * len(blobs)
+    table = []
+    for name, data in blobs:
+        offset += -offset % 8
+        table.append(_SECTION.pack(name.encode('ascii'), offset, len(data)))
+        offset += len(data)
+    
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(blobs)))
+        f.write(b''.join(table))
+        position = _HEADER.size + _SECTION.size * len(blobs)
+        for name, data in blobs:
+            padding = -position % 8
+            f.write(b'\0' * padding)
+            f.write(data)
+            position += padding + len(data)
+
+
+class _SnapshotReader:
+    """Acesso às seções de um snapshot mapeado em memória (ou lido por inteiro)"""
+    
+    def __init__(self, path: str, use_mmap: bool = True):
+        with open(path, 'rb') as f:
+            if use_mmap:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._buffer = f.read()
+        view = memoryview(self._buffer)
+        if len(view) < _HEADER.size:
+            raise SnapshotFormatError(f"{path}: arquivo truncado")
+        magic, count = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise SnapshotFormatError(f"{path}: não é um snapshot de topologia (versão 1)")
+        
+        self._sections: Dict[str, memoryview] = {}
+        for i in range(count):
+            name, offset, length = _SECTION.unpack_from(view, _HEADER.size + i * _SECTION.size)
+            name = name.rstrip(b'\0').decode('ascii')
+            if offset + length > len(view):
+                raise SnapshotFormatError(f"{path}: seção {name} truncada")
+            self._sections[name] = view[offset:offset + length]
+        missing = [name for name in _SECTIONS if name not in self._sections]
+        if missing:
+            raise SnapshotFormatError(f"{path}: seções ausentes: {', '.join(missing)}")
+        
+        self.strings = bytes(self._sections['strings']).decode('utf-8').split('\0')
+        self.meta = json.loads(bytes(self._sections['meta']).decode('utf-8'))
+        self.devices = self.ints('devices')
+        self.ifaces = self.ints('ifaces')
+        self.conns = self.ints('conns')
+        self.routes = self.ints('routes')
+        self.route_ifaces = self.ints('rtifaces')
+        self.ips = self.ints('ipindex')
+        self.owners = self.ints('ipowner')
+        self.device_count = self.meta['devices']
+    
+    def ints(self, name: str):
+        """Seção como sequência de inteiros de 32 bits (sem cópia em máquinas little-endian)"""
+        section = self._sections[name]
+        if sys.byteorder == 'little':
+            return section.cast('I')
+        data = array('I', bytes(section))
+        data.byteswap()
+        return data
+    
+    def links(self) -> List[Tuple[str, str, str, str]]:
+        fields = map(self.strings.__getitem__, self.ints('links').tolist())
+        return list(zip(fields, fields, fields, fields))
+    
+    def device(self, index: int, topology: NetworkTopology) -> NetworkDevice:
+        """Cria o dispositivo `index` ligado à topologia (conexões resolvidas sob demanda)"""
+        start = index * _DEVICE_FIELDS
+        (kind, type_id, gateway, active, iface_start, iface_count, conn_start, conn_count,
+         route_start, route_count, names_start, names_count) = self.devices[start:start + _DEVICE_FIELDS].tolist()
+        strings = self.strings
+        
+        values = self.ifaces[3 * iface_start:3 * (iface_start + iface_count)].tolist()
+        interfaces = {strings[values[i]]: NetworkInterface(values[i + 1], values[i + 2])
+                      for i in range(0, len(values), 3)}
+        if kind == 1:
+            first = next(iter(interfaces.values()))
+            device = Host(self.strings[index], first.address, first.prefix_len, gateway)
+            device.active = bool(active)
+        else:
+            device = Router(self.strings[index], strings[type_id])
+        device.interfaces = interfaces
+        
+        if route_count:
+            chunk = self.routes[4 * route_start:4 * (route_start + route_count)]
+            data = array('I')
+            data.frombytes(chunk.cast('B') if isinstance(chunk, memoryview) else chunk.tobytes())
+            names = [strings[value] for value in self.route_ifaces[names_start:names_start + names_count]]
+            device.routing_table = RouteTable.from_array(data, names)
+        
+        values = self.conns[2 * conn_start:2 * (conn_start + conn_count)].tolist()
+        device.connections = _LazyConnections(topology.devices, {
+            strings[values[i]]: strings[values[i + 1]] for i in range(0, len(values), 2)})
+        device.topology = topology
+        return device
+
+
+class _LazyDict(dict, metaclass=ABCMeta):
+    """Dicionário preenchido sob demanda a partir de um snapshot
+    
+    Cada entrada é criada no primeiro acesso por chave; iterar, copiar ou
+    serializar materializa todas (na ordem do snapshot, seguidas das
+    chaves acrescentadas depois) e, a partir daí, ele se comporta como um
+    dict comum. Subclasses definem os acessos _snapshot_* ao snapshot.
+    
+    O estado fica em um único conjunto, _consumed: as chaves do snapshot
+    já materializadas, sobrescritas ou removidas. Uma chave do snapshot
+    fora dele ainda está pendente, então o tamanho é o do dict mais as
+    pendentes, em tempo constante.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._complete = False
+        self._consumed = set()
+    
+    @abstractmethod
+    def _snapshot_keys(self) -> Iterable:
+        """Chaves do snapshot, na ordem gravada"""
+    
+    @abstractmethod
+    def _snapshot_has(self, key) -> bool:
+        """Indica se a chave existe no snapshot"""
+    
+    @abstractmethod
+    def _snapshot_get(self, key):
+        """Cria o valor de uma chave do snapshot"""
+    
+    @abstractmethod
+    def _snapshot_len(self) -> int:
+        """Número de chaves do snapshot"""
+    
+    def _pending(self, key) -> bool:
+        """A chave existe no snapshot e ainda não foi materializada, sobrescrita nem removida"""
+        return not self._complete and key not in self._consumed and self._snapshot_has(key)
+    
+    def _consume(self, key):
+        if self._pending(key):
+            self._consumed.add(key)
+    
+    def __missing__(self, key):
+        if not self._pending(key):
+            raise KeyError(key)
+        value = self._snapshot_get(key)
+        self._consumed.add(key)
+        dict.__setitem__(self, key, value)
+        return value
+    
+    def __setitem__(self, key, value):
+        self._consume(key)
+        dict.__setitem__(self, key, value)
+    
+    def materialize(self):
+        """Cria todas as entradas ainda não acessadas"""
+        if self._complete:
+            return
+        loaded = dict(dict.items(self))
+        dict.clear(self)
+        for key in self._snapshot_keys():
+            value = loaded.pop(key, _MISSING)
+            if value is not _MISSING:
+                dict.__setitem__(self, key, value)
+            elif key not in self._consumed:
+                dict.__setitem__(self, key, self._snapshot_get(key))
+        dict.update(self, loaded)
+        self._complete = True
+        self._consumed = set()
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or self._pending(key)
+    
+    def __len__(self) -> int:
+        if self._complete:
+            return dict.__len__(self)
+        return dict.__len__(self) + self._snapshot_len() - len(self._consumed)
+    
+    def __bool__(self) -> bool:
+        return len(self) > 0
+    
+    def __delitem__(self, key):
+        if self._pending(key):
+            self._consumed.add(key)
+            return
+        dict.__delitem__(self, key)
+    
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+    
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+    
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+    
+    def popitem(self):
+        self.materialize()
+        return dict.popitem(self)
+    
+    def clear(self):
+        dict.clear(self)
+        self._complete = True
+        self._consumed = set()
+    
+    def __iter__(self) -> Iterator:
+        self.materialize()
+        return dict.__iter__(self)
+    
+    def keys(self):
+        self.materialize()
+        return dict.keys(self)
+    
+    def values(self):
+        self.materialize()
+        return dict.values(self)
+    
+    def items(self):
+        self.materialize()
+        return dict.items(self)
+    
+    def copy(self) -> dict:
+        self.materialize()
+        return dict(dict.items(self))
+    
+    def __eq__(self, other) -> bool:
+        self.materialize()
+        return dict.__eq__(self, other)
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        self.materialize()
+        return dict.__repr__(self)
+    
+    def __reduce__(self):
+        # Serializado (pickle/snapshot) como um dict comum, sem o arquivo mapeado
+        return dict, (self.copy(),)
+
+
+class _LazyDevices(_LazyDict):
+    """topology.devices de um snapshot: nome -> dispositivo"""
+    
+    def __init__(self, reader: _SnapshotReader, topology: NetworkTopology):
+        super().__init__()
+        self._reader = reader
+        self._topology = topology
+        self._names = reader.strings[:reader.device_count]
+        self._index = dict(zip(self._names, range(len(self._names))))
+    
+    def _snapshot_keys(self) -> Iterable[str]:
+        return self._names
+    
+    def _snapshot_has(self, key) -> bool:
+        return key in self._index
+    
+    def _snapshot_get(self, key) -> NetworkDevice:
+        return self._reader.device(self._index[key], self._topology)
+    
+    def _snapshot_len(self) -> int:
+        return len(self._names)
+
+
+class _LazyIPIndex(_LazyDict):
+    """topology._ip_index de um snapshot: IP -> (dispositivo, interface), por busca binária"""
+    
+    def __init__(self, reader: _SnapshotReader, devices: _LazyDevices):
+        super().__init__()
+        self._reader = reader
+        self._devices = devices
+    
+    def _position(self, key) -> int:
+        ips = self._reader.ips
+        if not isinstance(key, int):
+            return -1
+        i = bisect_left(ips, key)
+        return i if i < len(ips) and ips[i] == key else -1
+    
+    def _snapshot_keys(self) -> Iterable[int]:
+        return self._reader.ips.tolist()
+    
+    def _snapshot_has(self, key) -> bool:
+        return self._position(key) >= 0
+    
+    def _snapshot_get(self, key) -> Tuple[NetworkDevice, str]:
+        i = self._position(key)
+        reader = self._reader
+        return self._devices[reader.strings[reader.owners[2 * i]]], reader.strings[reader.owners[2 * i + 1]]
+    
+    def _snapshot_len(self) -> int:
+        return len(self._reader.ips)
+
+
+class _LazyConnections(_LazyDict):
+    """Conexões de um dispositivo do snapshot; os vizinhos são criados no acesso"""
+    
+    def __init__(self, devices: _LazyDevices, peers: Dict[str, str]):
+        super().__init__()
+        self._devices = devices
+        self._peers = peers
+    
+    def _snapshot_keys(self) -> Iterable[str]:
+        return self._peers
+    
+    def _snapshot_has(self, key) -> bool:
+        return key in self._peers
+    
+    def _snapshot_get(self, key) -> NetworkDevice:
+        return self._devices[self._peers[key]]
+    
+    def _snapshot_len(self) -> int:
+        return len(self._peers)
+
+
+def load_snapshot(path: str, clock=None, lazy: bool = True) -> NetworkTopology:
+    """Carrega uma topologia gravada por save_snapshot
+    
+    Com `lazy` (padrão) o arquivo é mapeado em memória e os dispositivos
+    só são criados quando acessados, então a carga leva milissegundos
+    mesmo com centenas de milhares de dispositivos. Com lazy=False tudo é
+    criado na carga e a topologia usa dicionários comuns, sem o arquivo.
+    """
+    reader = _SnapshotReader(path, use_mmap=lazy)
+    topology = NetworkTopology(clock, reader.meta.get('cache_size', 65536), build=False)
+    topology.devices = _LazyDevices(reader, topology)
+    topology._ip_index = _LazyIPIndex(reader, topology.devices)
+    topology.links = reader.links()
+    topology.link_loss = {(src, dst): probability for src, dst, probability in reader.meta.get('link_loss', ())}
+    topology.device_loss = dict(reader.meta.get('device_loss', {}))
+    
+    if not lazy:
+        topology.devices = topology.devices.copy()
+        topology._ip_index = topology._ip_index.copy()
+        for device in topology.devices.values():
+            device.connections = device.connections.copy()
+    return topology
+
+
+def open_topology(path: str, clock=None) -> NetworkTopology:
+    """Carrega um snapshot binário ou um arquivo no formato texto de topology_loader"""
+    if is_snapshot(path):
+        return load_snapshot(path, clock)
+    from topology_loader import load_topology
+    return load_topology(path, clock)
+
+
+def main():
+    """Converte uma topologia (texto ou padrão do projeto) em snapshot binário"""
+    parser = argparse.ArgumentParser(description="Gravação de snapshots binários de topologias")
+    parser.add_argument('source', nargs='?', help="arquivo de topologia (padrão: topologia do projeto)")
+    parser.add_argument('-o', '--output', required=True, help="arquivo do snapshot")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    topology = open_topology(args.source) if args.source else NetworkTopology()
+    loaded = time.perf_counter()
+    save_snapshot(topology, args.output)
+    saved = time.perf_counter()
+    load_snapshot(args.output)
+    reloaded = time.perf_counter()
+    
+    print(f"Dispositivos: {len(topology.devices)} | Carga da origem: {loaded - start:.3f} s | "
+          f"Gravação: {saved - loaded:.3f} s | Carga do snapshot: {(reloaded - saved) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,607 @@
+"""
+Matriz de Tráfego
+Distribui demandas entre hosts pelos caminhos de trace_route e aponta
+a utilização e os gargalos de cada enlace
+"""
+
+import argparse
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+from network_simulator import ECMP_BUCKETS, PROTOCOL_TCP, Host, NetworkDevice, NetworkTopology, flow_hash
+from packet_engine import parse_capacity
+
+
+class TrafficMatrix:
+    """Carga oferecida por enlace para uma matriz de demandas entre hosts
+    
+    Cada demanda (origem, destino, taxa em bits/s) segue o caminho de
+    trace_route. As demandas são agregadas por destino, e as origens de
+    um destino compartilham uma árvore de encaminhamento (IP de entrada ->
+    próximo IP): cada roteador é consultado uma vez por destino e a carga
+    é propagada pela árvore em vez de somada hop a hop por fluxo.
+    Demandas cujo caminho não termina no destino, ou com origem ou
+    destino inativos, são contadas como não roteáveis.
+    
+    Cada demanda é um fluxo TCP próprio (porta de origem efêmera dada pela
+    sua ordem): em grupos ECMP os fluxos se espalham pelos caminhos de
+    custo igual conforme o hash da 5-tupla, como em trace_route com `flow`.
+    """
+    
+    FLOW_PROTOCOL = PROTOCOL_TCP
+    FLOW_DEST_PORT = 80
+    
+    def __init__(self, topology: NetworkTopology, demands: Iterable[Tuple]):
+        self.topology = topology
+        # Carga oferecida por direção de enlace: (origem, destino) -> bits/s
+        self.link_load: Dict[Tuple[str, str], float] = {}
+        self.demands = 0
+        self.unroutable = 0
+        self.offered_bps = 0.0
+        self.unroutable_bps = 0.0
+        
+        self.capacities: Dict[Tuple[str, str], float] = topology.link_table.capacities()
+        
+        self._route(demands)
+    
+    def _resolve_host(self, key: str) -> Optional[Host]:
+        """Encontra um host pelo nome ou pelo IP"""
+        device = self.topology.devices.get(key)
+        if device is None:
+            device = self.topology.get_device_by_ip(key)
+        return device if device is not None and device.device_type == 'Host' else None
+    
+    def _route(self, demands: Iterable[Tuple]):
+        """Resolve os hosts das demandas e distribui a carga nos enlaces"""
+        endpoints: List[Host] = []
+        endpoint_ids: Dict[Host, int] = {}
+        # Nome ou IP -> índice em endpoints (-1: não é um host ativo)
+        resolved: Dict[str, int] = {}
+        sources, dests, rates = array('i'), array('i'), array('d')
+        # Ordem de cada demanda roteável (define a porta de origem do fluxo)
+        flow_ids = array('i')
+        
+        def endpoint(key: str) -> int:
+            host = self._resolve_host(key)
+            if host is None or not host.active:
+                return -1
+            if host not in endpoint_ids:
+                endpoint_ids[host] = len(endpoints)
+                endpoints.append(host)
+            return endpoint_ids[host]
+        
+        # Laço por demanda: apenas buscas em dicionário e appends
+        add_source, add_dest, add_rate, add_flow = sources.append, dests.append, rates.append, flow_ids.append
+        count, offered = 0, 0.0
+        for source, dest, rate in demands:
+            if isinstance(rate, str):
+                rate = parse_capacity(rate)
+            count += 1
+            offered += rate
+            
+            source_id = resolved.get(source)
+            if source_id is None:
+                source_id = resolved[source] = endpoint(source)
+            dest_id = resolved.get(dest)
+            if dest_id is None:
+                dest_id = resolved[dest] = endpoint(dest)
+            if source_id < 0 or dest_id < 0:
+                self.unroutable += 1
+                self.unroutable_bps += rate
+                continue
+            add_source(source_id)
+            add_dest(dest_id)
+            add_rate(rate)
+            add_flow(count - 1)
+        self.demands += count
+        self.offered_bps += offered
+        
+        if NUMPY_AVAILABLE and self.topology.ip_index:
+            self._route_vectorized(endpoints, sources, dests, rates, flow_ids)
+        else:
+            self._route_trees(endpoints, sources, dests, rates, flow_ids)
+    
+    def _flow_hashes(self, source_ips, dest_ips, flow_ids):
+        """Hash de fluxo (ver flow_hash) de demandas pela sua ordem; aceita arrays uint64"""
+        return flow_hash(source_ips, dest_ips, self.FLOW_PROTOCOL, flow_ids % 16384 + 49152, self.FLOW_DEST_PORT)
+    
+    def _route_trees(self, endpoints: List[Host], sources: array, dests: array, rates: array,
+                     flow_ids: array):
+        """Roteamento em Python puro: uma árvore por destino (ou subrede) e balde ECMP"""
+        ecmp = any(device.get_forwarding_table().ecmp for device in self.topology.devices.values()
+                   if device.device_type != 'Host')
+        
+        # balde -> destino -> {origem: [taxa total, número de demandas]}
+        by_bucket: Dict[Optional[int], Dict[Host, Dict[Host, List]]] = {}
+        for source_id, dest_id, rate, flow in zip(sources, dests, rates, flow_ids):
+            source_host, dest_host = endpoints[source_id], endpoints[dest_id]
+            bucket = None
+            if ecmp:
+                bucket = self._flow_hashes(source_host.interface.address,
+                                           dest_host.interface.address, flow)
+            per_source = by_bucket.setdefault(bucket, {}).setdefault(dest_host, {})
+            totals = per_source.get(source_host)
+            if totals is None:
+                per_source[source_host] = [rate, 1]
+            else:
+                totals[0] += rate
+                totals[1] += 1
+        
+        for bucket, by_dest in by_bucket.items():
+            # Destinos na mesma subrede compartilham a árvore (como em PathMatrix)
+            subnets: Dict[Tuple[int, int], List[Host]] = {}
+            for dest_host in by_dest:
+                iface = dest_host.interface
+                subnets.setdefault((iface.network_address, iface.prefix_len), []).append(dest_host)
+            splittable = self.topology.subnets_with_specifics(set(subnets))
+            
+            for key, members in subnets.items():
+                if len(members) == 1 or key in splittable or not self._route_group(members, by_dest, bucket):
+                    for dest_host in members:
+                        self._route_to([dest_host], by_dest, bucket=bucket)
+    
+    def _route_vectorized(self, endpoints: List[Host], sources: array, dests: array, rates: array,
+                          flow_ids: array):
+        """Roteamento com NumPy sobre os pares (gateway de origem, subrede de destino)
+        
+        Os pares distintos avançam juntos, um hop por iteração; em cada
+        iteração os pares são agrupados pelo roteador atual e resolvidos com
+        um único lookup_many por roteador. As cargas são somadas por
+        bincount em vez de fluxo a fluxo. Pares que passam por um grupo
+        ECMP são refeitos separando os fluxos pelo hash.
+        """
+        topology = self.topology
+        index = topology.ip_index
+        devices = list(topology.devices.values())
+        device_ids = {device: i for i, device in enumerate(devices)}
+        
+        # IP -> dispositivo dono, por busca binária
+        ips = np.array(sorted(index), dtype=np.int64)
+        owners = np.array([device_ids[index[ip][0]] for ip in ips.tolist()], dtype=np.int64)
+        # Último elemento: posição -1 (IP sem dono)
+        is_router = np.array([device.device_type != 'Host' for device in devices] + [False])
+        
+        def owner_of(values):
+            pos = np.minimum(np.searchsorted(ips, values), len(ips) - 1)
+            return np.where(ips[pos] == values, owners[pos], -1)
+        
+        next_hops: Dict[int, np.ndarray] = {}
+        
+        def route_next_hops(device_id: int) -> np.ndarray:
+            """Próximo hop por índice de entries (-1: conectada, -2: sem rota)"""
+            table = next_hops.get(device_id)
+            if table is None:
+                entries = devices[device_id].get_forwarding_table().entries
+                table = next_hops[device_id] = np.array(
+                    [-1 if route.next_hop is None else route.next_hop for route in entries] + [-2],
+                    dtype=np.int64)
+            return table
+        
+        source = np.array(sources, dtype=np.int64)
+        dest = np.array(dests, dtype=np.int64)
+        rate = np.array(rates, dtype=np.float64)
+        endpoint_device = np.array([device_ids[host] for host in endpoints], dtype=np.int64)
+        endpoint_ip = np.array([host.interface.address for host in endpoints], dtype=np.int64)
+        endpoint_gateway = np.array([host.gateway_address for host in endpoints], dtype=np.int64)
+        buckets = None
+        
+        # Destinos na mesma subrede (sem prefixos mais específicos) formam um grupo
+        subnets: Dict[Tuple[int, int], List[int]] = {}
+        for dest_id in np.unique(dest).tolist():
+            iface = endpoints[dest_id].interface
+            subnets.setdefault((iface.network_address, iface.prefix_len), []).append(dest_id)
+        splittable = topology.subnets_with_specifics(set(subnets))
+        group_of = np.zeros(len(endpoints), dtype=np.int64)
+        targets, multi = [], []
+        for key, members in subnets.items():
+            groups = [members] if key not in splittable else [[member] for member in members]
+            for group in groups:
+                group_of[group] = len(targets)
+                targets.append(endpoints[group[0]].interface.address)
+                multi.append(len(group) > 1)
+        
+        links_from, links_to, links_load = [], [], []
+        
+        def chase(start: np.ndarray, target: np.ndarray, hashes: Optional[np.ndarray]):
+            """Segue os pares até o destino; retorna alcançado, roteador final, entrada, passos,
+            se o caminho passou por algum host e, sem `hashes`, se passou por um grupo ECMP"""
+            count = len(start)
+            current = start.copy()
+            reached = np.zeros(count, dtype=bool)
+            terminal = np.full(count, -1, dtype=np.int64)
+            via_host = np.zeros(count, dtype=bool)
+            via_ecmp = np.zeros(count, dtype=bool)
+            step_pairs, step_from, step_to = [], [], []
+            # Detecção de laços (algoritmo de Brent) sobre o dispositivo atual
+            saved = np.full(count, -1, dtype=np.int64)
+            power = np.ones(count, dtype=np.int64)
+            distance = np.zeros(count, dtype=np.int64)
+            
+            active = np.arange(count)
+            while active.size:
+                ip = current[active]
+                owner = owner_of(ip)
+                arrived = ip == target[active]
+                reached[active[arrived]] = owner[arrived] >= 0
+                active, owner = active[~arrived], owner[~arrived]
+                
+                routable = is_router[owner]
+                via_host[active[(owner >= 0) & ~routable]] = True
+                active, owner = active[routable], owner[routable]
+                
+                looped = owner == saved[active]
+                active, owner = active[~looped], owner[~looped]
+                distance[active] += 1
+                restart = active[distance[active] == power[active]]
+                saved[restart] = owner[distance[active] == power[active]]
+                power[restart] *= 2
+                distance[restart] = 0
+                
+                next_ip = np.empty(len(active), dtype=np.int64)
+                order = np.argsort(owner)
+                routers, first = np.unique(owner[order], return_index=True)
+                bounds = list(first[1:]) + [len(order)]
+                for device_id, begin, end in zip(routers.tolist(), first.tolist(), bounds):
+                    positions = order[begin:end]
+                    table = devices[device_id].get_forwarding_table()
+                    pairs = active[positions]
+                    chosen = table.lookup_many(target[pairs], None if hashes is None else hashes[pairs])
+                    next_ip[positions] = route_next_hops(device_id)[chosen]
+                    if hashes is None and table.ecmp:
+                        widths = np.frombuffer(table.widths, dtype=np.int32)
+                        via_ecmp[pairs[(chosen >= 0) & (widths[chosen] > 1)]] = True
+                
+                connected = next_ip == -1
+                reached[active[connected]] = True
+                terminal[active[connected]] = owner[connected]
+                moving = next_ip >= 0
+                active, owner, next_ip = active[moving], owner[moving], next_ip[moving]
+                step_pairs.append(active)
+                step_from.append(owner)
+                step_to.append(owner_of(next_ip))
+                current[active] = next_ip
+            
+            steps = (np.concatenate(step_pairs) if step_pairs else np.zeros(0, dtype=np.int64),
+                     np.concatenate(step_from) if step_from else np.zeros(0, dtype=np.int64),
+                     np.concatenate(step_to) if step_to else np.zeros(0, dtype=np.int64))
+            return reached, terminal, owner_of(start), steps, via_host, via_ecmp
+        
+        def route_flows(flows: np.ndarray, group: np.ndarray, target: np.ndarray, multi: np.ndarray,
+                        hashed: bool) -> Tuple[np.ndarray, np.ndarray]:
+            """Roteia os fluxos selecionados; retorna os fluxos a refazer com um grupo por
+            destino e os fluxos a refazer por hash (pares que passaram por um grupo ECMP)"""
+            keys = endpoint_gateway[source[flows]] * len(target) + group
+            if hashed:
+                keys = keys * ECMP_BUCKETS + buckets[flows]
+            pair_keys, pair_of = np.unique(keys, return_inverse=True)
+            pair_of = pair_of.ravel()
+            pair_hash = pair_keys % ECMP_BUCKETS if hashed else None
+            pair_route = pair_keys // ECMP_BUCKETS if hashed else pair_keys
+            pair_group = pair_route % len(target)
+            reached, terminal, entry, (step_pairs, step_from, step_to), via_host, via_ecmp = chase(
+                pair_route // len(target), target[pair_group], pair_hash)
+            
+            bad = np.zeros(len(target), dtype=bool)
+            bad[pair_group[via_host & multi[pair_group]]] = True
+            retry = bad[group]
+            split = ~retry & via_ecmp[pair_of]
+            keep = ~retry & ~split
+            retry_flows, split_flows = flows[retry], flows[split]
+            flows, pair_of = flows[keep], pair_of[keep]
+            flow_rate = rate[flows]
+            pair_load = np.bincount(pair_of, weights=flow_rate, minlength=len(pair_keys))
+            
+            ok = reached[pair_of]
+            self.unroutable += int(np.count_nonzero(~ok))
+            self.unroutable_bps += float(flow_rate[~ok].sum())
+            # Host de origem -> gateway
+            links_from.append(endpoint_device[source[flows[ok]]])
+            links_to.append(entry[pair_of[ok]])
+            links_load.append(flow_rate[ok])
+            # Roteadores ao longo do caminho
+            counted = reached[step_pairs] & ~bad[pair_group[step_pairs]] & ~via_ecmp[step_pairs]
+            links_from.append(step_from[counted])
+            links_to.append(step_to[counted])
+            links_load.append(pair_load[step_pairs[counted]])
+            # Roteador de saída -> host de destino
+            last = ok & (terminal[pair_of] >= 0)
+            links_from.append(terminal[pair_of[last]])
+            links_to.append(endpoint_device[dest[flows[last]]])
+            links_load.append(flow_rate[last])
+            return retry_flows, split_flows
+        
+        subnet_target = np.array(targets, dtype=np.int64)
+        subnet_multi = np.array(multi, dtype=bool)
+        pending = [(np.arange(len(source)), False, False)]
+        while pending:
+            selected, per_host, hashed = pending.pop()
+            if hashed and buckets is None:
+                buckets = self._flow_hashes(endpoint_ip[source].astype(np.uint64),
+                                            endpoint_ip[dest].astype(np.uint64),
+                                            np.array(flow_ids, dtype=np.uint64)).astype(np.int64)
+            if per_host:
+                # Subredes em que um host aparece no caminho: cada destino com seu próprio grupo
+                retry, split = route_flows(selected, dest[selected], endpoint_ip,
+                                           np.zeros(len(endpoints), dtype=bool), hashed)
+            else:
+                retry, split = route_flows(selected, group_of[dest[selected]], subnet_target,
+                                           subnet_multi, hashed)
+            if retry.size:
+                pending.append((retry, True, hashed))
+            if split.size:
+                pending.append((split, per_host, True))
+        
+        keys = np.concatenate(links_from) * len(devices) + np.concatenate(links_to)
+        link_keys, link_of = np.unique(keys, return_inverse=True)
+        loads = np.bincount(link_of.ravel(), weights=np.concatenate(links_load), minlength=len(link_keys))
+        link_load = self.link_load
+        for key, load in zip(link_keys.tolist(), loads.tolist()):
+            link = (devices[key // len(devices)].name, devices[key % len(devices)].name)
+            link_load[link] = link_load.get(link, 0.0) + load
+    
+    def _route_group(self, members: List[Host], by_dest: Dict, bucket: Optional[int] = None) -> bool:
+        """Roteia os destinos de uma subrede com uma única árvore
+        
+        Retorna False, sem alterar nada, se a árvore não vale para todos
+        os membros (um IP deles aparece no caminho ou há mais de um
+        roteador de saída para a subrede).
+        """
+        index = self.topology.ip_index
+        dest_ip = members[0].interface.address
+        others = {dest_host.interface.address for dest_host in members[1:]}
+        gateways = {source_host.gateway_address for dest_host in members for source_host in by_dest[dest_host]}
+        if dest_ip in gateways or not others.isdisjoint(gateways):
+            return False
+        
+        tree: Dict[NetworkDevice, Tuple[int, bool, Optional[int]]] = {}
+        entries = {gateway: self._walk(gateway, dest_ip, tree, bucket) for gateway in gateways}
+        if any(entry[2] in others for entry in tree.values()):
+            return False
+        if len([device for device, entry in tree.items() if entry[2] == dest_ip]) > 1:
+            return False
+        self._route_to(members, by_dest, dest_ip, tree, entries, bucket)
+        return True
+    
+    def _route_to(self, members: List[Host], by_dest: Dict, dest_ip: Optional[int] = None,
+                  tree: Optional[Dict[NetworkDevice, Tuple[int, bool, Optional[int]]]] = None,
+                  entries: Optional[Dict[int, Tuple[bool, Optional[NetworkDevice]]]] = None,
+                  bucket: Optional[int] = None):
+        """Propaga a carga das origens dos destinos pela árvore até o último roteador
+        
+        Com vários membros, `tree` foi construída para `dest_ip` (o primeiro
+        deles) e vale para todos; o último enlace é contado por destino.
+        `entries` guarda o resultado de _walk por gateway e `bucket` é o
+        hash de fluxo comum às demandas de `by_dest`.
+        """
+        index = self.topology.ip_index
+        link_load = self.link_load
+        if tree is None:
+            dest_ip = members[0].interface.address
+            tree = {}
+        if entries is None:
+            entries = {}
+        node_load: Dict[NetworkDevice, float] = {}
+        dest_loads = []
+        
+        for dest_host in members:
+            arriving = 0.0
+            for source_host, (rate, count) in by_dest[dest_host].items():
+                entry = entries.get(source_host.gateway_address)
+                if entry is None:
+                    entry = self._walk(source_host.gateway_address, dest_ip, tree, bucket)
+                    entries[source_host.gateway_address] = entry
+                reached, gateway = entry
+                if not reached:
+                    self.unroutable += count
+                    self.unroutable_bps += rate
+                    continue
+                link = (source_host.name, gateway.name)
+                link_load[link] = link_load.get(link, 0.0) + rate
+                node_load[gateway] = node_load.get(gateway, 0.0) + rate
+                arriving += rate
+            dest_loads.append((dest_host, arriving))
+        
+        # Dos dispositivos mais distantes do destino para os mais próximos
+        levels: Dict[int, List[NetworkDevice]] = {}
+        for device in node_load:
+            levels.setdefault(tree[device][0], []).append(device)
+        last_hops: Dict[NetworkDevice, float] = {}
+        for depth in range(max(levels, default=0), 0, -1):
+            for device in levels.get(depth, ()):
+                next_ip = tree[device][2]
+                load = node_load[device]
+                if next_ip == dest_ip:
+                    last_hops[device] = last_hops.get(device, 0.0) + load
+                    continue
+                next_device = index[next_ip][0]
+                link = (device.name, next_device.name)
+                link_load[link] = link_load.get(link, 0.0) + load
+                if next_device not in node_load:
+                    levels.setdefault(depth - 1, []).append(next_device)
+                    node_load[next_device] = 0.0
+                node_load[next_device] += load
+        
+        # Último enlace: do roteador de saída até cada destino
+        if len(members) == 1:
+            for device, load in last_hops.items():
+                link = (device.name, index[dest_ip][0].name)
+                link_load[link] = link_load.get(link, 0.0) + load
+        elif last_hops:
+            last_device = next(iter(last_hops))
+            for dest_host, load in dest_loads:
+                if load:
+                    link = (last_device.name, dest_host.name)
+                    link_load[link] = link_load.get(link, 0.0) + load
+    
+    def _walk(self, start_ip: int, dest_ip: int, tree: Dict[NetworkDevice, Tuple[int, bool, Optional[int]]],
+              bucket: Optional[int] = None) -> Tuple[bool, Optional[NetworkDevice]]:
+        """Percorre o caminho a partir de um IP de entrada com a semântica de trace_route
+        
+        Preenche `tree` com (distância até o fim do caminho, alcançou o
+        destino, próximo IP) para cada dispositivo visitado: a decisão de
+        encaminhamento depende só do dispositivo, então caminhos que entram
+        por IPs diferentes do mesmo roteador compartilham o sufixo. Retorna
+        se o destino foi alcançado e o dispositivo de entrada.
+        """
+        index = self.topology.ip_index
+        owner = index.get(start_ip)
+        start = owner[0] if owner is not None else None
+        if start is None:
+            return False, None
+        entry = tree.get(start)
+        if entry is not None and start_ip != dest_ip:
+            return entry[1], start
+        
+        chain = []
+        in_chain = set()
+        ip, device = start_ip, start
+        while True:
+            if ip == dest_ip:
+                base = tree[device] = (0, True, None)
+                break
+            entry = tree.get(device)
+            if entry is not None:
+                base = entry
+                break
+            if device in in_chain:
+                base = (0, False, None)  # Laço de roteamento
+                break
+            in_chain.add(device)
+            
+            route = None
+            if device.device_type != 'Host':
+                route = device.get_forwarding_table().lookup(dest_ip, bucket)
+            if route is None:
+                base = tree[device] = (0, False, None)
+                break
+            
+            next_ip = dest_ip if route.next_hop is None else route.next_hop
+            owner = index.get(next_ip)
+            chain.append((device, next_ip))
+            if owner is None:
+                # Próximo hop (ou destino conectado) sem dono: caminho interrompido
+                base = (0, False, None)
+                break
+            ip, device = next_ip, owner[0]
+        
+        depth, reached, _ = base
+        for device, next_ip in reversed(chain):
+            depth += 1
+            tree[device] = (depth, reached, next_ip)
+        return tree[start][1], start
+    
+    def utilization(self) -> Dict[Tuple[str, str], Dict]:
+        """Carga, capacidade e utilização de cada direção de enlace com tráfego
+        
+        Enlaces fora de `links` têm capacidade e utilização None.
+        """
+        result = {}
+        for link, load in self.link_load.items():
+            capacity = self.capacities.get(link)
+            result[link] = {
+                'load_bps': load,
+                'capacity_bps': capacity,
+                'utilization': load / capacity if capacity else None
+            }
+        return result
+    
+    def bottlenecks(self, top: int = 10) -> List[Dict]:
+        """Enlaces com maior utilização, em ordem decrescente"""
+        ranked = sorted(((util['utilization'], link, util) for link, util in self.utilization().items()
+                         if util['utilization'] is not None), key=lambda item: -item[0])
+        return [dict(util, source=link[0], dest=link[1]) for _, link, util in ranked[:top]]
+    
+    def summary(self) -> Dict:
+        """Resumo: demandas, tráfego oferecido/roteado e enlaces saturados"""
+        saturated = sum(1 for util in self.utilization().values()
+                        if util['utilization'] is not None and util['utilization'] > 1)
+        return {
+            'demands': self.demands,
+            'routed': self.demands - self.unroutable,
+            'unroutable': self.unroutable,
+            'offered_bps': self.offered_bps,
+            'routed_bps': self.offered_bps - self.unroutable_bps,
+            'links_loaded': len(self.link_load),
+            'links_saturated': saturated
+        }
+
+
+def load_demands(path: str) -> List[Tuple[str, str, float]]:
+    """Lê demandas 'origem destino taxa' de um arquivo (um por linha, '#' comenta)
+    
+    Origem e destino são nomes ou IPs de hosts; a taxa é um número em
+    bits/s ou um valor com unidade (ex.: 10Mbps).
+    """
+    demands = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.split('#', 1)[0].replace(',', ' ').strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) != 3:
+                raise ValueError(f"{path}:{line_number}: esperado 'origem destino taxa', obtido {line!r}")
+            source, dest, rate = fields
+            try:
+                demands.append((source, dest, float(rate)))
+            except ValueError:
+                try:
+                    demands.append((source, dest, parse_capacity(rate)))
+                except ValueError:
+                    raise ValueError(f"{path}:{line_number}: taxa inválida: {rate!r}") from None
+    return demands
+
+
+def format_rate(bps: Optional[float]) -> str:
+    """Formata uma taxa em bits/s com a maior unidade adequada"""
+    if bps is None:
+        return '-'
+    for unit, scale in (('Tbps', 1e12), ('Gbps', 1e9), ('Mbps', 1e6), ('kbps', 1e3)):
+        if bps >= scale:
+            return f"{bps / scale:.2f} {unit}"
+    return f"{bps:.0f} bps"
+
+
+def main():
+    """Simula uma matriz de tráfego e exibe os enlaces mais carregados"""
+    parser = argparse.ArgumentParser(description="Simulação de carga por matriz de tráfego")
+    parser.add_argument('demands_file', help="arquivo com 'origem destino taxa' por linha")
+    parser.add_argument('--topology', help="arquivo de topologia, texto ou snapshot (padrão: topologia do projeto)")
+    parser.add_argument('--top', type=int, default=10, help="número de gargalos exibidos")
+    args = parser.parse_args()
+    
+    if args.topology:
+        from topology_snapshot import open_topology
+        topology = open_topology(args.topology)
+    else:
+        topology = NetworkTopology()
+    
+    demands = load_demands(args.demands_file)
+    start = time.perf_counter()
+    traffic = topology.simulate_traffic(demands)
+    elapsed = time.perf_counter() - start
+    summary = traffic.summary()
+    
+    print(f"Demandas: {summary['demands']} | Roteadas: {summary['routed']} | "
+          f"Não roteáveis: {summary['unroutable']}")
+    print(f"Tráfego oferecido: {format_rate(summary['offered_bps'])} | "
+          f"Roteado: {format_rate(summary['routed_bps'])}")
+    print(f"Enlaces com tráfego: {summary['links_loaded']} | "
+          f"Saturados: {summary['links_saturated']} | Tempo: {elapsed:.2f} s")
+    
+    print(f"\n{'Enlace':<24} {'Carga':>14} {'Capacidade':>14} {'Utilização':>11}")
+    print("-" * 66)
+    for link in traffic.bottlenecks(args.top):
+        print(f"{link['source'] + ' -> ' + link['dest']:<24} {format_rate(link['load_bps']):>14} "
+              f"{format_rate(link['capacity_bps']):>14} {link['utilization']:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()